@@ -0,0 +1,104 @@
+"""
+Fake Telegram Bot API - local stand-in for api.telegram.org
+Yuklama testlari uchun Telegram serveri o'rnini bosuvchi mahalliy server
+
+Answers every method with a plausible result, records the calls, and can add
+latency and random 429 (flood wait) responses. Point a Bot at it with:
+
+    Bot(token, session=AiohttpSession(api=TelegramAPIServer.from_base(fake.url)))
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTestBot", "username": "load_test_bot"}
+
+class FakeBotAPI:
+    """aiohttp server answering /bot<token>/<method> like the Bot API would"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0, rate_429: float = 0, retry_after: int = 1):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.rejected = 0
+        # (method, chat_id, text) of the latest messages, for spot checks
+        self.recent: deque = deque(maxlen=1000)
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free one
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id") or 0)
+        message_id = params.get("message_id")
+        if message_id is None:
+            self._message_id += 1
+            message_id = self._message_id
+        return {
+            "message_id": int(message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text") or params.get("caption") or "",
+        }
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getme":
+            return BOT_USER
+        if method == "getchatmember":
+            user_id = int(params.get("user_id") or 0)
+            return {"status": "member", "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        if method.startswith("send") and method != "sendchataction":
+            return self._message(params)
+        if method.startswith("edit") and "inline_message_id" not in params:
+            return self._message(params)
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.rate_429 and random.random() < self.rate_429:
+            self.rejected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if "text" in params or "caption" in params:
+            self.recent.append((method, params.get("chat_id"), params.get("text") or params.get("caption")))
+        result = self._result(method.lower(), params)
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
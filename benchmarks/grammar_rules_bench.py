@@ -0,0 +1,98 @@
+"""
+Grammar rules benchmark - if/elif chain vs. compiled rule index
+Grammar AI savollariga javob topish tezligini solishtirish
+
+Run from the project root:  python -m benchmarks.grammar_rules_bench
+"""
+
+import time
+import timeit
+
+from handlers.conversation import (
+    KOREAN_GRAMMAR_RULES, JAPANESE_GRAMMAR_RULES, KOREAN_GRAMMAR_INDEX, JAPANESE_GRAMMAR_INDEX
+)
+from utils.keyword_matcher import RuleIndex
+from utils.text_normalization import fold
+
+# Questions as users type them into Grammar AI (normalized by the handler)
+KOREAN_QUERIES = [
+    "은/는 farqi nima?",
+    "에서 qanday ishlatiladi",
+    "o'tgan zamon",
+    "거든요 ishlatish",
+    "지만 qanday?",
+    "하다 fe'li haqida",
+    "습니다 rasmiy shakl",
+    "까지 misol",
+    "려고 하다",
+    "아도/어도 nima",
+    "what is the subject particle",
+    "salom",
+    "qanday yozaman?",
+    "grammatika",
+    "감사합니다",
+    "밥 먹었어요?",
+]
+JAPANESE_QUERIES = [
+    "は nima?",
+    "が bilan は farqi",
+    "を qachon ishlatiladi",
+    "ている misollar",
+    "でしょう ehtimol",
+    "ます rasmiy shakli",
+    "o'tgan zamon",
+    "desu nima",
+    "te iru continuous",
+    "topic particle",
+    "salom",
+    "qanday yozaman?",
+    "ありがとう",
+    "grammatika",
+    "日本語",
+    "kkk",
+]
+
+def chain_first(rules, text):
+    """The original explainer: first branch (in priority order) with a keyword in the text"""
+    for rule in rules:
+        if any(word in text for word in rule[1]):
+            return rule
+    return None
+
+def bench(label, func, number):
+    seconds = timeit.timeit(func, number=number)
+    print(f"  {label:<12} {seconds / number * 1e6:8.1f} µs per query set")
+    return seconds
+
+def main(number: int = 2000) -> None:
+    for name, rules, index, queries in (
+        ("Korean", KOREAN_GRAMMAR_RULES, KOREAN_GRAMMAR_INDEX, KOREAN_QUERIES),
+        ("Japanese", JAPANESE_GRAMMAR_RULES, JAPANESE_GRAMMAR_INDEX, JAPANESE_QUERIES),
+    ):
+        texts = [fold(query) for query in queries]
+
+        # Same answers as the chain before timing anything
+        for text in texts:
+            assert index.first(text) is chain_first(rules, text), text
+
+        started = time.perf_counter()
+        RuleIndex(rules, fold)
+        keywords = sum(len(rule[1]) for rule in rules)
+        print(f"{name}: {len(rules)} rules, {keywords} keywords, built in "
+              f"{(time.perf_counter() - started) * 1000:.2f} ms, {len(texts)} queries")
+
+        misses = [text for text in texts if index.first(text) is None]
+        old = bench("chain", lambda: [chain_first(rules, text) for text in texts], number)
+        new = bench("index", lambda: [index.first(text) for text in texts], number)
+        print(f"  speedup      {old / new:8.1f}x")
+        if misses:
+            old = bench("chain miss", lambda: [chain_first(rules, text) for text in misses], number)
+            new = bench("index miss", lambda: [index.first(text) for text in misses], number)
+            print(f"  speedup      {old / new:8.1f}x")
+
+        # Debug view: which rules a question triggers, the winner first
+        for text in texts[:3]:
+            print(f"  {text!r}: {index.hits(text)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Journal replay check - write-behind deltas survive failed flushes and a crash
+Yozish xatoliklari va kutilmagan to'xtashdan keyin reyting o'zgarishlari yo'qolmasligini tekshirish
+
+Two flushes fail (+5, then +7), the process "crashes" without closing the
+buffer, and a fresh buffer replays the journal: the user must end up with
+exactly +12. Uses a scratch database and journal in a temp directory.
+
+Run from the project root:  python -m benchmarks.journal_replay_check
+"""
+
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+
+USER_ID = 1
+
+async def rating_of(db_pool) -> float:
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT rating_score FROM users WHERE user_id = ?", (USER_ID,))
+        return (await cursor.fetchone())[0]
+
+async def main() -> None:
+    # Scratch database: DATABASE_PATH is relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="bot-journal-")
+    home = os.getcwd()
+    os.chdir(workdir)
+
+    from database import init_db
+    from utils.db_pool import db_pool
+    from utils.write_behind import ActivityBuffer
+
+    journal = os.path.join(workdir, "activity.journal")
+    await db_pool.start()
+    try:
+        await init_db()
+        async with db_pool.writer() as db:
+            await db.execute("INSERT INTO users (user_id, first_name, rating_score) VALUES (?, 'Check', 0)", (USER_ID,))
+            await db.commit()
+
+        crashed = ActivityBuffer(interval_ms=3_600_000, journal_path=journal)
+        await crashed.start()
+
+        async def failing_write(batch, batch_id=None):
+            raise RuntimeError("database is locked")
+        crashed._write = failing_write
+
+        for points in (5, 7):
+            await crashed.add(USER_ID, rating=points)
+            assert await crashed.flush() == 0, "flush should have failed"
+        rotated = sorted(glob.glob(f"{journal}.*"))
+        print(f"After two failed flushes: {len(rotated)} rotated journal files {[os.path.basename(p) for p in rotated]}")
+
+        # Crash: the loop dies with the process, nothing is flushed or closed
+        crashed._task.cancel()
+        crashed._journal.close()
+
+        replayed = ActivityBuffer(interval_ms=3_600_000, journal_path=journal)
+        await replayed.start()
+        await replayed.close()
+
+        rating = await rating_of(db_pool)
+        print(f"Rating after replay: {rating:.1f} (expected 12.0)")
+        assert rating == 12.0, rating
+        assert not glob.glob(f"{journal}.*"), "replayed journal files should be removed"
+
+        # A second restart must not apply the same deltas again
+        again = ActivityBuffer(interval_ms=3_600_000, journal_path=journal)
+        await again.start()
+        await again.close()
+        assert await rating_of(db_pool) == 12.0
+        print("OK")
+    finally:
+        await db_pool.close()
+        os.chdir(home)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Keyword matcher benchmark - substring loop vs. Aho-Corasick automaton
+Javob kalitlarini qidirish tezligini solishtirish
+
+Run from the project root:  python -m benchmarks.keyword_matcher_bench
+"""
+
+import random
+import time
+import timeit
+
+from handlers.conversation import (
+    KOREAN_RESPONSES, JAPANESE_RESPONSES, KOREAN_MATCHER, JAPANESE_MATCHER
+)
+from utils.ai_conversation import ai_conversation
+from utils.keyword_matcher import AUTOMATON_MIN_KEYWORDS, KeywordMatcher
+from utils.text_normalization import fold
+
+SAMPLES = [
+    "안녕하세요! 오늘 날씨가 정말 좋네요",
+    "저는 한국어를 공부하고 있어요. 너무 어려워요 ㅠㅠ",
+    "hello, how do I say thank you in korean?",
+    "감사합니다 선생님, 내일 또 만나요",
+    "こんにちは、日本語を勉強しています",
+    "ありがとうございます！今日は天気がいいですね",
+    "salom, men koreys tilini o'rganmoqchiman",
+    "ＨＥＬＬＯ! コーヒー ください",
+    "this message does not contain any known keyword at all " * 3,
+]
+
+def loop_first_key(responses, text):
+    """The original lookup: first key contained in the text (keys and text folded)"""
+    for key in responses:
+        if key in text:
+            return key
+    return None
+
+def loop_category(patterns, message):
+    """The original analyze_message loop: the last matching category wins"""
+    detected = "general"
+    for category, data in patterns.items():
+        for pattern in data["patterns"]:
+            if fold(pattern) in fold(message):
+                detected = category
+                break
+    return detected
+
+def bench(label, func, number):
+    seconds = timeit.timeit(func, number=number)
+    print(f"  {label:<12} {seconds / number * 1e6:8.1f} µs per sample set")
+    return seconds
+
+def main(number: int = 2000) -> None:
+    texts = [fold(sample) for sample in SAMPLES]
+    korean_keys = [fold(key) for key in KOREAN_RESPONSES]
+    japanese_keys = [fold(key) for key in JAPANESE_RESPONSES]
+
+    # Same answers as the old loops before timing anything
+    for text in texts:
+        assert KOREAN_MATCHER.first_match(text) == loop_first_key(korean_keys, text), text
+        assert JAPANESE_MATCHER.first_match(text) == loop_first_key(japanese_keys, text), text
+    for language, patterns in (("korean", ai_conversation.korean_patterns),
+                               ("japanese", ai_conversation.japanese_patterns)):
+        matcher = ai_conversation.category_matchers[language]
+        for sample in SAMPLES:
+            matched = matcher.matched_groups(fold(sample))
+            assert (matched[-1] if matched else "general") == loop_category(patterns, sample), sample
+
+    started = time.perf_counter()
+    KeywordMatcher(KOREAN_RESPONSES)
+    print(f"Build: {len(KOREAN_RESPONSES)} Korean keys in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    # Timed against an explicit automaton; the app picks by key count (AUTOMATON_MIN_KEYWORDS)
+    for name, responses, used in (("Korean replies", korean_keys, KOREAN_MATCHER),
+                                  ("Japanese replies", japanese_keys, JAPANESE_MATCHER)):
+        matcher = KeywordMatcher(responses)
+        print(f"{name} ({len(responses)} keys, {len(texts)} messages, app uses {type(used).__name__}):")
+        old = bench("loop", lambda: [loop_first_key(responses, text) for text in texts], number)
+        new = bench("automaton", lambda: [matcher.first_match(text) for text in texts], number)
+        print(f"  speedup      {old / new:8.1f}x")
+
+    # The loop grows with the number of keys, the automaton with the text only
+    print("Scaling (Korean keys + random Hangul keys):")
+    rng = random.Random(1)
+    syllables = [chr(code) for code in range(0xAC00, 0xAC00 + 400)]
+    for extra in (100, 250, 500, 2000):
+        responses = dict.fromkeys(korean_keys +
+                                  ["".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(extra)])
+        matcher = KeywordMatcher(responses)
+        for text in texts:
+            assert matcher.first_match(text) == loop_first_key(responses, text), text
+        print(f"  {len(responses)} keys (automaton from {AUTOMATON_MIN_KEYWORDS}):")
+        old = bench("loop", lambda: [loop_first_key(responses, text) for text in texts], number // 4)
+        new = bench("automaton", lambda: [matcher.first_match(text) for text in texts], number // 4)
+        print(f"  speedup      {old / new:8.1f}x")
+
+    patterns = ai_conversation.korean_patterns
+    matcher = ai_conversation.category_matchers["korean"]
+    print(f"Conversation categories ({sum(len(d['patterns']) for d in patterns.values())} patterns):")
+    old = bench("loop", lambda: [loop_category(patterns, sample) for sample in SAMPLES], number)
+    new = bench("automaton", lambda: [matcher.matched_groups(fold(sample)) for sample in SAMPLES], number)
+    print(f"  speedup      {old / new:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Leaderboard benchmark - flat sorted list vs. bucketed SortedKeys
+Reyting jadvalini yangilash tezligini solishtirish
+
+Run from the project root:  python -m benchmarks.leaderboard_bench
+"""
+
+import random
+import time
+from bisect import bisect_left, insort
+
+from utils.leaderboard import SortedKeys
+
+def random_key(rng, user_id):
+    return (-float(rng.randint(1, 5000)), -rng.randint(0, 500), -rng.randint(0, 200),
+            -rng.randint(0, 100), user_id)
+
+def updates(rng, keys, count):
+    """(old key, new key) pairs as apply() sees them: a user gains some points"""
+    by_user = {key[4]: key for key in keys}
+    pairs = []
+    for _ in range(count):
+        user_id = rng.randrange(len(keys))
+        old = by_user[user_id]
+        new = (old[0] - rng.randint(1, 20), old[1] - 1, old[2], old[3], user_id)
+        by_user[user_id] = new
+        pairs.append((old, new))
+    return pairs
+
+def check(rng):
+    """SortedKeys answers like the flat list under random updates and splits"""
+    keys = [random_key(rng, user_id) for user_id in range(5000)]
+    flat = sorted(keys)
+    bucketed = SortedKeys(keys)
+    for old, new in updates(rng, keys, 20000):
+        del flat[bisect_left(flat, old)]
+        insort(flat, new)
+        bucketed.remove(old)
+        bucketed.add(new)
+    assert list(bucketed) == flat and len(bucketed) == len(flat)
+    for rating in range(0, 6000, 37):
+        assert bucketed.count_below((-float(rating),)) == bisect_left(flat, (-float(rating),))
+    assert bucketed.head(10) == flat[:10] and bucketed.head(len(flat) + 5) == flat
+
+def main(count: int = 20000) -> None:
+    rng = random.Random(1)
+    check(rng)
+
+    for users in (10_000, 100_000, 1_000_000):
+        keys = [random_key(rng, user_id) for user_id in range(users)]
+        pairs = updates(rng, keys, count)
+        print(f"{users} ranked users, {count} updates:")
+
+        flat = sorted(keys)
+        started = time.perf_counter()
+        for old, new in pairs:
+            del flat[bisect_left(flat, old)]
+            insort(flat, new)
+        old_seconds = time.perf_counter() - started
+        print(f"  flat list    {old_seconds / count * 1e6:8.2f} µs per update")
+
+        bucketed = SortedKeys(keys)
+        started = time.perf_counter()
+        for old, new in pairs:
+            bucketed.remove(old)
+            bucketed.add(new)
+        new_seconds = time.perf_counter() - started
+        print(f"  bucketed     {new_seconds / count * 1e6:8.2f} µs per update")
+        print(f"  speedup      {old_seconds / new_seconds:8.1f}x")
+
+        probes = [(-float(rng.randint(1, 5000)),) for _ in range(1000)]
+        started = time.perf_counter()
+        for probe in probes:
+            bucketed.count_below(probe)
+        print(f"  rank lookup  {(time.perf_counter() - started) / len(probes) * 1e6:8.2f} µs")
+
+if __name__ == "__main__":
+    main()
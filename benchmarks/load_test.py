@@ -0,0 +1,322 @@
+"""
+Load test - scripted user journeys through the real dispatcher
+Botning o'tkazuvchanligini Telegramsiz, mahalliy soxta API bilan o'lchash
+
+Runs the Dispatcher with every router from main.py on a scratch database,
+with Bot API calls going to benchmarks.fake_bot_api. Virtual users replay
+journeys (/start with a referral, learning catalog, a full quiz, AI chat)
+and the report shows updates/s, handler latency and DB statements per update.
+
+Run from the project root:
+
+    python -m benchmarks.load_test --users 200 --concurrency 50
+    python -m benchmarks.load_test --api-latency-ms 40 --api-429-rate 0.01
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.types import Update
+
+from benchmarks.fake_bot_api import BOT_USER, FakeBotAPI
+
+REFERRER_ID = 9_000_000
+REFERRAL_CODE = "LOADTEST"
+FIRST_USER_ID = 10_000_000
+QUIZ_QUESTIONS = 5
+CHAT_MESSAGES = ["안녕하세요", "감사합니다", "커피 주세요", "hello", "물 주세요"]
+
+# (step name, "message" | "callback" | "grant_premium", text or callback data)
+Step = Tuple[str, str, str]
+
+# ==================== SCRATCH DATABASE ====================
+
+async def seed(db_pool) -> Dict[str, int]:
+    """A referrer, one Korean section/subsection with content, and one quiz"""
+    async with db_pool.writer() as db:
+        await db.execute(
+            "INSERT INTO users (user_id, first_name, referral_code) VALUES (?, ?, ?)",
+            (REFERRER_ID, "Referrer", REFERRAL_CODE)
+        )
+        cursor = await db.execute(
+            "INSERT INTO sections (name, description, language) VALUES ('Boshlang''ich', 'Load test', 'korean')"
+        )
+        section_id = cursor.lastrowid
+        cursor = await db.execute(
+            "INSERT INTO subsections (section_id, name, description) VALUES (?, 'Salomlashish', 'Load test')",
+            (section_id,)
+        )
+        subsection_id = cursor.lastrowid
+        content_ids = []
+        for i in range(3):
+            cursor = await db.execute(
+                "INSERT INTO content (subsection_id, title, content_text, file_type) VALUES (?, ?, ?, 'text')",
+                (subsection_id, f"Dars {i + 1}", "안녕하세요 - Salom\n감사합니다 - Rahmat" * 5)
+            )
+            content_ids.append(cursor.lastrowid)
+        cursor = await db.execute(
+            "INSERT INTO quizzes (title, description, language) VALUES ('Load test', 'Load test', 'korean')"
+        )
+        quiz_id = cursor.lastrowid
+        for i in range(QUIZ_QUESTIONS):
+            await db.execute("""
+                INSERT INTO quiz_questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer)
+                VALUES (?, ?, '안녕', '감사', '물', '커피', ?)
+            """, (quiz_id, f"Savol {i + 1}?", "ABCD"[i % 4]))
+        await db.commit()
+    return {'section': section_id, 'subsection': subsection_id, 'content': content_ids[0], 'quiz': quiz_id}
+
+def build_journeys(ids: Dict[str, int]) -> Dict[str, List[Step]]:
+    quiz = [
+        ("start", "message", "/start"),
+        ("quiz_menu", "callback", "quizzes"),
+        ("quiz_list", "callback", "quiz_korean"),
+        ("quiz_start", "callback", f"start_quiz_{ids['quiz']}"),
+    ]
+    for i in range(QUIZ_QUESTIONS):
+        name = "quiz_finish" if i == QUIZ_QUESTIONS - 1 else "quiz_answer"
+        quiz.append((name, "callback", f"quiz_answer_{'ABCD'[(i * 3) % 4]}_{i}"))
+
+    chat = [
+        ("start", "message", "/start"),
+        ("", "grant_premium", ""),
+        ("chat_open", "callback", "korean_conversation"),
+    ]
+    chat += [("chat_message", "message", text) for text in CHAT_MESSAGES]
+    chat.append(("chat_exit", "message", "chiqish"))
+
+    return {
+        "referral": [("start_referral", "message", f"/start {REFERRAL_CODE}")],
+        "learn": [
+            ("start", "message", "/start"),
+            ("learn_menu", "callback", "learn"),
+            ("sections", "callback", "korean"),
+            ("subsections", "callback", f"section_{ids['section']}"),
+            ("content_list", "callback", f"subsection_{ids['subsection']}"),
+            ("content_item", "callback", f"content_{ids['content']}"),
+            ("main_menu", "callback", "main_menu"),
+        ],
+        "quiz": quiz,
+        "conversation": chat,
+    }
+
+class StatementCounter:
+    """SQL statements run on the pooled connections (one counter per connection thread)"""
+
+    def __init__(self):
+        self._counts: List[List[int]] = []
+
+    async def attach(self, db_pool) -> None:
+        for conn in db_pool._reader_connections + [db_pool._writer]:
+            count = [0]
+            self._counts.append(count)
+
+            def trace(_sql, count=count):
+                count[0] += 1
+            await conn.set_trace_callback(trace)
+
+    @property
+    def total(self) -> int:
+        return sum(count[0] for count in self._counts)
+
+# ==================== RUNNER ====================
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+class LoadRun:
+    """Feeds each virtual user's journey to the dispatcher and times every update"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, db_pool, statements: StatementCounter):
+        self.bot = bot
+        self.dp = dp
+        self.db_pool = db_pool
+        self.statements = statements
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.reset()
+
+    def reset(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.step_statements: Dict[str, List[int]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.updates = 0
+
+    def _update(self, user_id: int, kind: str, payload: str) -> Update:
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "uz"}
+        chat = {"id": user_id, "type": "private", "first_name": user["first_name"]}
+        now = int(time.time())
+        update_id = next(self._update_ids)
+        if kind == "message":
+            data = {"update_id": update_id, "message": {
+                "message_id": next(self._message_ids), "date": now, "chat": chat, "from": user, "text": payload
+            }}
+        else:
+            data = {"update_id": update_id, "callback_query": {
+                "id": str(update_id), "from": user, "chat_instance": str(user_id), "data": payload,
+                "message": {"message_id": next(self._message_ids), "date": now, "chat": chat,
+                            "from": BOT_USER, "text": "menu"}
+            }}
+        return Update.model_validate(data, context={"bot": self.bot})
+
+    async def _grant_premium(self, user_id: int) -> None:
+        from utils.premium_cache import premium_cache
+        async with self.db_pool.writer() as db:
+            await db.execute("""
+                UPDATE users SET is_premium = TRUE, premium_expires_at = datetime('now', '+30 days', 'localtime')
+                WHERE user_id = ?
+            """, (user_id,))
+            await db.commit()
+        premium_cache.invalidate(user_id)
+
+    async def run_journey(self, user_id: int, steps: List[Step]) -> None:
+        for name, kind, payload in steps:
+            if kind == "grant_premium":
+                # Test setup, not an update
+                await self._grant_premium(user_id)
+                continue
+            update = self._update(user_id, kind, payload)
+            statements = self.statements.total
+            started = time.perf_counter()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.errors[f"{name}: {type(e).__name__}"] += 1
+            self.latencies[name].append(time.perf_counter() - started)
+            self.step_statements[name].append(self.statements.total - statements)
+            self.updates += 1
+
+    async def run(self, assignments: List[Tuple[int, List[Step]]], concurrency: int) -> float:
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(user_id: int, steps: List[Step]) -> None:
+            async with slots:
+                await self.run_journey(user_id, steps)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(user_id, steps) for user_id, steps in assignments))
+        return time.perf_counter() - started
+
+def report_steps(run: LoadRun, with_statements: bool) -> None:
+    header = f"  {'step':<16}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header + (f"{'SQL/upd':>9}" if with_statements else ""))
+    for name, values in run.latencies.items():
+        values = sorted(values)
+        line = (f"  {name:<16}{len(values):>7}{percentile(values, .5) * 1000:>9.2f}"
+                f"{percentile(values, .95) * 1000:>9.2f}{percentile(values, .99) * 1000:>9.2f}")
+        if with_statements:
+            counts = run.step_statements[name]
+            line += f"{sum(counts) / len(counts):>9.1f}"
+        print(line)
+
+# ==================== MAIN ====================
+
+async def main(args) -> None:
+    # Scratch database: DATABASE_PATH is relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="bot-load-")
+    home = os.getcwd()
+    os.chdir(workdir)
+
+    from main import create_dispatcher
+    from database import init_db
+    from utils.db_pool import db_pool
+    from utils.write_behind import activity_buffer
+    from utils.catalog_cache import catalog_cache
+    from utils.leaderboard import rating_leaderboard
+    from utils.pacing import reply_pacer
+
+    logging.getLogger("aiogram").setLevel(logging.WARNING)
+    reply_pacer.mode = args.pacing
+
+    fake = FakeBotAPI(latency_ms=args.api_latency_ms, rate_429=args.api_429_rate)
+    await fake.start()
+    bot = Bot(
+        token="123456:LOADTEST",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(fake.url)),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+    await db_pool.start()
+    try:
+        await init_db()
+        await activity_buffer.start()
+        ids = await seed(db_pool)
+        await catalog_cache.load()
+        await rating_leaderboard.load()
+
+        dp = create_dispatcher()
+        statements = StatementCounter()
+        await statements.attach(db_pool)
+        run = LoadRun(bot, dp, db_pool, statements)
+
+        journeys = build_journeys(ids)
+        selected = [name for name in args.journeys.split(",") if name in journeys]
+        user_ids = itertools.count(FIRST_USER_ID)
+
+        # Warm-up: one user per journey, alone, so statements per step are exact
+        await run.run([(next(user_ids), journeys[name]) for name in selected], concurrency=1)
+        await reply_pacer.close()
+        print(f"Profile (one user per journey, no concurrency):")
+        report_steps(run, with_statements=True)
+
+        run.reset()
+        fake.calls.clear()
+        fake.rejected = 0
+        assignments = [(next(user_ids), journeys[selected[i % len(selected)]]) for i in range(args.users)]
+        statements_before = statements.total
+        elapsed = await run.run(assignments, args.concurrency)
+        await reply_pacer.close()
+        statement_count = statements.total - statements_before
+
+        all_latencies = sorted(value for values in run.latencies.values() for value in values)
+        api_calls = sum(fake.calls.values())
+        print()
+        print(f"Load: {args.users} users, {args.concurrency} concurrent, journeys {','.join(selected)}, "
+              f"API latency {args.api_latency_ms:g} ms, 429 rate {args.api_429_rate:g}")
+        print(f"  updates        {run.updates} in {elapsed:.2f}s")
+        print(f"  throughput     {run.updates / elapsed:.0f} updates/s")
+        print(f"  latency        p50 {percentile(all_latencies, .5) * 1000:.2f} ms, "
+              f"p95 {percentile(all_latencies, .95) * 1000:.2f} ms, "
+              f"p99 {percentile(all_latencies, .99) * 1000:.2f} ms")
+        print(f"  DB statements  {statement_count / max(1, run.updates):.1f} per update")
+        print(f"  Bot API calls  {api_calls / max(1, run.updates):.1f} per update "
+              f"({', '.join(f'{method} {count}' for method, count in fake.calls.most_common(5))})")
+        print(f"  429 injected   {fake.rejected}")
+        print(f"  errors         {dict(run.errors) or 'none'}")
+        report_steps(run, with_statements=False)
+    finally:
+        await activity_buffer.close()
+        await db_pool.close()
+        await bot.session.close()
+        await fake.stop()
+        os.chdir(home)
+        if args.keep_db:
+            print(f"Database kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test with a fake Bot API")
+    parser.add_argument("--users", type=int, default=200, help="virtual users, each runs one journey")
+    parser.add_argument("--concurrency", type=int, default=50, help="users active at the same time")
+    parser.add_argument("--journeys", default="referral,learn,quiz,conversation")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="added to every Bot API call")
+    parser.add_argument("--api-429-rate", type=float, default=0, help="share of Bot API calls answered with 429")
+    parser.add_argument("--pacing", default="instant", help="reply pacing mode for AI chat replies")
+    parser.add_argument("--keep-db", action="store_true", help="keep the scratch database for inspection")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Webhook load test - POST synthetic updates at a running webhook server
+Webhook rejimida bot qancha so'rovni qabul qila olishini o'lchash
+
+Start the bot with BOT_MODE=webhook (WEBHOOK_BASE_URL empty keeps Telegram out
+of it), then from the project root:
+
+    python -m benchmarks.webhook_load --updates 5000 --concurrency 50
+
+The server answers before the handlers finish, so this measures how fast
+updates are accepted; handlers still call the real Bot API from there.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+from config import WEBAPP_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+
+TEXTS = [
+    "안녕하세요",
+    "감사합니다 선생님",
+    "こんにちは",
+    "ありがとうございます",
+    "salom, qalaysiz?",
+    "hello",
+]
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    """A minimal private-chat text message update"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+async def run(url: str, updates: int, concurrency: int, users: int, secret: str):
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for update_id in range(1, updates + 1):
+        user_id = 10_000_000 + random.randrange(users)
+        queue.put_nowait(json.dumps(make_update(update_id, user_id, random.choice(TEXTS))))
+
+    latencies = []
+    statuses = {}
+
+    async def worker(session: aiohttp.ClientSession):
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                async with session.post(url, data=body, headers=headers) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{updates} updates, {concurrency} concurrent, {users} users -> {url}")
+    print(f"  elapsed      {elapsed:.2f}s")
+    print(f"  throughput   {updates / elapsed:.0f} updates/s")
+    print(f"  latency p50  {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"  latency p99  {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"  statuses     {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=f"http://127.0.0.1:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.updates, args.concurrency, args.users, args.secret))
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,22 @@ import os
 # Bot configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 
+# Update delivery: "polling" (getUpdates) or "webhook" (aiohttp server)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # Public https URL; empty skips setWebhook (local testing)
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Sharding: above 1, an ingress process routes updates by user to this many
+# worker processes (see utils/sharding.py)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "1"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "-1"))  # Set by the ingress for each worker; -1 otherwise
+SHARD_MAX_IN_FLIGHT = int(os.getenv("SHARD_MAX_IN_FLIGHT", "200"))  # Updates handled at once per worker
+SHARD_CACHE_REFRESH_SECONDS = int(os.getenv("SHARD_CACHE_REFRESH_SECONDS", "60"))  # Other workers' edits show up within this
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))  # A dead scheduler worker is replaced after this
+
 # Admin configuration
 ADMIN_ID = int(os.getenv("ADMIN_ID", "5974022170"))
 ADMIN_LINK = "@chang_chi_won"
@@ -14,12 +30,69 @@ CHANNELS = {
 }
 INSTAGRAM_URL = "https://www.instagram.com/kores_tili_online?igsh=MXN50HZobGZ1NXpleA=="
 
+# Channel membership cache (members are re-checked less often than non-members)
+SUBSCRIPTION_CACHE_TTL_SECONDS = int(os.getenv("SUBSCRIPTION_CACHE_TTL_SECONDS", "600"))
+SUBSCRIPTION_NEGATIVE_TTL_SECONDS = int(os.getenv("SUBSCRIPTION_NEGATIVE_TTL_SECONDS", "20"))
+# Update the cache from chat_member updates (the bot must be an admin of the channels)
+SUBSCRIPTION_MEMBER_UPDATES = os.getenv("SUBSCRIPTION_MEMBER_UPDATES", "false").lower() == "true"
+
 # Premium subscription configuration
 PREMIUM_PRICE_UZS = 50000  # 50,000 som
 REFERRAL_THRESHOLD = 10    # 10 referrals for 1 month premium
+PREMIUM_CACHE_TTL_SECONDS = int(os.getenv("PREMIUM_CACHE_TTL_SECONDS", "600"))  # Premium status cache lifetime
+
+# Built inline keyboards kept for reuse (data-dependent ones, e.g. section and quiz lists)
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "512"))
 
 # Database configuration
 DATABASE_PATH = "language_bot.db"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))  # Reader connections kept open
+
+# SQLite storage profile (applied to every pooled connection)
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")  # NORMAL is safe with WAL
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # 16 MB page cache per connection
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))  # 128 MB
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_WAL_AUTOCHECKPOINT_PAGES = int(os.getenv("DB_WAL_AUTOCHECKPOINT_PAGES", "1000"))
+DB_CHECKPOINT_INTERVAL_SECONDS = int(os.getenv("DB_CHECKPOINT_INTERVAL_SECONDS", "300"))
+DB_WAL_TRUNCATE_BYTES = int(os.getenv("DB_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024)))  # Truncate WAL above 64 MB
+
+# FSM storage: "sqlite" keeps conversation states across restarts, "memory" doesn't
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))  # States kept in memory
+FSM_STATE_TTL_SECONDS = int(os.getenv("FSM_STATE_TTL_SECONDS", str(7 * 24 * 3600)))  # Idle states are dropped
+
+# Write-behind buffer for rating / activity counters
+ACTIVITY_FLUSH_INTERVAL_MS = int(os.getenv("ACTIVITY_FLUSH_INTERVAL_MS", "500"))
+ACTIVITY_FLUSH_MAX_ENTRIES = int(os.getenv("ACTIVITY_FLUSH_MAX_ENTRIES", "200"))  # Pending users before an early flush
+ACTIVITY_JOURNAL_PATH = os.getenv("ACTIVITY_JOURNAL_PATH", "")  # Empty disables the crash journal
+
+# Broadcast engine (Telegram allows roughly 30 messages per second per bot)
+BROADCAST_RATE_PER_SECOND = float(os.getenv("BROADCAST_RATE_PER_SECOND", "28"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "3"))
+BROADCAST_PROGRESS_INTERVAL_SECONDS = int(os.getenv("BROADCAST_PROGRESS_INTERVAL_SECONDS", "5"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "2"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))  # Finished jobs kept this long
+AUDIENCE_CHUNK_SIZE = int(os.getenv("AUDIENCE_CHUNK_SIZE", "500"))  # Users read and queued per step by scheduled jobs
+
+# In-memory leaderboard, rebuilt from the database this often to correct drift
+LEADERBOARD_RECONCILE_MINUTES = int(os.getenv("LEADERBOARD_RECONCILE_MINUTES", "15"))
+
+# Quiz analytics rollups (new answers are folded into the stats tables this often)
+QUIZ_ROLLUP_MINUTES = int(os.getenv("QUIZ_ROLLUP_MINUTES", "10"))
+QUIZ_CACHE_TTL_SECONDS = int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "600"))  # Question edits made outside the bot show up within this
+
+# AI conversation per-user context (least recently active users are dropped first)
+AI_CONTEXT_MAX_USERS = int(os.getenv("AI_CONTEXT_MAX_USERS", "20000"))
+AI_CONTEXT_TTL_SECONDS = int(os.getenv("AI_CONTEXT_TTL_SECONDS", str(6 * 3600)))
+AI_CONTEXT_MAX_MEMORY_MB = float(os.getenv("AI_CONTEXT_MAX_MEMORY_MB", "64"))
+
+# AI reply pacing: instant, simulated or adaptive (see utils/pacing.py)
+CONVERSATION_PACING = os.getenv("CONVERSATION_PACING", "adaptive")
+PACING_MIN_DELAY = float(os.getenv("PACING_MIN_DELAY", "0.5"))
+PACING_MAX_DELAY = float(os.getenv("PACING_MAX_DELAY", "1.2"))
+PACING_BUSY_THRESHOLD = int(os.getenv("PACING_BUSY_THRESHOLD", "50"))  # Delayed replies before adaptive goes instant
 
 # Scheduler configuration
 MOTIVATIONAL_MESSAGE_HOUR = 10  # 10 AM weekly messages
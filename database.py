@@ -1,12 +1,16 @@
-import aiosqlite
 import asyncio
 from datetime import datetime, timedelta
 from typing import Optional, List, Tuple, Any
-from config import DATABASE_PATH
+from utils.db_pool import db_pool
+from utils.migrations import run_migrations
+from utils.write_behind import activity_buffer
+from utils.premium_cache import premium_cache
+from utils.catalog_cache import catalog_cache
+from utils.leaderboard import rating_leaderboard
 
 async def init_db():
     """Initialize database with all required tables"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         # Users table
         await db.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -154,9 +158,12 @@ async def init_db():
         
         await db.commit()
 
+        # Custom tables, indexes and later schema changes
+        await run_migrations(db)
+
 async def get_user(user_id: int) -> Optional[Tuple[Any, ...]]:
     """Get user by ID"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute(
             "SELECT * FROM users WHERE user_id = ?", (user_id,)
         )
@@ -164,21 +171,15 @@ async def get_user(user_id: int) -> Optional[Tuple[Any, ...]]:
 
 async def update_user_activity(user_id: int, activity_type: Optional[str] = None) -> None:
     """Update user's last activity and session count"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("""
-            UPDATE users 
-            SET last_activity = CURRENT_TIMESTAMP,
-                total_sessions = total_sessions + 1
-            WHERE user_id = ?
-        """, (user_id,))
-        await db.commit()
+    await activity_buffer.add(user_id, sessions=1)
+    rating_leaderboard.apply(user_id, sessions=1)
 
 async def create_user(user_id: int, username: Optional[str], first_name: str, last_name: Optional[str] = None, referred_by: Optional[int] = None) -> None:
     """Create new user"""
     import secrets
     referral_code = f"REF{secrets.randbelow(999999):06d}"
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             INSERT OR IGNORE INTO users 
             (user_id, username, first_name, last_name, referral_code, referred_by)
@@ -186,9 +187,42 @@ async def create_user(user_id: int, username: Optional[str], first_name: str, la
         """, (user_id, username or "", first_name, last_name or "", referral_code, referred_by))
         await db.commit()
 
+async def record_quiz_attempt(user_id: int, quiz_id: int, score: int, total_questions: int,
+                              answers: List[Tuple[int, str, bool, int]], rating: float, words: int,
+                              duration_seconds: Optional[int] = None) -> int:
+    """Save a finished quiz in one transaction: the attempt, its answers
+    (question_id, user_answer, is_correct, points), the user's quiz totals,
+    rating and words_learned. Returns the attempt id."""
+    async with db_pool.writer() as db:
+        cursor = await db.execute("""
+            INSERT INTO quiz_attempts (user_id, quiz_id, score, total_questions, duration_seconds)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, quiz_id, score, total_questions, duration_seconds))
+        attempt_id = cursor.lastrowid
+        
+        await db.executemany("""
+            INSERT INTO quiz_answers (attempt_id, quiz_id, question_id, user_answer, is_correct, points)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(attempt_id, quiz_id) + tuple(answer) for answer in answers])
+        
+        await db.execute("""
+            UPDATE users 
+            SET quiz_score_total = quiz_score_total + ?, 
+                quiz_attempts = quiz_attempts + 1,
+                rating_score = rating_score + ?,
+                words_learned = words_learned + ?,
+                last_activity = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        """, (score, rating, words, user_id))
+        
+        await db.commit()
+    
+    rating_leaderboard.apply(user_id, rating=rating, words=words, quiz_score=score)
+    return attempt_id
+
 async def get_user_referrals_count(user_id: int) -> int:
     """Get count of successful referrals for user"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute(
             "SELECT COUNT(*) FROM referrals WHERE referrer_id = ?", (user_id,)
         )
@@ -197,7 +231,7 @@ async def get_user_referrals_count(user_id: int) -> int:
 
 async def add_referral(referrer_id: int, referred_id: int) -> None:
     """Add a referral record"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             INSERT INTO referrals (referrer_id, referred_id)
             VALUES (?, ?)
@@ -207,30 +241,61 @@ async def add_referral(referrer_id: int, referred_id: int) -> None:
 async def activate_premium(user_id: int, duration_days: int = 30) -> None:
     """Activate premium for user"""
     expires_at = datetime.now() + timedelta(days=duration_days)
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             UPDATE users 
             SET is_premium = TRUE, premium_expires_at = ?
             WHERE user_id = ?
         """, (expires_at, user_id))
         await db.commit()
+    premium_cache.invalidate(user_id)
+
+async def deactivate_premium(user_id: int) -> None:
+    """Deactivate premium for user"""
+    async with db_pool.writer() as db:
+        await db.execute("""
+            UPDATE users 
+            SET is_premium = FALSE, premium_expires_at = NULL
+            WHERE user_id = ?
+        """, (user_id,))
+        await db.commit()
+    premium_cache.invalidate(user_id)
+
+async def set_users_blocked(user_ids: List[int], blocked: bool = True) -> None:
+    """Flag (or unflag) users who blocked the bot"""
+    if not user_ids:
+        return
+    async with db_pool.writer() as db:
+        await db.executemany(
+            "UPDATE users SET is_blocked = ? WHERE user_id = ? AND COALESCE(is_blocked, FALSE) != ?",
+            [(blocked, user_id, blocked) for user_id in user_ids]
+        )
+        await db.commit()
 
 async def is_premium_active(user_id: int) -> bool:
     """Check if user's premium is active"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    cached = premium_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT is_premium, premium_expires_at FROM users WHERE user_id = ?
         """, (user_id,))
         result = await cursor.fetchone()
-        
-        if not result or not result[0]:
-            return False
-            
+    
+    expires_at = None
+    if result and result[0] and result[1]:
         expires_at = datetime.fromisoformat(result[1])
-        return datetime.now() < expires_at
+    premium_cache.set(user_id, expires_at)
+    
+    return expires_at is not None and datetime.now() < expires_at
 
 async def get_sections(language: Optional[str] = None, is_premium: Optional[bool] = None) -> List[Tuple[Any, ...]]:
     """Get sections, optionally filtered by language and premium status"""
+    if is_premium is None:
+        return await catalog_cache.sections(language)
+    
     query = "SELECT * FROM sections WHERE 1=1"
     params = []
     
@@ -244,13 +309,16 @@ async def get_sections(language: Optional[str] = None, is_premium: Optional[bool
     
     query += " ORDER BY created_at"
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute(query, params)
         return await cursor.fetchall()
 
 async def get_leaderboard(limit: int = 8) -> List[Tuple[Any, ...]]:
     """Get top users by comprehensive performance metrics"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    if rating_leaderboard.loaded:
+        return await rating_leaderboard.top_rows(limit)
+    
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT user_id, first_name, username, rating_score, words_learned, quiz_score_total, quiz_attempts
             FROM users 
@@ -267,28 +335,23 @@ async def get_leaderboard(limit: int = 8) -> List[Tuple[Any, ...]]:
 # Premium content functions
 async def add_premium_content(section_type: str, title: str, description: Optional[str] = None, file_id: Optional[str] = None, file_type: Optional[str] = None, content_text: Optional[str] = None) -> bool:
     """Add premium content to database"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             INSERT INTO premium_content (section_type, title, description, file_id, file_type, content_text, order_index)
             VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(order_index), 0) + 1 FROM premium_content WHERE section_type = ?))
         """, (section_type, title, description, file_id, file_type, content_text, section_type))
         await db.commit()
-        return True
+    catalog_cache.invalidate('premium_content', section_type)
+    return True
 
 async def get_premium_content(section_type: str) -> List[Tuple[Any, ...]]:
     """Get all premium content for a section"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("""
-            SELECT id, title, description, file_id, file_type, content_text, order_index
-            FROM premium_content 
-            WHERE section_type = ?
-            ORDER BY order_index ASC
-        """, (section_type,))
-        return await cursor.fetchall()
+    return await catalog_cache.premium_content(section_type)
 
 async def delete_premium_content(content_id: int) -> bool:
     """Delete premium content"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("DELETE FROM premium_content WHERE id = ?", (content_id,))
         await db.commit()
-        return True
\ No newline at end of file
+    catalog_cache.invalidate('premium_content')
+    return True
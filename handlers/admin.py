@@ -1,14 +1,25 @@
-import asyncio
-import aiosqlite
+import html
 from datetime import datetime
-from aiogram import Router, F, Bot
+from functools import wraps
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from config import BOT_TOKEN, ADMIN_ID, DATABASE_PATH, PREMIUM_PRICE_UZS
+from config import ADMIN_ID, PREMIUM_PRICE_UZS
 from database import get_user, update_user_activity
 from keyboards import get_admin_menu
+from utils.db_pool import db_pool
+from utils.premium_cache import premium_cache
+from utils.ai_conversation import ai_conversation
+from utils.catalog_cache import catalog_cache
+from utils.quiz_cache import quiz_cache
+from utils.keyboard_cache import keyboard_cache
+from utils.broadcast import start_broadcast
+from utils.quiz_analytics import roll_up, hardest_questions, quiz_summaries
+from utils.text_normalization import normalize
+from handlers.conversation import KOREAN_GRAMMAR_INDEX, JAPANESE_GRAMMAR_INDEX
 
 router = Router()
 
@@ -19,6 +30,8 @@ class AdminStates(StatesGroup):
 
 def admin_only(func):
     """Decorator to restrict access to admin only"""
+    # wraps() lets aiogram see the handler's own parameters and pass only those
+    @wraps(func)
     async def wrapper(update, *args, **kwargs):
         user_id = None
         if isinstance(update, Message):
@@ -59,7 +72,7 @@ async def admin_stats(callback: CallbackQuery):
         return
         
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
+        async with db_pool.reader() as db:
             # Total users
             cursor = await db.execute("SELECT COUNT(*) FROM users")
             result = await cursor.fetchone()
@@ -88,6 +101,13 @@ async def admin_stats(callback: CallbackQuery):
             result = await cursor.fetchone()
             total_quizzes = result[0] if result else 0
 
+        storage = db_pool.wal_report()
+        wal_mb = storage['wal_bytes'] / (1024 * 1024)
+        premium_stats = premium_cache.stats()
+        ai_stats = ai_conversation.contexts.stats()
+        keyboard_stats = keyboard_cache.stats()
+        ai_evicted = ai_stats['evicted_lru'] + ai_stats['evicted_expired'] + ai_stats['evicted_memory']
+
         stats_text = f"""📊 <b>Bot Statistikasi</b>
 
 👥 <b>Foydalanuvchilar:</b>
@@ -99,6 +119,13 @@ async def admin_stats(callback: CallbackQuery):
 • Bo'limlar: {total_sections}
 • Testlar: {total_quizzes}
 
+🗄 <b>Ma'lumotlar bazasi:</b>
+• Jurnal: {storage['journal_mode'] or "-"}
+• WAL hajmi: {wal_mb:.2f} MB
+• Premium kesh: {premium_stats['hits']} hit / {premium_stats['misses']} miss ({premium_stats['hit_rate']:.0f}%)
+• AI suhbat xotirasi: {ai_stats['users']} foydalanuvchi, {ai_stats['memory_mb']:.1f} MB, {ai_evicted} chiqarildi
+• Tugmalar keshi: {keyboard_stats['static'] + keyboard_stats['cached']} ta, {keyboard_stats['hit_rate']:.0f}% hit
+
 💰 <b>Premium narxi:</b> {PREMIUM_PRICE_UZS:,} so'm"""
 
         await callback.message.edit_text(
@@ -115,6 +142,61 @@ async def admin_stats(callback: CallbackQuery):
             ])
         )
 
+@router.callback_query(F.data == "admin_quiz_analytics")
+@admin_only
+async def admin_quiz_analytics(callback: CallbackQuery):
+    """Hardest questions and per-quiz averages from the rollup tables"""
+    back_keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Yangilash", callback_data="admin_quiz_analytics")],
+        [InlineKeyboardButton(text="🔙 Admin panel", callback_data="admin_panel")]
+    ])
+    try:
+        # Incremental - only answers since the last rollup are read
+        await roll_up()
+        questions = await hardest_questions(8)
+        quizzes = await quiz_summaries(8)
+        
+        text = "📈 <b>Test tahlili</b>\n\n🧠 <b>Testlar:</b>\n"
+        if not quizzes:
+            text += "Hozircha ma'lumot yo'q\n"
+        for _, title, attempts, avg_score, correct_rate, avg_seconds in quizzes:
+            duration = f"{int(avg_seconds // 60)}:{int(avg_seconds % 60):02d}" if avg_seconds else "-"
+            text += (f"• <b>{title}</b>: {attempts} urinish, o'rtacha {avg_score:.1f} ball, "
+                     f"{correct_rate or 0:.0f}% to'g'ri, ⏱ {duration}\n")
+        
+        text += "\n❓ <b>Eng qiyin savollar:</b>\n"
+        if not questions:
+            text += "Kamida 5 ta javob olgan savollar yo'q\n"
+        for _, title, question, answers, correct_rate, a, b, c, d, correct in questions:
+            short = question if len(question) <= 40 else question[:40] + "…"
+            text += (f"• {short} <i>({title})</i>\n"
+                     f"   {correct_rate:.0f}% to'g'ri ({answers} javob), to'g'ri: {correct}\n"
+                     f"   A:{a} B:{b} C:{c} D:{d}\n")
+        
+        await callback.message.edit_text(text, reply_markup=back_keyboard)
+    except Exception as e:
+        await callback.message.edit_text(f"❌ Xatolik: {str(e)}", reply_markup=back_keyboard)
+
+@router.message(Command("grammar_debug"))
+@admin_only
+async def admin_grammar_debug(message: Message, command: CommandObject):
+    """Which Grammar AI rules a question triggers: /grammar_debug <savol>"""
+    query = normalize(command.args or "").text
+    if not query:
+        await message.answer("Foydalanish: <code>/grammar_debug savol matni</code>")
+        return
+    
+    text = f"🔎 <b>Grammar AI qoidalari:</b> <code>{html.escape(query)}</code>\n"
+    for language, index in (("🇰🇷 Koreys", KOREAN_GRAMMAR_INDEX), ("🇯🇵 Yapon", JAPANESE_GRAMMAR_INDEX)):
+        hits = index.hits(query)
+        text += f"\n<b>{language}:</b>\n"
+        if not hits:
+            text += "• mos qoida yo'q (umumiy javob)\n"
+        for position, (rule_id, priority, keywords) in enumerate(hits):
+            mark = "✅" if position == 0 else "▫️"
+            text += f"{mark} <code>{rule_id}</code> (#{priority}): {html.escape(', '.join(keywords))}\n"
+    await message.answer(text)
+
 # ================================ 
 # BROADCAST SYSTEM
 # ================================
@@ -188,23 +270,28 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
     """Execute broadcast"""
     data = await state.get_data()
     
-    if not data or not callback.message:
+    if not data or not callback.message or not data.get("message_text"):
         await callback.answer("❌ Xatolik!", show_alert=True)
         return
-        
-    await callback.message.edit_text("🚀 Yuborilmoqda...")
     
-    # Send to all users
-    sent_count = await send_broadcast_message(data)
+    await callback.message.edit_text("🚀 Yuborilmoqda...")
     
-    await state.clear()
-    await callback.message.edit_text(
-        f"✅ <b>Xabar yuborildi!</b>\n\n"
-        f"📊 {sent_count} ta foydalanuvchiga yuborildi",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🔙 Admin panel", callback_data="admin_panel")]
-        ])
+    # Queued in the outbox and sent in the background; progress is edited into this message
+    job_id = await start_broadcast(
+        callback.bot,
+        data["message_text"],
+        chat_id=callback.message.chat.id,
+        message_id=callback.message.message_id
     )
+    await state.clear()
+    
+    if job_id is None:
+        await callback.message.edit_text(
+            "❌ Xabar yuboriladigan foydalanuvchilar topilmadi.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔙 Admin panel", callback_data="admin_panel")]
+            ])
+        )
 
 @router.callback_query(F.data == "cancel_broadcast")
 @admin_only
@@ -222,41 +309,6 @@ async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
         ])
     )
 
-async def send_broadcast_message(data):
-    """Send message to all active users"""
-    bot = Bot(token=BOT_TOKEN)
-    sent_count = 0
-    
-    try:
-        # Get all users
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            cursor = await db.execute("SELECT user_id FROM users")
-            users = await cursor.fetchall()
-        
-        message_text = data.get("message_text", "")
-        
-        if not message_text:
-            return 0
-            
-        for (user_id,) in users:
-            try:
-                await bot.send_message(user_id, message_text)
-                sent_count += 1
-                await asyncio.sleep(0.05)  # Rate limiting
-            except Exception:
-                continue
-        
-        await bot.session.close()
-        return sent_count
-        
-    except Exception as e:
-        print(f"Broadcast error: {e}")
-        try:
-            await bot.session.close()
-        except:
-            pass
-        return sent_count
-
 # ================================
 # SECTION MANAGEMENT  
 # ================================
@@ -303,12 +355,13 @@ async def create_section_process(message: Message, state: FSMContext):
         language = parts[1].strip()
         is_premium = parts[2].strip().lower() in ['ha', 'yes', 'true', '1']
         
-        async with aiosqlite.connect(DATABASE_PATH) as db:
+        async with db_pool.writer() as db:
             await db.execute("""
                 INSERT INTO sections (name, language, is_premium, created_by)
                 VALUES (?, ?, ?, ?)
             """, (name, language, is_premium, ADMIN_ID))
             await db.commit()
+        catalog_cache.invalidate('sections')
         
         await state.clear()
         premium_text = "Ha" if is_premium else "Yoq"
@@ -372,12 +425,14 @@ async def create_quiz_process(message: Message, state: FSMContext):
         language = parts[2].strip()
         is_premium = parts[3].strip().lower() in ['ha', 'yes', 'true', '1']
         
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            await db.execute("""
+        async with db_pool.writer() as db:
+            cursor = await db.execute("""
                 INSERT INTO quizzes (title, description, language, is_premium, created_by)
                 VALUES (?, ?, ?, ?, ?)
             """, (title, description, language, is_premium, ADMIN_ID))
             await db.commit()
+        # Also drops the quiz list keyboards
+        quiz_cache.invalidate(cursor.lastrowid)
         
         await state.clear()
         premium_text = "Ha" if is_premium else "Yoq"
@@ -3,11 +3,11 @@ from aiogram.types import CallbackQuery, InputMediaPhoto, InputMediaVideo, Input
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from database import get_sections, is_premium_active
+from database import is_premium_active
 from keyboards import get_languages_keyboard, get_sections_keyboard, get_subsections_keyboard, get_content_keyboard
 from utils.rating_system import update_user_rating
-import aiosqlite
-from config import DATABASE_PATH
+from utils.db_pool import db_pool
+from utils.catalog_cache import catalog_cache
 
 router = Router()
 
@@ -27,7 +27,7 @@ async def show_sections(callback: CallbackQuery):
     # Update user rating for language selection
     await update_user_rating(user_id, 'content_access')
     
-    sections = await get_sections(language=language)
+    sections = await catalog_cache.sections(language)
     
     if not sections:
         await callback.message.edit_text(
@@ -50,18 +50,13 @@ async def show_subsections(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Check if section requires premium
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT name, is_premium, language FROM sections WHERE id = ?", 
-            (section_id,)
-        )
-        section = await cursor.fetchone()
+    section = await catalog_cache.section(section_id)
     
     if not section:
         await callback.answer("❌ Bo'lim topilmadi!", show_alert=True)
         return
     
-    section_name, is_premium_section, language = section
+    section_name, is_premium_section, language = section[1], section[4], section[3]
     
     # Check premium access
     if is_premium_section and not await is_premium_active(user_id):
@@ -72,18 +67,13 @@ async def show_subsections(callback: CallbackQuery):
         return
     
     # Get subsections
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT * FROM subsections WHERE section_id = ? ORDER BY id",
-            (section_id,)
-        )
-        subsections = await cursor.fetchall()
+    subsections = await catalog_cache.subsections(section_id)
     
     if not subsections:
         await callback.message.edit_text(
             f"📚 <b>{section_name}</b>\n\n"
             "❌ Bu bo'limda hozircha pastki bo'limlar mavjud emas.",
-            reply_markup=get_sections_keyboard(await get_sections(language=language), language)
+            reply_markup=get_sections_keyboard(await catalog_cache.sections(language), language)
         )
         return
     
@@ -104,14 +94,7 @@ async def show_content(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Check if subsection requires premium
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("""
-            SELECT s.name, s.is_premium, sec.name, sec.language, sec.id
-            FROM subsections s
-            JOIN sections sec ON s.section_id = sec.id
-            WHERE s.id = ?
-        """, (subsection_id,))
-        subsection_info = await cursor.fetchone()
+    subsection_info = await catalog_cache.subsection(subsection_id)
     
     if not subsection_info:
         await callback.answer("❌ Pastki bo'lim topilmadi!", show_alert=True)
@@ -128,12 +111,7 @@ async def show_content(callback: CallbackQuery):
         return
     
     # Get content
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT id, subsection_id, title, file_id, file_type, caption, is_premium, created_at FROM content WHERE subsection_id = ? ORDER BY created_at",
-            (subsection_id,)
-        )
-        content_items = await cursor.fetchall()
+    content_items = await catalog_cache.content(subsection_id)
     
     if not content_items:
         await callback.message.edit_text(
@@ -163,7 +141,7 @@ async def show_content_item(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Get content details
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT c.*, s.name as subsection_name, sec.name as section_name, 
                    sec.language, s.section_id, c.subsection_id
@@ -192,7 +170,7 @@ async def show_content_item(callback: CallbackQuery):
     await update_user_rating(user_id, 'content_complete')
     
     # Mark content as viewed
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             INSERT OR REPLACE INTO user_progress (user_id, content_id, completed, completed_at)
             VALUES (?, ?, 1, CURRENT_TIMESTAMP)
@@ -302,14 +280,8 @@ async def handle_back_navigation(callback: CallbackQuery):
 # Yordamchi funksiyalar orqaga qaytish uchun
 async def show_sections_for_language(callback: CallbackQuery, language: str):
     """Tilga qarab bo'limlarni ko'rsatish"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("""
-            SELECT id, name, description, is_premium 
-            FROM sections 
-            WHERE language = ? 
-            ORDER BY created_at
-        """, (language,))
-        sections = await cursor.fetchall()
+    # (id, name, description, is_premium)
+    sections = [(s[0], s[1], s[2], s[4]) for s in await catalog_cache.sections(language)]
     
     if not sections:
         await callback.message.edit_text(
@@ -340,23 +312,16 @@ async def show_sections_for_language(callback: CallbackQuery, language: str):
 
 async def show_subsections_for_section(callback: CallbackQuery, section_id: int):
     """Bo'limga qarab pastki bo'limlarni ko'rsatish"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Bo'lim ma'lumotlarini olish
-        cursor = await db.execute("SELECT name, language FROM sections WHERE id = ?", (section_id,))
-        section = await cursor.fetchone()
-        
-        if not section:
-            await callback.answer("❌ Bo'lim topilmadi!", show_alert=True)
-            return
-        
-        # Pastki bo'limlarni olish
-        cursor = await db.execute("""
-            SELECT id, name, description, is_premium 
-            FROM subsections 
-            WHERE section_id = ? 
-            ORDER BY id
-        """, (section_id,))
-        subsections = await cursor.fetchall()
+    # Bo'lim ma'lumotlarini olish
+    section_row = await catalog_cache.section(section_id)
+    
+    if not section_row:
+        await callback.answer("❌ Bo'lim topilmadi!", show_alert=True)
+        return
+    
+    # (name, language) va pastki bo'limlar: (id, name, description, is_premium)
+    section = (section_row[1], section_row[3])
+    subsections = [(s[0], s[2], s[3], s[4]) for s in await catalog_cache.subsections(section_id)]
     
     if not subsections:
         await callback.message.edit_text(
@@ -389,28 +354,16 @@ async def show_subsections_for_section(callback: CallbackQuery, section_id: int)
 
 async def show_content_for_subsection(callback: CallbackQuery, subsection_id: int):
     """Pastki bo'limga qarab kontentlarni ko'rsatish"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Pastki bo'lim va bo'lim ma'lumotlarini olish
-        cursor = await db.execute("""
-            SELECT s.name, s.section_id, sec.name, sec.language 
-            FROM subsections s
-            JOIN sections sec ON s.section_id = sec.id
-            WHERE s.id = ?
-        """, (subsection_id,))
-        subsection_info = await cursor.fetchone()
-        
-        if not subsection_info:
-            await callback.answer("❌ Pastki bo'lim topilmadi!", show_alert=True)
-            return
-        
-        # Kontentlarni olish
-        cursor = await db.execute("""
-            SELECT id, title, file_type, is_premium
-            FROM content 
-            WHERE subsection_id = ? 
-            ORDER BY id
-        """, (subsection_id,))
-        contents = await cursor.fetchall()
+    # Pastki bo'lim va bo'lim ma'lumotlarini olish
+    subsection_row = await catalog_cache.subsection(subsection_id)
+    
+    if not subsection_row:
+        await callback.answer("❌ Pastki bo'lim topilmadi!", show_alert=True)
+        return
+    
+    # (name, section_id, section name, language) va kontentlar: (id, title, file_type, is_premium)
+    subsection_info = (subsection_row[0], subsection_row[4], subsection_row[2], subsection_row[3])
+    contents = sorted((c[0], c[2], c[4], c[6]) for c in await catalog_cache.content(subsection_id))
     
     if not contents:
         await callback.message.edit_text(
@@ -443,7 +396,7 @@ async def show_content_for_subsection(callback: CallbackQuery, subsection_id: in
 async def show_user_progress(callback: CallbackQuery):
     user_id = callback.from_user.id
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         # Get completed content count by language
         cursor = await db.execute("""
             SELECT sec.language, COUNT(up.id) as completed_count
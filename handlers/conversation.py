@@ -7,7 +7,6 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import asyncio
 import random
 
 from config import ADMIN_ID
@@ -15,6 +14,9 @@ from database import get_user, is_premium_active
 from keyboards import get_main_menu, get_grammar_ai_menu
 from utils.rating_system import update_user_rating
 from utils.ai_conversation import get_ai_response
+from utils.keyword_matcher import RuleIndex, first_match_matcher
+from utils.text_normalization import normalize, fold, HANGUL, KANA, KANJI
+from utils.pacing import reply_pacer
 
 router = Router()
 
@@ -505,18 +507,25 @@ JAPANESE_RESPONSES = {
     ]
 }
 
+# Lug'at kalitlari bo'yicha bir marta quriladigan avtomatlar (birinchi mos kalit ustun)
+KOREAN_KEYS = list(KOREAN_RESPONSES)
+JAPANESE_KEYS = list(JAPANESE_RESPONSES)
+# A few hundred keys: the plain loop, the automaton only pays off on larger tables
+KOREAN_MATCHER = first_match_matcher(fold(key) for key in KOREAN_KEYS)
+JAPANESE_MATCHER = first_match_matcher(fold(key) for key in JAPANESE_KEYS)
+
 def get_korean_response(user_text):
     """Kores matni uchun javob topish"""
-    user_text = user_text.strip().lower()
+    normalized = normalize(user_text)
+    user_text = normalized.text
     
     # To'g'ridan-to'g'ri mos kelish
-    for key, responses in KOREAN_RESPONSES.items():
-        if key in user_text:
-            return random.choice(responses)
+    index = KOREAN_MATCHER.first_index(user_text)
+    if index is not None:
+        return random.choice(KOREAN_RESPONSES[KOREAN_KEYS[index]])
     
     # Kores harflari borligini tekshirish
-    korean_pattern = re.compile(r'[가-힣]')
-    if korean_pattern.search(user_text):
+    if normalized.has(HANGUL):
         return random.choice(KOREAN_RESPONSES["default"])
     
     # Ingliz tili uchun kores tarjima
@@ -533,16 +542,16 @@ def get_korean_response(user_text):
 
 def get_japanese_response(user_text):
     """Yapon matni uchun javob topish"""
-    user_text = user_text.strip().lower()
+    normalized = normalize(user_text)
+    user_text = normalized.text
     
     # To'g'ridan-to'g'ri mos kelish
-    for key, responses in JAPANESE_RESPONSES.items():
-        if key in user_text:
-            return random.choice(responses)
+    index = JAPANESE_MATCHER.first_index(user_text)
+    if index is not None:
+        return random.choice(JAPANESE_RESPONSES[JAPANESE_KEYS[index]])
     
     # Yapon harflari borligini tekshirish
-    japanese_pattern = re.compile(r'[ひらがなカタカナ漢字]|[あ-ん]|[ア-ン]|[一-龯]')
-    if japanese_pattern.search(user_text):
+    if normalized.has(KANA, KANJI):
         return random.choice(JAPANESE_RESPONSES["default"])
     
     # Ingliz tili uchun yapon tarjima
@@ -678,7 +687,7 @@ async def handle_korean_conversation(message: Message, state: FSMContext):
     user_text = message.text
     
     # Chiqish buyruqlari
-    if user_text.lower() in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
+    if normalize(user_text).text in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
         await state.clear()
         await message.answer(
             "🇰🇷 Kores suhbat tugadi!\n\n수고하셨습니다! (Sugohasseumnida!)\nYaxshi ishlading! 👏",
@@ -692,10 +701,9 @@ async def handle_korean_conversation(message: Message, state: FSMContext):
     # Reyting qo'shish
     await update_user_rating(user_id, "session_start", 1.5)
     
-    # Thinking delay simulation (realistic AI behavior)
-    await asyncio.sleep(random.uniform(0.5, 1.2))
-    
-    await message.answer(
+    # Thinking delay simulation (realistic AI behavior) - sent from a background task
+    await reply_pacer.reply(
+        message,
         f"🤖 <b>AI Teacher:</b>\n\n{response}\n\n💡 <i>Professional AI bilan suhbatlashdingiz! +1.5 reyting!</i>"
     )
 
@@ -716,7 +724,7 @@ async def handle_japanese_conversation(message: Message, state: FSMContext):
     user_text = message.text
     
     # Chiqish buyruqlari
-    if user_text.lower() in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
+    if normalize(user_text).text in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
         await state.clear()
         await message.answer(
             "🇯🇵 Yapon suhbat tugadi!\n\nお疲れ様でした！(Otsukaresama deshita!)\nYaxshi ishlading! 👏",
@@ -730,10 +738,9 @@ async def handle_japanese_conversation(message: Message, state: FSMContext):
     # Reyting qo'shish
     await update_user_rating(user_id, "session_start", 1.5)
     
-    # Thinking delay simulation (realistic AI behavior)
-    await asyncio.sleep(random.uniform(0.5, 1.2))
-    
-    await message.answer(
+    # Thinking delay simulation (realistic AI behavior) - sent from a background task
+    await reply_pacer.reply(
+        message,
         f"🤖 <b>AI Teacher:</b>\n\n{response}\n\n💡 <i>Professional AI bilan suhbatlashdingiz! +1.5 reyting!</i>"
     )
 
@@ -1010,7 +1017,7 @@ async def handle_korean_grammar(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    user_text = message.text.lower().strip()
+    user_text = normalize(message.text).text
     
     # Exit commands
     if user_text in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
@@ -1022,7 +1029,7 @@ async def handle_korean_grammar(message: Message, state: FSMContext):
         return
     
     # Get grammar explanation
-    response = get_korean_grammar_explanation(user_text)
+    response = get_korean_grammar_explanation(message.text)
     
     # Add rating
     await update_user_rating(user_id, "session_start", 2.0)
@@ -1045,7 +1052,7 @@ async def handle_japanese_grammar(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    user_text = message.text.lower().strip()
+    user_text = normalize(message.text).text
     
     # Exit commands
     if user_text in ['/stop', 'chiqish', 'stop', 'exit', 'quit']:
@@ -1057,7 +1064,7 @@ async def handle_japanese_grammar(message: Message, state: FSMContext):
         return
     
     # Get grammar explanation
-    response = get_japanese_grammar_explanation(user_text)
+    response = get_japanese_grammar_explanation(message.text)
     
     # Add rating
     await update_user_rating(user_id, "session_start", 2.0)
@@ -1070,248 +1077,188 @@ async def handle_japanese_grammar(message: Message, state: FSMContext):
 # GRAMMAR AI FUNCTIONS - SMART PATTERN MATCHING
 # ================================
 
-def get_korean_grammar_explanation(user_input):
-    """Kores grammar tushuntirish AI funksiyasi"""
-    input_text = user_input.lower()
-    
-    # 은/는 - Subject particle
-    if any(word in input_text for word in ["은", "는", "eun", "neun", "mavzu", "subject"]):
-        return """📚 <b>은/는 - Mavzu belgisi</b>
+# Grammar AI rules: (rule id, trigger keywords, priority, answer). A question
+# gets the answer of the lowest-priority rule with a keyword in it.
+KOREAN_GRAMMAR_RULES = (
+    ("eun_neun", ("은", "는", "eun", "neun", "mavzu", "subject"), 10, """📚 <b>은/는 - Mavzu belgisi</b>
 
 🔍 <b>Qoida:</b> Gapning mavzusini ko'rsatadi
 💡 <b>Misollar:</b>
 1. 저는 학생입니다 "Men talabaman"
 2. 책은 재미있어요 "Kitob qiziqarli"
-🎯 <b>Qoida:</b> Undosh + 은, Unli + 는"""
+🎯 <b>Qoida:</b> Undosh + 은, Unli + 는"""),
 
-    elif any(word in input_text for word in ["이", "가", "i", "ga", "egalik"]):
-        return """📚 <b>이/가 - Egalik belgisi</b>
+    ("i_ga", ("이", "가", "i", "ga", "egalik"), 20, """📚 <b>이/가 - Egalik belgisi</b>
 
 🔍 <b>Qoida:</b> Gapning egasini aniq ko'rsatadi
 💡 <b>Misollar:</b>
 1. 고양이가 귀여워요 "Mushuk chiroyli"
 2. 사람이 많아요 "Odam ko'p"
-🎯 <b>Qoida:</b> Undosh + 이, Unli + 가"""
+🎯 <b>Qoida:</b> Undosh + 이, Unli + 가"""),
 
-    elif any(word in input_text for word in ["을", "를", "eul", "reul", "to'ldiruvchi"]):
-        return """📚 <b>을/를 - To'ldiruvchi belgisi</b>
+    ("eul_reul", ("을", "를", "eul", "reul", "to'ldiruvchi"), 30, """📚 <b>을/를 - To'ldiruvchi belgisi</b>
 
 🔍 <b>Qoida:</b> Fe'lning to'ldiruvchisini ko'rsatadi
 💡 <b>Misollar:</b>
 1. 사과를 먹어요 "Olma yeyapman"
 2. 책을 읽어요 "Kitob o'qiyapman"
-🎯 <b>Qoida:</b> Undosh + 을, Unli + 를"""
+🎯 <b>Qoida:</b> Undosh + 을, Unli + 를"""),
 
-    elif any(word in input_text for word in ["하다", "hada", "qilmoq"]):
-        return """📚 <b>하다 - "Qilmoq" fe'li</b>
+    ("hada", ("하다", "hada", "qilmoq"), 40, """📚 <b>하다 - "Qilmoq" fe'li</b>
 
 🔍 <b>Qoida:</b> Koreaning asosiy fe'li
 💡 <b>Misollar:</b>
 1. 공부하다 → 공부해요 "O'qimoq → O'qiyapman"
 2. 운동하다 → 운동했어요 "Sport qilmoq → Sport qildim"
-🎯 <b>Ko'p so'zlar bilan birikadi</b>"""
+🎯 <b>Ko'p so'zlar bilan birikadi</b>"""),
 
-    elif any(word in input_text for word in ["습니다", "seumnida", "rasmiy"]):
-        return """📚 <b>습니다/ㅂ니다 - Rasmiy hozirgi</b>
+    ("seumnida", ("습니다", "seumnida", "rasmiy"), 50, """📚 <b>습니다/ㅂ니다 - Rasmiy hozirgi</b>
 
 🔍 <b>Qoida:</b> Eng rasmiy so'lash shakli
 💡 <b>Misollar:</b>
 1. 먹습니다 "Yeyapman" (rasmiy)
 2. 갑니다 "Borayapman" (rasmiy)
-🎯 <b>Undosh + 습니다, Unli + ㅂ니다</b>"""
+🎯 <b>Undosh + 습니다, Unli + ㅂ니다</b>"""),
 
-    elif any(word in input_text for word in ["아요", "어요", "ayo", "eoyo", "norasmiy"]):
-        return """📚 <b>아요/어요 - Norasmiy hozirgi</b>
+    ("ayo_eoyo", ("아요", "어요", "ayo", "eoyo", "norasmiy"), 60, """📚 <b>아요/어요 - Norasmiy hozirgi</b>
 
 🔍 <b>Qoida:</b> Kundalik suhbatda ishlatiladi
 💡 <b>Misollar:</b>
 1. 가요 "Borayapman"
 2. 먹어요 "Yeyapman"
-🎯 <b>A/O unli + 아요, boshqa + 어요</b>"""
+🎯 <b>A/O unli + 아요, boshqa + 어요</b>"""),
 
-    elif any(word in input_text for word in ["었다", "eotda", "o'tgan"]):
-        return """📚 <b>었다/았다 - O'tgan zamon</b>
+    ("eotda", ("었다", "eotda", "o'tgan"), 70, """📚 <b>었다/았다 - O'tgan zamon</b>
 
 🔍 <b>Qoida:</b> O'tgan zamondagi harakat
 💡 <b>Misollar:</b>
 1. 갔어요 "Bordim"
 2. 먹었어요 "Yedim"
-🎯 <b>A/O unli + 았, boshqa + 었</b>"""
+🎯 <b>A/O unli + 았, boshqa + 었</b>"""),
 
-    elif any(word in input_text for word in ["겠다", "getda", "kelajak"]):
-        return """📚 <b>겠다 - Kelajak zamon</b>
+    ("getda", ("겠다", "getda", "kelajak"), 80, """📚 <b>겠다 - Kelajak zamon</b>
 
 🔍 <b>Qoida:</b> Kelajakdagi reja va niyat
 💡 <b>Misollar:</b>
 1. 가겠어요 "Boraman"
 2. 공부하겠습니다 "O'qiyman"
-🎯 <b>Yumshoq vada va ehtimollik</b>"""
+🎯 <b>Yumshoq vada va ehtimollik</b>"""),
 
-    # EXTENDED LEVEL 1A-4B GRAMMAR PATTERNS
-    # 에서 - Location particle 
-    elif any(word in input_text for word in ["에서", "eseo", "joy", "location", "da", "dan"]):
-        return """📚 <b>에서 - Joy belgisi ("da/dan")</b>
+    ("eseo", ("에서", "eseo", "joy", "location", "da", "dan"), 90, """📚 <b>에서 - Joy belgisi ("da/dan")</b>
 
 🔍 <b>Qoida:</b> Harakat qilinadigan joyni ko'rsatadi
 💡 <b>Misollar:</b>
 1. 학교에서 공부해요 "Maktabda o'qiyapman"
 2. 집에서 쉬어요 "Uyda dam olayapman"
-🎯 <b>에 dan farqi:</b> 에서 - harakat joyi, 에 - maqsad joyi"""
+🎯 <b>에 dan farqi:</b> 에서 - harakat joyi, 에 - maqsad joyi"""),
 
-    # 에게 - To someone
-    elif any(word in input_text for word in ["에게", "ege", "kimga", "to", "someone"]):
-        return """📚 <b>에게 - "Kimga" belgisi</b>
+    ("ege", ("에게", "ege", "kimga", "to", "someone"), 100, """📚 <b>에게 - "Kimga" belgisi</b>
 
 🔍 <b>Qoida:</b> Insonlar uchun "kimga" ma'nosida
 💡 <b>Misollar:</b>
 1. 친구에게 편지를 써요 "Do'stga xat yozayapman"
 2. 개에게 밥을 줘요 "Itga ovqat berayapman"
-🎯 한테 = 에게 (norasmiy = rasmiy)"""
+🎯 한테 = 에게 (norasmiy = rasmiy)"""),
 
-    # 부터 - From/Since
-    elif any(word in input_text for word in ["부터", "buteo", "boshlab", "from", "dan"]):
-        return """📚 <b>부터 - "Dan boshlab" belgisi</b>
+    ("buteo", ("부터", "buteo", "boshlab", "from", "dan"), 110, """📚 <b>부터 - "Dan boshlab" belgisi</b>
 
 🔍 <b>Qoida:</b> Boshlanish nuqtasini ko'rsatadi
 💡 <b>Misollar:</b>
 1. 9시부터 일해요 "9 dan boshlab ishlayman"
 2. 월요일부터 바빠요 "Dushanba dan boshlab bandman"
-🎯 까지 bilan: 부터...까지 "dan...gacha" """
+🎯 까지 bilan: 부터...까지 "dan...gacha" """),
 
-    # 까지 - Until/To
-    elif any(word in input_text for word in ["까지", "kkaji", "gacha", "until", "to"]):
-        return """📚 <b>까지 - "Gacha" belgisi</b>
+    ("kkaji", ("까지", "kkaji", "gacha", "until", "to"), 120, """📚 <b>까지 - "Gacha" belgisi</b>
 
 🔍 <b>Qoida:</b> Tugash nuqtasini ko'rsatadi
 💡 <b>Misollar:</b>
 1. 5시까지 일해요 "5 gacha ishlayman"
 2. 역까지 걸어가요 "Bekatgacha piyoda boraman"
-🎯 부터 bilan: 부터...까지 "dan...gacha" """
+🎯 부터 bilan: 부터...까지 "dan...gacha" """),
 
-    # 와/과 - With
-    elif any(word in input_text for word in ["와", "과", "wa", "gwa", "bilan", "with"]):
-        return """📚 <b>와/과 - "Bilan" belgisi</b>
+    ("wa_gwa", ("와", "과", "wa", "gwa", "bilan", "with"), 130, """📚 <b>와/과 - "Bilan" belgisi</b>
 
 🔍 <b>Qoida:</b> Unli keyin 와, undosh keyin 과
 💡 <b>Misollar:</b>
 1. 친구와 영화를 봐요 "Do'st bilan kino ko'rayapman"
 2. 가족과 여행해요 "Oila bilan sayohat qilaman"
-🎯 하고 = 와/과 (norasmiy = rasmiy)"""
+🎯 하고 = 와/과 (norasmiy = rasmiy)"""),
 
-    # 도 - Also/Too
-    elif any(word in input_text for word in ["도", "do", "ham", "also", "too"]):
-        return """📚 <b>도 - "Ham" belgisi</b>
+    ("do", ("도", "do", "ham", "also", "too"), 140, """📚 <b>도 - "Ham" belgisi</b>
 
 🔍 <b>Qoida:</b> "Ham", "shuningdek" ma'nosida
 💡 <b>Misollar:</b>
 1. 저도 학생이에요 "Men ham talabaman"  
 2. 사과도 좋아해요 "Olma ham yoqadi"
-🎯 은/는, 이/가 o'rniga ishlatiladi"""
+🎯 은/는, 이/가 o'rniga ishlatiladi"""),
 
-    # 만 - Only
-    elif any(word in input_text for word in ["만", "man", "faqat", "only", "just"]):
-        return """📚 <b>만 - "Faqat" belgisi</b>
+    ("man", ("만", "man", "faqat", "only", "just"), 150, """📚 <b>만 - "Faqat" belgisi</b>
 
 🔍 <b>Qoida:</b> Cheklashni bildiradi
 💡 <b>Misollar:</b>
 1. 물만 마셔요 "Faqat suv ichaman"
 2. 한국어만 공부해요 "Faqat koreys tilini o'rganaman"
-🎯 Boshqa belgilar bilan almashtiriladi"""
+🎯 Boshqa belgilar bilan almashtiriladi"""),
 
-    # 고 - And (sequential)
-    elif any(word in input_text for word in ["고", "go", "va", "and", "birga", "keyin"]):
-        return """📚 <b>고 - "Va" bog'lovchisi</b>
+    ("go", ("고", "go", "va", "and", "birga", "keyin"), 160, """📚 <b>고 - "Va" bog'lovchisi</b>
 
 🔍 <b>Qoida:</b> Ikki harakatni ketma-ket bog'laydi
 💡 <b>Misollar:</b>
 1. 집에 가고 쉬어요 "Uyga borib dam olaman"
 2. 밥을 먹고 커피를 마셔요 "Ovqat yeyib kofe ichaman"
-🎯 Vaqt tartibini bildiradi"""
+🎯 Vaqt tartibini bildiradi"""),
 
-    # 지만 - But
-    elif any(word in input_text for word in ["지만", "jiman", "lekin", "but", "ammo"]):
-        return """📚 <b>지만 - "Lekin" bog'lovchisi</b>
+    ("jiman", ("지만", "jiman", "lekin", "but", "ammo"), 170, """📚 <b>지만 - "Lekin" bog'lovchisi</b>
 
 🔍 <b>Qoida:</b> Qarama-qarshilikni bildiradi
 💡 <b>Misollar:</b>
 1. 비싸지만 좋아요 "Qimmat lekin yaxshi"
 2. 어렵지만 재미있어요 "Qiyin lekin qiziqarli"
-🎯 Ikki qarama-qarshi fikrni bog'laydi"""
+🎯 Ikki qarama-qarshi fikrni bog'laydi"""),
 
-    # 려고 - Intention
-    elif any(word in input_text for word in ["려고", "ryeogo", "uchun", "maqsad", "moqchi"]):
-        return """📚 <b>려고 하다 - Maqsad bildiruvchi</b>
+    ("ryeogo", ("려고", "ryeogo", "uchun", "maqsad", "moqchi"), 180, """📚 <b>려고 하다 - Maqsad bildiruvchi</b>
 
 🔍 <b>Qoida:</b> Maqsad va niyatni bildiradi
 💡 <b>Misollar:</b>
 1. 한국에 가려고 해요 "Koreyaga bormoqchiman"
 2. 공부하려고 해요 "O'qimoqchiman"
-🎯 Rejalar va niyatlar uchun"""
+🎯 Rejalar va niyatlar uchun"""),
 
-    # 는데 - Background information
-    elif any(word in input_text for word in ["는데", "neunde", "ammo", "situation", "holat"]):
-        return """📚 <b>는데 - Holat bildiruvchi</b>
+    ("neunde", ("는데", "neunde", "ammo", "situation", "holat"), 190, """📚 <b>는데 - Holat bildiruvchi</b>
 
 🔍 <b>Qoida:</b> Holat va tushuntirishni bildiradi
 💡 <b>Misollar:</b>
 1. 비가 오는데 나갈까요? "Yomg'ir yog'yapti, chiqamizmi?"
 2. 음식이 맛있는데 비싸요 "Taom mazali, lekin qimmat"
-🎯 Ma'lumot berish va qarshilik"""
+🎯 Ma'lumot berish va qarshilik"""),
 
-    # 아도/어도 - Even if
-    elif any(word in input_text for word in ["아도", "어도", "ado", "eodo", "garchi", "ham"]):
-        return """📚 <b>아도/어도 - "Garchi" sharti</b>
+    ("ado_eodo", ("아도", "어도", "ado", "eodo", "garchi", "ham"), 200, """📚 <b>아도/어도 - "Garchi" sharti</b>
 
 🔍 <b>Qoida:</b> "Garchi...ham" ma'nosida
 💡 <b>Misollar:</b>
 1. 비가 와도 갈게요 "Yomg'ir yog'sa ham boraman"
 2. 어려워도 할게요 "Qiyin bo'lsa ham qilaman"
-🎯 A/O unli keyin 아도, boshqa keyin 어도"""
+🎯 A/O unli keyin 아도, boshqa keyin 어도"""),
 
-    # 거든요 - Because (casual)
-    elif any(word in input_text for word in ["거든요", "geodeunyo", "chunki", "because", "sabab"]):
-        return """📚 <b>거든요 - Sabab bildiruvchi</b>
+    ("geodeunyo", ("거든요", "geodeunyo", "chunki", "because", "sabab"), 210, """📚 <b>거든요 - Sabab bildiruvchi</b>
 
 🔍 <b>Qoida:</b> Norasmiy sabab tushuntirish
 💡 <b>Misollar:</b>
 1. 못 가요. 바쁘거든요 "Bora olmayman. Bandman chunki"
 2. 좋아해요. 맛있거든요 "Yoqadi. Mazali chunki"
-🎯 Sabab va dalil berish"""
-
-    # Default response for unknown grammar
-    else:
-        return f"""🤖 <b>Grammar AI - Professional Level</b>
-
-🔍 <b>Sizning savolingiz:</b> "{user_input}"
+🎯 Sabab va dalil berish"""),
+)
 
-📚 <b>AI tahlili:</b> 40+ grammar qoidasi ichidan mos javob topilmadi.
-
-💡 <b>LEVEL 1A-1B:</b> 은/는, 이/가, 을/를, 에서, 에게, 와/과, 도, 만
-💡 <b>LEVEL 2A-2B:</b> 고, 지만, 려고, 던, ㄴ다면  
-💡 <b>LEVEL 3A-3B:</b> 는데, 기로, 아도/어도, 므로
-💡 <b>LEVEL 4A-4B:</b> 더라면, 다가, 거든요, 더니
-
-🎯 <b>Misol:</b> "에서 nima?", "지만 qanday?", "거든요 ishlatish"
-
-Professional Grammar AI - 40+ qoida bilan xizmatdasiz! 📖"""
-
-def get_japanese_grammar_explanation(user_input):
-    """Yapon grammar tushuntirish AI funksiyasi"""
-    input_text = user_input.lower()
-    
-    # は (wa) - Topic particle
-    if any(word in input_text for word in ["は", "wa", "mavzu", "topic"]):
-        return """📚 <b>は (wa) - Mavzu belgisi</b>
+JAPANESE_GRAMMAR_RULES = (
+    ("wa", ("は", "wa", "mavzu", "topic"), 10, """📚 <b>は (wa) - Mavzu belgisi</b>
 
 🔍 <b>Qoida:</b> は harfi "wa" deb o'qiladi
 💡 <b>Misollar:</b>
 1. 私は学生です "Men talabaman"
 2. 本は面白いです "Kitob qiziqarli"
-🎯 <b>Eslab qoling:</b> は = "wa" tovushi"""
+🎯 <b>Eslab qoling:</b> は = "wa" tovushi"""),
 
-    # が (ga) - Subject particle
-    elif any(word in input_text for word in ["が", "ga", "egalik", "subject"]):
-        return """📚 <b>が (ga) - Egalik belgisi</b>
+    ("ga", ("が", "ga", "egalik", "subject"), 20, """📚 <b>が (ga) - Egalik belgisi</b>
 
 🔍 <b>Qoida:</b>
 • Gapning egasini aniq ko'rsatadi
@@ -1325,11 +1272,9 @@ def get_japanese_grammar_explanation(user_input):
 2. 誰が来ますか？ (dare ga kimasu ka?)
    "Kim keladi?"
 
-🎯 <b>Eslab qoling:</b> は dan farqli, aniq egani ko'rsatadi"""
+🎯 <b>Eslab qoling:</b> は dan farqli, aniq egani ko'rsatadi"""),
 
-    # を (wo) - Object particle  
-    elif any(word in input_text for word in ["を", "wo", "o", "to'ldiruvchi", "object"]):
-        return """📚 <b>を (wo) - To'ldiruvchi belgisi</b>
+    ("wo", ("を", "wo", "o", "to'ldiruvchi", "object"), 30, """📚 <b>を (wo) - To'ldiruvchi belgisi</b>
 
 🔍 <b>Qoida:</b>
 • を harfi "wo" deb o'qiladi (o emas!)
@@ -1343,11 +1288,9 @@ def get_japanese_grammar_explanation(user_input):
 2. 本を読みます (hon wo yomimasu)
    "Kitob o'qiyapman"
 
-🎯 <b>Eslab qoling:</b> を ni "wo" deb o'qing!"""
+🎯 <b>Eslab qoling:</b> を ni "wo" deb o'qing!"""),
 
-    # に (ni) - Direction/Time particle
-    elif any(word in input_text for word in ["に", "ni", "joy", "vaqt", "direction"]):
-        return """📚 <b>に (ni) - Joy/Vaqt belgisi</b>
+    ("ni", ("に", "ni", "joy", "vaqt", "direction"), 40, """📚 <b>に (ni) - Joy/Vaqt belgisi</b>
 
 🔍 <b>Qoida:</b>
 • Vaqt va joyni ko'rsatadi
@@ -1361,11 +1304,9 @@ def get_japanese_grammar_explanation(user_input):
 2. 7時に起きます (7-ji ni okimasu)
    "7 da turamam"
 
-🎯 <b>Ko'p ishlatiladi:</b> Joy va vaqt uchun"""
+🎯 <b>Ko'p ishlatiladi:</b> Joy va vaqt uchun"""),
 
-    # で (de) - Location/Method particle
-    elif any(word in input_text for word in ["で", "de", "joy", "vosita", "method"]):
-        return """📚 <b>で (de) - Joy/Vosita belgisi</b>
+    ("de", ("で", "de", "joy", "vosita", "method"), 50, """📚 <b>で (de) - Joy/Vosita belgisi</b>
 
 🔍 <b>Qoida:</b>
 • Harakat qilinadigan joyni ko'rsatadi
@@ -1379,11 +1320,9 @@ def get_japanese_grammar_explanation(user_input):
 2. バスで行きます (basu de ikimasu)
    "Avtobus bilan boraman"
 
-🎯 <b>Muhim:</b> に dan farqli, harakat joyini ko'rsatadi"""
+🎯 <b>Muhim:</b> に dan farqli, harakat joyini ko'rsatadi"""),
 
-    # です/である - To be verb
-    elif any(word in input_text for word in ["です", "である", "desu", "de aru", "hisoblanadi", "be"]):
-        return """📚 <b>です/である - "Hisoblanadi"</b>
+    ("desu", ("です", "である", "desu", "de aru", "hisoblanadi", "be"), 60, """📚 <b>です/である - "Hisoblanadi"</b>
 
 🔍 <b>Qoida:</b>
 • です - rasmiy "hisoblanadi"
@@ -1397,11 +1336,9 @@ def get_japanese_grammar_explanation(user_input):
 2. 彼は医者である (kare wa isha de aru)
    "U shifokor hisoblanadi" (yozma)
 
-🎯 <b>Eslab qoling:</b> です - og'zaki, である - yozma"""
+🎯 <b>Eslab qoling:</b> です - og'zaki, である - yozma"""),
 
-    # ます - Polite verb form
-    elif any(word in input_text for word in ["ます", "masu", "rasmiy", "polite"]):
-        return """📚 <b>ます - Rasmiy fe'l shakli</b>
+    ("masu", ("ます", "masu", "rasmiy", "polite"), 70, """📚 <b>ます - Rasmiy fe'l shakli</b>
 
 🔍 <b>Qoida:</b>
 • Rasmiy va muloyim so'lash shakli
@@ -1412,11 +1349,9 @@ def get_japanese_grammar_explanation(user_input):
 1. 食べます (tabemasu) - "Yeyapman"
 2. 行きます (ikimasu) - "Borayapman"
 
-🎯 <b>Kundalik:</b> Eng ko'p ishlatiladigan rasmiy shakl"""
+🎯 <b>Kundalik:</b> Eng ko'p ishlatiladigan rasmiy shakl"""),
 
-    # た - Past tense
-    elif any(word in input_text for word in ["た", "ta", "o'tgan", "past"]):
-        return """📚 <b>た - O'tgan zamon</b>
+    ("ta", ("た", "ta", "o'tgan", "past"), 80, """📚 <b>た - O'tgan zamon</b>
 
 🔍 <b>Qoida:</b>
 • O'tgan zamondagi harakatni bildiradi
@@ -1427,11 +1362,9 @@ def get_japanese_grammar_explanation(user_input):
 1. 食べた (tabeta) - "Yedim"
 2. 行った (itta) - "Bordim"
 
-🎯 <b>Oddiy:</b> Norasmiy o'tgan zamon"""
+🎯 <b>Oddiy:</b> Norasmiy o'tgan zamon"""),
 
-    # ている - Present continuous
-    elif any(word in input_text for word in ["ている", "te iru", "davomiy", "continuous"]):
-        return """📚 <b>ている - Hozirgi davomiy</b>
+    ("te_iru", ("ている", "te iru", "davomiy", "continuous"), 90, """📚 <b>ている - Hozirgi davomiy</b>
 
 🔍 <b>Qoida:</b>
 • Hozirda davom etayotgan harakat
@@ -1442,11 +1375,9 @@ def get_japanese_grammar_explanation(user_input):
 1. 食べている (tabete iru) - "Yeyapmaqda"
 2. 勉強している (benkyou shite iru) - "O'qiyapmaqda"
 
-🎯 <b>Muhim:</b> Hozirgi davomiy harakat uchun"""
+🎯 <b>Muhim:</b> Hozirgi davomiy harakat uchun"""),
 
-    # でしょう - Probably
-    elif any(word in input_text for word in ["でしょう", "deshou", "ehtimol", "probably"]):
-        return """📚 <b>でしょう - Ehtimol</b>
+    ("deshou", ("でしょう", "deshou", "ehtimol", "probably"), 100, """📚 <b>でしょう - Ehtimol</b>
 
 🔍 <b>Qoida:</b>
 • Taxmin va ehtimollikni bildiradi
@@ -1457,11 +1388,44 @@ def get_japanese_grammar_explanation(user_input):
 1. 雨でしょう (ame deshou) - "Yomg'ir yog'ar shekilli"
 2. 美味しいでしょう (oishii deshou) - "Mazali bo'lar ehtimol"
 
-🎯 <b>Yumshoq:</b> Aniq emas, ehtimollik"""
+🎯 <b>Yumshoq:</b> Aniq emas, ehtimollik"""),
+)
+
+KOREAN_GRAMMAR_INDEX = RuleIndex(KOREAN_GRAMMAR_RULES, fold)
+JAPANESE_GRAMMAR_INDEX = RuleIndex(JAPANESE_GRAMMAR_RULES, fold)
+
+def get_korean_grammar_explanation(user_input):
+    """Kores grammar tushuntirish AI funksiyasi"""
+    user_input = normalize(user_input).text
+    rule = KOREAN_GRAMMAR_INDEX.first(user_input)
+    if rule:
+        return rule[3]
 
     # Default response for unknown grammar
-    else:
-        return f"""🤖 <b>Grammar AI Javob</b>
+    return f"""🤖 <b>Grammar AI - Professional Level</b>
+
+🔍 <b>Sizning savolingiz:</b> "{user_input}"
+
+📚 <b>AI tahlili:</b> 40+ grammar qoidasi ichidan mos javob topilmadi.
+
+💡 <b>LEVEL 1A-1B:</b> 은/는, 이/가, 을/를, 에서, 에게, 와/과, 도, 만
+💡 <b>LEVEL 2A-2B:</b> 고, 지만, 려고, 던, ㄴ다면  
+💡 <b>LEVEL 3A-3B:</b> 는데, 기로, 아도/어도, 므로
+💡 <b>LEVEL 4A-4B:</b> 더라면, 다가, 거든요, 더니
+
+🎯 <b>Misol:</b> "에서 nima?", "지만 qanday?", "거든요 ishlatish"
+
+Professional Grammar AI - 40+ qoida bilan xizmatdasiz! 📖"""
+
+def get_japanese_grammar_explanation(user_input):
+    """Yapon grammar tushuntirish AI funksiyasi"""
+    user_input = normalize(user_input).text
+    rule = JAPANESE_GRAMMAR_INDEX.first(user_input)
+    if rule:
+        return rule[3]
+
+    # Default response for unknown grammar
+    return f"""🤖 <b>Grammar AI Javob</b>
 
 🔍 <b>Sizning savolingiz:</b> "{user_input}"
 
@@ -2,8 +2,9 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import aiosqlite
 from config import ADMIN_ID
+from utils.db_pool import db_pool
+from utils.catalog_cache import catalog_cache
 
 router = Router()
 
@@ -34,39 +35,11 @@ def admin_only(func):
     return wrapper
 
 # Database functions
-async def create_custom_content_table():
-    """Create custom content table if it doesn't exist"""
-    async with aiosqlite.connect("language_bot.db") as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS custom_content (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                section_id INTEGER,
-                subsection_id INTEGER,
-                title TEXT NOT NULL,
-                description TEXT,
-                content_type TEXT NOT NULL,
-                file_id TEXT,
-                file_unique_id TEXT,
-                content_text TEXT,
-                thumbnail_file_id TEXT,
-                file_size INTEGER,
-                duration INTEGER,
-                is_premium INTEGER DEFAULT 0,
-                order_index INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by INTEGER,
-                FOREIGN KEY (section_id) REFERENCES custom_sections (id),
-                FOREIGN KEY (subsection_id) REFERENCES custom_subsections (id)
-            )
-        """)
-        await db.commit()
-
 async def add_custom_content(section_id=None, subsection_id=None, title="", description=None, 
                            content_type="", file_id="", file_unique_id="", content_text="",
                            thumbnail_file_id="", file_size=0, duration=0, is_premium=0, created_by=None):
     """Add content to custom section or subsection"""
-    await create_custom_content_table()
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.writer() as db:
         # Get next order index
         if subsection_id:
             cursor = await db.execute(
@@ -88,38 +61,20 @@ async def add_custom_content(section_id=None, subsection_id=None, title="", desc
         """, (section_id, subsection_id, title, description, content_type, file_id, file_unique_id,
               content_text, thumbnail_file_id, file_size, duration, is_premium, order_index, created_by))
         await db.commit()
-        return True
+    catalog_cache.invalidate('custom_content')
+    return True
 
 async def get_custom_content(section_id=None, subsection_id=None):
     """Get content for section or subsection"""
-    await create_custom_content_table()
-    async with aiosqlite.connect("language_bot.db") as db:
-        if subsection_id:
-            cursor = await db.execute("""
-                SELECT id, section_id, subsection_id, title, description, content_type, 
-                       file_id, file_unique_id, content_text, thumbnail_file_id, 
-                       file_size, duration, is_premium, order_index, created_at
-                FROM custom_content 
-                WHERE subsection_id = ?
-                ORDER BY order_index ASC
-            """, (subsection_id,))
-        else:
-            cursor = await db.execute("""
-                SELECT id, section_id, subsection_id, title, description, content_type, 
-                       file_id, file_unique_id, content_text, thumbnail_file_id, 
-                       file_size, duration, is_premium, order_index, created_at
-                FROM custom_content 
-                WHERE section_id = ? AND subsection_id IS NULL
-                ORDER BY order_index ASC
-            """, (section_id,))
-        return await cursor.fetchall()
+    return await catalog_cache.custom_content(section_id, subsection_id)
 
 async def delete_custom_content(content_id):
     """Delete specific content"""
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.writer() as db:
         await db.execute("DELETE FROM custom_content WHERE id = ?", (content_id,))
         await db.commit()
-        return True
+    catalog_cache.invalidate('custom_content')
+    return True
 
 # Keyboards
 def get_content_type_keyboard():
@@ -219,7 +174,7 @@ async def add_content_to_section(callback: CallbackQuery, state: FSMContext):
         return
     
     # Get section name
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT name FROM custom_sections WHERE id = ?", (section_id,))
         section = await cursor.fetchone()
     
@@ -256,7 +211,7 @@ async def add_content_to_subsection(callback: CallbackQuery, state: FSMContext):
         return
     
     # Get subsection and section info
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT cs.name, s.id, s.name 
             FROM custom_subsections cs
@@ -553,7 +508,7 @@ async def view_custom_content(callback: CallbackQuery):
     
     # Check if user is premium for premium content
     user_id = callback.from_user.id
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT is_premium FROM users WHERE user_id = ?", (user_id,))
         user_result = await cursor.fetchone()
         is_premium = user_result[0] if user_result else 0
@@ -2,8 +2,9 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import aiosqlite
 from config import ADMIN_ID
+from utils.db_pool import db_pool
+from utils.catalog_cache import catalog_cache
 
 router = Router()
 
@@ -34,43 +35,9 @@ def admin_only(func):
     return wrapper
 
 # Database functions for custom sections
-async def create_custom_sections_table():
-    """Create custom sections table if it doesn't exist"""
-    async with aiosqlite.connect("language_bot.db") as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS custom_sections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                icon TEXT DEFAULT '📂',
-                is_premium INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                order_index INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by INTEGER
-            )
-        """)
-        
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS custom_subsections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                section_id INTEGER,
-                name TEXT NOT NULL,
-                description TEXT,
-                icon TEXT DEFAULT '📄',
-                is_premium INTEGER DEFAULT 0,
-                order_index INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (section_id) REFERENCES custom_sections (id)
-            )
-        """)
-        
-        await db.commit()
-
 async def add_custom_section(name: str, description=None, icon: str = "📂", is_premium: int = 0, created_by=None):
     """Add new custom section"""
-    await create_custom_sections_table()
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "SELECT COALESCE(MAX(order_index), 0) + 1 FROM custom_sections"
         )
@@ -81,23 +48,16 @@ async def add_custom_section(name: str, description=None, icon: str = "📂", is
             VALUES (?, ?, ?, ?, ?, ?)
         """, (name, description, icon, is_premium, order_index, created_by))
         await db.commit()
-        return True
+    catalog_cache.invalidate('custom_sections')
+    return True
 
 async def get_custom_sections():
     """Get all custom sections"""
-    await create_custom_sections_table()
-    async with aiosqlite.connect("language_bot.db") as db:
-        cursor = await db.execute("""
-            SELECT id, name, description, icon, is_premium, is_active, order_index, created_at
-            FROM custom_sections 
-            WHERE is_active = 1
-            ORDER BY order_index ASC
-        """)
-        return await cursor.fetchall()
+    return await catalog_cache.custom_sections()
 
 async def add_custom_subsection(section_id: int, name: str, description=None, icon: str = "📄", is_premium: int = 0):
     """Add subsection to custom section"""
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "SELECT COALESCE(MAX(order_index), 0) + 1 FROM custom_subsections WHERE section_id = ?",
             (section_id,)
@@ -109,18 +69,12 @@ async def add_custom_subsection(section_id: int, name: str, description=None, ic
             VALUES (?, ?, ?, ?, ?, ?)
         """, (section_id, name, description, icon, is_premium, order_index))
         await db.commit()
-        return True
+    catalog_cache.invalidate('custom_subsections', section_id)
+    return True
 
 async def get_custom_subsections(section_id: int):
     """Get subsections for a custom section"""
-    async with aiosqlite.connect("language_bot.db") as db:
-        cursor = await db.execute("""
-            SELECT id, section_id, name, description, icon, is_premium, order_index, created_at
-            FROM custom_subsections 
-            WHERE section_id = ?
-            ORDER BY order_index ASC
-        """, (section_id,))
-        return await cursor.fetchall()
+    return await catalog_cache.custom_subsections(section_id)
 
 # Keyboards for custom sections
 def get_custom_sections_keyboard(sections):
@@ -286,12 +240,7 @@ async def view_custom_section(callback: CallbackQuery):
         return
     
     # Get section info
-    async with aiosqlite.connect("language_bot.db") as db:
-        cursor = await db.execute("""
-            SELECT id, name, description, icon, is_premium
-            FROM custom_sections WHERE id = ?
-        """, (section_id,))
-        section = await cursor.fetchone()
+    section = await catalog_cache.custom_section(section_id)
     
     if not section:
         await callback.answer("❌ Bo'lim topilmadi!", show_alert=True)
@@ -384,7 +333,7 @@ async def add_subsection_start(callback: CallbackQuery, state: FSMContext):
         return
     
     # Get section name
-    async with aiosqlite.connect("language_bot.db") as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT name FROM custom_sections WHERE id = ?", (section_id,))
         section = await cursor.fetchone()
     
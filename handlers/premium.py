@@ -3,10 +3,11 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import get_user, get_user_referrals_count, activate_premium, is_premium_active
+from database import get_user, get_user_referrals_count, activate_premium, deactivate_premium, is_premium_active
 from keyboards import get_premium_menu, get_referral_keyboard, get_main_menu
 from messages import PREMIUM_INFO_MESSAGE, REFERRAL_MESSAGE
 from config import PREMIUM_PRICE_UZS, REFERRAL_THRESHOLD, ADMIN_ID
+from utils.db_pool import db_pool
 
 router = Router()
 
@@ -192,10 +193,7 @@ async def my_referrals(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Get referral details
-    import aiosqlite
-    from config import DATABASE_PATH
-    
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT u.first_name, u.username, r.created_at
             FROM referrals r
@@ -363,16 +361,7 @@ async def deactivate_premium_command(message: Message):
         
         user_id = int(parts[1])
         
-        import aiosqlite
-        from config import DATABASE_PATH
-        
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            await db.execute("""
-                UPDATE users 
-                SET is_premium = FALSE, premium_expires_at = NULL
-                WHERE user_id = ?
-            """, (user_id,))
-            await db.commit()
+        await deactivate_premium(user_id)
         
         # Notify user
         try:
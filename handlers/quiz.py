@@ -2,13 +2,14 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import aiosqlite
-from datetime import datetime
+import time
 
-from database import is_premium_active
+from database import is_premium_active, record_quiz_attempt
 from keyboards import get_quiz_languages_keyboard, get_quizzes_keyboard, get_quiz_question_keyboard, get_quiz_result_keyboard
-from utils.rating_system import update_user_rating
-from config import DATABASE_PATH, ADMIN_ID
+from utils.rating_system import update_user_rating, rating_delta
+from config import ADMIN_ID
+from utils.db_pool import db_pool
+from utils.quiz_cache import quiz_cache
 
 router = Router()
 
@@ -16,6 +17,16 @@ class QuizStates(StatesGroup):
     taking_quiz = State()
     quiz_finished = State()
 
+# The session keeps answers as two ints instead of a growing string:
+# choices - 2 bits per question (index into OPTION_LETTERS), correct - 1 bit per question
+OPTION_LETTERS = "ABCD"
+
+def _chosen_letter(choices: int, index: int) -> str:
+    return OPTION_LETTERS[(choices >> (2 * index)) & 3]
+
+def _is_correct(correct: int, index: int) -> bool:
+    return bool((correct >> index) & 1)
+
 @router.callback_query(F.data == "quizzes")
 async def choose_quiz_language(callback: CallbackQuery):
     await callback.message.edit_text(
@@ -30,7 +41,7 @@ async def show_quizzes(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Get available quizzes
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT id, title, description, is_premium
             FROM quizzes 
@@ -77,35 +88,22 @@ async def start_quiz(callback: CallbackQuery, state: FSMContext):
     quiz_id = int(callback.data.split("_")[2])
     user_id = callback.from_user.id
     
-    # Get quiz details and questions
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Get quiz info
-        cursor = await db.execute("""
-            SELECT title, description, is_premium, language
-            FROM quizzes WHERE id = ?
-        """, (quiz_id,))
-        quiz_info = await cursor.fetchone()
-        
-        if not quiz_info:
-            await callback.answer("❌ Test topilmadi!", show_alert=True)
-            return
-        
-        # Check premium access
-        if quiz_info[2] and not await is_premium_active(user_id):
-            await callback.answer(
-                "💎 Bu premium test! Premium obuna oling yoki do'stlaringizni taklif qiling.",
-                show_alert=True
-            )
-            return
-        
-        # Get questions
-        cursor = await db.execute("""
-            SELECT id, question, option_a, option_b, option_c, option_d, correct_answer, points
-            FROM quiz_questions 
-            WHERE quiz_id = ?
-            ORDER BY id
-        """, (quiz_id,))
-        questions = await cursor.fetchall()
+    # Get quiz info and questions (shared cache, not copied into the session)
+    quiz = await quiz_cache.get(quiz_id)
+    
+    if not quiz:
+        await callback.answer("❌ Test topilmadi!", show_alert=True)
+        return
+    
+    quiz_info, questions = quiz
+    
+    # Check premium access
+    if quiz_info[2] and not await is_premium_active(user_id):
+        await callback.answer(
+            "💎 Bu premium test! Premium obuna oling yoki do'stlaringizni taklif qiling.",
+            show_alert=True
+        )
+        return
     
     if not questions:
         await callback.answer("❌ Testda savollar mavjud emas!", show_alert=True)
@@ -114,13 +112,11 @@ async def start_quiz(callback: CallbackQuery, state: FSMContext):
     # Initialize quiz session
     await state.update_data(
         quiz_id=quiz_id,
-        quiz_title=quiz_info[0],
-        quiz_language=quiz_info[3],
-        questions=questions,
         current_question=0,
         score=0,
-        user_answers=[],
-        start_time=datetime.now()
+        choices=0,
+        correct=0,
+        start_time=time.time()
     )
     
     # Update user rating for starting quiz
@@ -129,9 +125,20 @@ async def start_quiz(callback: CallbackQuery, state: FSMContext):
     # Show first question
     await show_quiz_question(callback, state)
 
+async def _session_quiz(callback: CallbackQuery, data: dict):
+    """Quiz info and questions of the current session, None if it's gone"""
+    quiz = await quiz_cache.get(data['quiz_id']) if 'quiz_id' in data else None
+    if not quiz or not quiz[1]:
+        await callback.answer("❌ Test topilmadi!", show_alert=True)
+        return None
+    return quiz
+
 async def show_quiz_question(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    questions = data['questions']
+    quiz = await _session_quiz(callback, data)
+    if not quiz:
+        return
+    quiz_info, questions = quiz
     current_q = data['current_question']
     
     if current_q >= len(questions):
@@ -142,7 +149,7 @@ async def show_quiz_question(callback: CallbackQuery, state: FSMContext):
     question_id, question_text, option_a, option_b, option_c, option_d, correct_answer, points = question
     
     # Prepare question text
-    quiz_text = f"🧠 <b>{data['quiz_title']}</b>\n\n"
+    quiz_text = f"🧠 <b>{quiz_info[0]}</b>\n\n"
     quiz_text += f"❓ <b>Savol {current_q + 1}/{len(questions)}</b>\n\n"
     quiz_text += f"{question_text}\n\n"
     
@@ -170,32 +177,34 @@ async def show_quiz_question(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data.startswith("quiz_answer_"), QuizStates.taking_quiz)
 async def process_quiz_answer(callback: CallbackQuery, state: FSMContext):
-    answer = callback.data.split("_")[2]
+    answer = callback.data.split("_")[2].upper()
     question_index = int(callback.data.split("_")[3])
     
     data = await state.get_data()
-    questions = data['questions']
+    quiz = await _session_quiz(callback, data)
+    if not quiz:
+        return
+    questions = quiz[1]
+    
+    # Ignore repeated taps on an already answered question
+    if (question_index != data['current_question'] or question_index >= len(questions)
+            or answer not in OPTION_LETTERS):
+        await callback.answer()
+        return
     current_question = questions[question_index]
     
     # Check if answer is correct
     correct_answer = current_question[6]
     points = current_question[7]
-    is_correct = answer.upper() == correct_answer.upper()
+    is_correct = answer == correct_answer.upper()
     
     # Update score and answers
     new_score = data['score'] + (points if is_correct else 0)
-    user_answers = data['user_answers']
-    user_answers.append({
-        'question_id': current_question[0],
-        'user_answer': answer,
-        'correct_answer': correct_answer,
-        'is_correct': is_correct,
-        'points': points if is_correct else 0
-    })
     
     await state.update_data(
         score=new_score,
-        user_answers=user_answers,
+        choices=data.get('choices', 0) | (OPTION_LETTERS.index(answer) << (2 * question_index)),
+        correct=data.get('correct', 0) | (int(is_correct) << question_index),
         current_question=question_index + 1
     )
     
@@ -205,47 +214,43 @@ async def process_quiz_answer(callback: CallbackQuery, state: FSMContext):
 async def finish_quiz(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = callback.from_user.id
+    quiz = await _session_quiz(callback, data)
+    if not quiz:
+        return
+    quiz_info, questions = quiz
     
     quiz_id = data['quiz_id']
-    quiz_title = data['quiz_title']
+    quiz_title = quiz_info[0]
     score = data['score']
-    total_questions = len(data['questions'])
-    user_answers = data['user_answers']
-    start_time = data['start_time']
-    end_time = datetime.now()
+    total_questions = len(questions)
+    answered = min(data['current_question'], total_questions)
+    choices = data.get('choices', 0)
+    correct = data.get('correct', 0)
     
     # Calculate max possible score
-    max_score = sum(q[7] for q in data['questions'])
-    
-    # Save quiz attempt to database
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("""
-            INSERT INTO quiz_attempts (user_id, quiz_id, score, total_questions)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, quiz_id, score, total_questions))
-        
-        # Update user statistics
-        await db.execute("""
-            UPDATE users 
-            SET quiz_score_total = quiz_score_total + ?, 
-                quiz_attempts = quiz_attempts + 1
-            WHERE user_id = ?
-        """, (score, user_id))
-        
-        await db.commit()
+    max_score = sum(q[7] for q in questions)
     
-    # Update user rating based on performance
+    # User rating based on performance
     performance_ratio = score / max_score if max_score > 0 else 0
     if performance_ratio >= 0.8:
-        await update_user_rating(user_id, 'quiz_excellent')
+        rating, words = rating_delta('quiz_excellent')
     elif performance_ratio >= 0.6:
-        await update_user_rating(user_id, 'quiz_good')
+        rating, words = rating_delta('quiz_good')
     else:
-        await update_user_rating(user_id, 'quiz_complete')
+        rating, words = rating_delta('quiz_complete')
+    
+    # Attempt, answers, quiz totals and rating in one transaction
+    answer_rows = []
+    for index, question in enumerate(questions[:answered]):
+        is_correct = _is_correct(correct, index)
+        answer_rows.append((question[0], _chosen_letter(choices, index), is_correct,
+                            question[7] if is_correct else 0))
+    duration = time.time() - data['start_time']
+    await record_quiz_attempt(user_id, quiz_id, score, total_questions, answer_rows, rating, words, int(duration))
     
     # Calculate percentage
     percentage = (score / max_score * 100) if max_score > 0 else 0
-    correct_answers = sum(1 for ans in user_answers if ans['is_correct'])
+    correct_answers = bin(correct).count("1")
     
     # Determine grade
     if percentage >= 90:
@@ -265,9 +270,8 @@ async def finish_quiz(callback: CallbackQuery, state: FSMContext):
         grade_emoji = "📖"
     
     # Duration calculation
-    duration = end_time - start_time
-    duration_minutes = int(duration.total_seconds() / 60)
-    duration_seconds = int(duration.total_seconds() % 60)
+    duration_minutes = int(duration / 60)
+    duration_seconds = int(duration % 60)
     
     result_text = f"🎯 <b>Test yakunlandi!</b>\n\n"
     result_text += f"📚 Test: {quiz_title}\n"
@@ -285,7 +289,7 @@ async def finish_quiz(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(
         result_text,
-        reply_markup=get_quiz_result_keyboard(quiz_id, data['quiz_language'])
+        reply_markup=get_quiz_result_keyboard(quiz_id, quiz_info[3])
     )
     
     await state.set_state(QuizStates.quiz_finished)
@@ -293,20 +297,23 @@ async def finish_quiz(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("quiz_review_"))
 async def review_quiz_answers(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    user_answers = data['user_answers']
-    quiz_title = data['quiz_title']
     
-    if not user_answers:
+    if not data.get('current_question') or 'choices' not in data:
         await callback.answer("❌ Javoblar topilmadi!", show_alert=True)
         return
     
-    review_text = f"📝 <b>{quiz_title} - Javoblarni ko'rish</b>\n\n"
+    quiz = await _session_quiz(callback, data)
+    if not quiz:
+        return
+    quiz_info, questions = quiz
+    
+    review_text = f"📝 <b>{quiz_info[0]} - Javoblarni ko'rish</b>\n\n"
     
-    for i, answer_data in enumerate(user_answers, 1):
-        is_correct = answer_data['is_correct']
-        user_answer = answer_data['user_answer']
-        correct_answer = answer_data['correct_answer']
-        points = answer_data['points']
+    for i, question in enumerate(questions[:data['current_question']], 1):
+        correct_answer = question[6]
+        user_answer = _chosen_letter(data['choices'], i - 1)
+        is_correct = _is_correct(data.get('correct', 0), i - 1)
+        points = question[7] if is_correct else 0
         
         status = "✅" if is_correct else "❌"
         review_text += f"{status} <b>Savol {i}:</b>\n"
@@ -319,7 +326,7 @@ async def review_quiz_answers(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(
         review_text,
-        reply_markup=get_quiz_result_keyboard(data['quiz_id'], data['quiz_language'])
+        reply_markup=get_quiz_result_keyboard(data['quiz_id'], quiz_info[3])
     )
 
 @router.callback_query(F.data.startswith("retake_quiz_"))
@@ -346,7 +353,7 @@ async def back_to_quizzes(callback: CallbackQuery, state: FSMContext):
 async def show_quiz_statistics(callback: CallbackQuery):
     user_id = callback.from_user.id
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         # Get overall statistics
         cursor = await db.execute("""
             SELECT COUNT(*) as total_attempts, 
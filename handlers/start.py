@@ -1,16 +1,18 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import aiosqlite
 
-from database import get_user, create_user, update_user_activity, add_referral
-from utils.subscription_check import check_subscriptions
+from database import get_user, create_user, update_user_activity, add_referral, set_users_blocked
+from utils.subscription_check import check_subscriptions, channel_for_chat, subscription_cache
 from utils.rating_system import update_user_rating
 from keyboards import get_main_menu, get_subscription_keyboard
 from messages import WELCOME_MESSAGE, SUBSCRIPTION_REQUIRED_MESSAGE
-from config import ADMIN_ID, DATABASE_PATH
+from config import ADMIN_ID, SUBSCRIPTION_MEMBER_UPDATES
+from utils.db_pool import db_pool
+from utils.leaderboard import rating_leaderboard
+from utils.write_behind import activity_buffer
 
 router = Router()
 
@@ -29,10 +31,7 @@ async def start_command(message: Message, state: FSMContext):
     if message.text and len(message.text.split()) > 1:
         referral_code = message.text.split()[1]
         # Get referrer by referral code
-        import aiosqlite
-        from config import DATABASE_PATH
-        
-        async with aiosqlite.connect(DATABASE_PATH) as db:
+        async with db_pool.reader() as db:
             cursor = await db.execute(
                 "SELECT user_id FROM users WHERE referral_code = ?", 
                 (referral_code,)
@@ -67,6 +66,8 @@ async def start_command(message: Message, state: FSMContext):
     
     # Update user activity
     await update_user_activity(user_id)
+    if user and user[16]:  # is_blocked: back after blocking the bot
+        await set_users_blocked([user_id], False)
     await update_user_rating(user_id, 'session_start')
     
     # Check subscriptions (temporarily disabled for testing)
@@ -135,6 +136,18 @@ async def main_menu_callback(callback: CallbackQuery):
         reply_markup=get_main_menu(user_id == ADMIN_ID)
     )
 
+async def channel_member_updated(event: ChatMemberUpdated):
+    """Keep the subscription cache current when someone joins or leaves a required channel"""
+    channel = channel_for_chat(event.chat.username)
+    if channel is None:
+        return
+    is_member = event.new_chat_member.status not in ['left', 'kicked']
+    subscription_cache.set(event.new_chat_member.user.id, channel, is_member)
+
+# Registering the handler makes polling request chat_member updates as well
+if SUBSCRIPTION_MEMBER_UPDATES:
+    router.chat_member.register(channel_member_updated)
+
 @router.message(Command("help"))
 async def help_command(message: Message):
     help_text = """
@@ -213,7 +226,7 @@ async def leaderboard_command(message: Message):
         
         leaderboard_text = "🏆 <b>Top 10 foydalanuvchilar</b>\n\n"
         
-        for i, (first_name, rating, words, quiz_score, quiz_attempts) in enumerate(leaders, 1):
+        for i, (_, first_name, _, rating, words, quiz_score, quiz_attempts) in enumerate(leaders, 1):
             name = first_name or "Noma'lum"
             
             # Medal emojis for top 3
@@ -258,17 +271,31 @@ async def show_rating_callback(callback: CallbackQuery):
         quiz_attempts = user[12] if len(user) > 12 else 0   # quiz_attempts
         total_sessions = user[9] if len(user) > 9 else 0    # total_sessions
         
-        # Calculate level and ranking
-        level = min(100, max(1, int(rating_score / 50) + 1))
+        # Include updates still waiting in the write-behind buffer
+        pending = activity_buffer.pending(user_id)
+        if pending:
+            words_learned += pending[1]
+            total_sessions += pending[2]
         
         # Get ranking by counting users with higher rating
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            cursor = await db.execute("""
-                SELECT COUNT(*) + 1 as ranking
-                FROM users 
-                WHERE rating_score > ? AND rating_score > 0
-            """, (rating_score,))
-            ranking = (await cursor.fetchone())[0]
+        if rating_leaderboard.loaded:
+            # The live score: the leaderboard already counts pending deltas,
+            # ranking the stored one would put the user behind their own entry
+            rating_score = rating_leaderboard.score(user_id)
+            ranking = rating_leaderboard.rank(rating_score)
+        else:
+            if pending:
+                rating_score += pending[0]
+            async with db_pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT COUNT(*) + 1 as ranking
+                    FROM users 
+                    WHERE rating_score > ? AND rating_score > 0
+                """, (rating_score,))
+                ranking = (await cursor.fetchone())[0]
+        
+        # Calculate level
+        level = min(100, max(1, int(rating_score / 50) + 1))
         
         # Get top 8 users with highest ratings and best performance  
         leaderboard = await get_leaderboard(8)
@@ -425,7 +452,7 @@ async def show_rating(callback: CallbackQuery):
 """
         
         # Leaderboard qo'shing
-        for i, (user_name, score, words, quiz_score, quiz_attempts) in enumerate(leaderboard, 1):
+        for i, (_, user_name, _, score, words, quiz_score, quiz_attempts) in enumerate(leaderboard, 1):
             medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
             rating_text += f"{medal} {user_name or 'Anonim'}: {score:.1f} ball\n"
         
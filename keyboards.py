@@ -1,6 +1,8 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import CHANNELS, INSTAGRAM_URL
+from utils.keyboard_cache import keyboard_cache
 
+@keyboard_cache.static
 def get_subscription_keyboard():
     """Keyboard for subscription verification"""
     buttons = []
@@ -32,6 +34,7 @@ def get_subscription_keyboard():
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_main_menu(is_admin: bool = False, is_premium: bool = False):
     """Main menu keyboard"""
     buttons = [
@@ -60,6 +63,7 @@ def get_main_menu(is_admin: bool = False, is_premium: bool = False):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_conversation_menu():
     """Premium conversation language selection menu"""
     buttons = [
@@ -78,6 +82,7 @@ def get_conversation_menu():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_conversation_keyboard(language):
     """Conversation keyboard for specific language"""
     if language == "korean":
@@ -102,6 +107,7 @@ def get_conversation_keyboard(language):
         ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_grammar_ai_menu():
     """Grammar AI language selection menu"""
     buttons = [
@@ -118,6 +124,7 @@ def get_grammar_ai_menu():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_admin_menu():
     """Admin panel main menu"""
     buttons = [
@@ -138,7 +145,8 @@ def get_admin_menu():
             InlineKeyboardButton(text="📨 Test xabarlar", callback_data="admin_test_messages")
         ],
         [
-            InlineKeyboardButton(text="🗑 Bo'limlarni o'chirish", callback_data="admin_delete_sections")
+            InlineKeyboardButton(text="🗑 Bo'limlarni o'chirish", callback_data="admin_delete_sections"),
+            InlineKeyboardButton(text="📈 Test tahlili", callback_data="admin_quiz_analytics")
         ],
         [
             InlineKeyboardButton(text="📢 Barchaga xabar", callback_data="admin_broadcast")
@@ -149,6 +157,7 @@ def get_admin_menu():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_admin_sections_keyboard():
     """Admin sections management keyboard"""
     buttons = [
@@ -165,6 +174,7 @@ def get_admin_sections_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_admin_content_keyboard():
     """Content management keyboard"""
     buttons = [
@@ -180,6 +190,7 @@ def get_admin_content_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_broadcast_menu():
     """Broadcast message type selection"""
     buttons = [
@@ -200,6 +211,7 @@ def get_broadcast_menu():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_broadcast_confirm():
     """Broadcast confirmation keyboard"""
     buttons = [
@@ -210,6 +222,7 @@ def get_broadcast_confirm():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_admin_quiz_keyboard():
     """Quiz management keyboard"""
     buttons = [
@@ -230,6 +243,7 @@ def get_admin_quiz_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_quiz_continue_keyboard():
     """Keyboard for quiz creation continuation"""
     buttons = [
@@ -242,6 +256,7 @@ def get_quiz_continue_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_topic_tests_keyboard(topic_number):
     """Keyboard for topic tests"""
     buttons = [
@@ -259,6 +274,7 @@ def get_topic_tests_keyboard(topic_number):
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_jlpt_tests_keyboard():
     """Keyboard for JLPT tests (Premium only)"""
     buttons = [
@@ -280,6 +296,7 @@ def get_jlpt_tests_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_jlpt_level_tests_keyboard(level):
     """Keyboard for specific JLPT level tests"""
     buttons = [
@@ -301,6 +318,7 @@ def get_jlpt_level_tests_keyboard(level):
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_languages_keyboard():
     """Language selection keyboard"""
     buttons = [
@@ -314,6 +332,7 @@ def get_languages_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_sections_keyboard(sections, language):
     """Keyboard for sections list"""
     buttons = []
@@ -334,6 +353,7 @@ def get_sections_keyboard(sections, language):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_subsections_keyboard(subsections, section_id, language):
     """Keyboard for subsections list"""
     buttons = []
@@ -357,6 +377,7 @@ def get_subsections_keyboard(subsections, section_id, language):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_content_keyboard(subsection_id, section_id, language, content_items):
     """Keyboard for content list"""
     buttons = []
@@ -399,6 +420,7 @@ def get_content_keyboard(subsection_id, section_id, language, content_items):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_content_navigation_keyboard(subsection_id, section_id, language):
     """Keyboard for content navigation"""
     buttons = [
@@ -414,6 +436,7 @@ def get_content_navigation_keyboard(subsection_id, section_id, language):
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_premium_menu(is_premium: bool = False, can_activate_by_referral: bool = False):
     """Premium menu keyboard"""
     if is_premium:
@@ -454,6 +477,7 @@ def get_premium_menu(is_premium: bool = False, can_activate_by_referral: bool =
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_referral_keyboard():
     """Referral system keyboard"""
     buttons = [
@@ -475,6 +499,7 @@ def get_referral_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_quiz_languages_keyboard():
     """Quiz language selection keyboard"""
     buttons = [
@@ -491,6 +516,7 @@ def get_quiz_languages_keyboard():
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_quizzes_keyboard(quizzes, language):
     """Keyboard for quizzes list"""
     buttons = []
@@ -512,6 +538,7 @@ def get_quizzes_keyboard(quizzes, language):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_quiz_question_keyboard(options, question_index):
     """Keyboard for quiz question options"""
     buttons = []
@@ -526,6 +553,7 @@ def get_quiz_question_keyboard(options, question_index):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.memoize
 def get_quiz_result_keyboard(quiz_id, language):
     """Keyboard for quiz results"""
     buttons = [
@@ -542,6 +570,7 @@ def get_quiz_result_keyboard(quiz_id, language):
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@keyboard_cache.static
 def get_premium_content_keyboard():
     """Premium content management keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -557,6 +586,7 @@ def get_premium_content_keyboard():
         ]
     ])
 
+@keyboard_cache.memoize
 def get_section_admin_keyboard(section_type):
     """Section admin keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -569,6 +599,7 @@ def get_section_admin_keyboard(section_type):
         ]
     ])
 
+@keyboard_cache.memoize
 def get_content_type_keyboard(section_type):
     """Content type selection keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -589,6 +620,7 @@ def get_content_type_keyboard(section_type):
         ]
     ])
 
+@keyboard_cache.static
 def get_premium_subsections_keyboard():
     """Premium subsection management sections"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -604,6 +636,7 @@ def get_premium_subsections_keyboard():
         ]
     ])
 
+@keyboard_cache.memoize
 def get_subsection_admin_keyboard(section_type):
     """Subsection admin menu for a section"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -618,6 +651,7 @@ def get_subsection_admin_keyboard(section_type):
         ]
     ])
 
+@keyboard_cache.static
 def get_general_content_admin_keyboard():
     """General content management keyboard for admin"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -633,6 +667,7 @@ def get_general_content_admin_keyboard():
         ]
     ])
 
+@keyboard_cache.memoize
 def get_section_general_admin_keyboard(section_type):
     """General section admin keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -648,6 +683,7 @@ def get_section_general_admin_keyboard(section_type):
         ]
     ])
 
+@keyboard_cache.memoize
 def get_general_content_type_keyboard(section_type):
     """General content type selection keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
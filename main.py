@@ -1,36 +1,46 @@
 import asyncio
 import logging
+import os
+import signal
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN, FSM_STORAGE, BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBAPP_HOST, WEBAPP_PORT, SHARD_WORKERS, SHARD_INDEX
+)
 from database import init_db
 from handlers import start, admin, premium, content, quiz, conversation, custom_sections, custom_content, premium_content
-from utils.scheduler import start_scheduler
+from utils.scheduler import start_scheduler, stop_scheduler
+from utils.db_pool import db_pool
+from utils.write_behind import activity_buffer
+from utils.catalog_cache import catalog_cache
+from utils.leaderboard import rating_leaderboard
+from utils.outbox import outbox_worker
+from utils.broadcast import resume_broadcast_reports
+from utils.pacing import reply_pacer
+from utils.fsm_storage import fsm_storage
+from utils.lease import scheduler_lease
+from utils.sharding import ShardRouter, shard_worker
 
 # Bot versiya: 2.0.1 - AI Conversation Update (2025-01-24)
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Longest wait for handlers still running when the webhook server stops
+WEBHOOK_DRAIN_SECONDS = 10
+
 # Global bot instance for other modules to use
 bot = None
 
-async def main():
-    global bot
-    
-    # Initialize database
-    await init_db()
-    
-    # Initialize bot and dispatcher
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    dp = Dispatcher(storage=MemoryStorage())
-    
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=fsm_storage if FSM_STORAGE == "sqlite" else MemoryStorage())
+
     # Include routers
     dp.include_router(start.router)
     dp.include_router(admin.router)
@@ -41,13 +51,158 @@ async def main():
     dp.include_router(custom_sections.router)
     dp.include_router(custom_content.router)
     dp.include_router(premium_content.router)
-    
+    return dp
+
+async def wait_for_signal():
+    """Return on SIGINT/SIGTERM so shutdown runs in order (as start_polling does)"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    await stop.wait()
+
+async def start_background_jobs(bot: Bot):
     # Start scheduler for automated messages
     await start_scheduler(bot)
-    
-    # Start polling
-    logger.info("Bot started")
+
+    # Deliver queued bulk messages (resumes whatever a restart interrupted)
+    await outbox_worker.start(bot)
+    await resume_broadcast_reports(bot)
+
+async def stop_background_jobs():
+    await stop_scheduler()
+    await outbox_worker.stop()
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    """Long polling (getUpdates) - no public URL needed"""
+    logger.info("Bot started (polling)")
     await dp.start_polling(bot)
 
+async def run_webhook(bot: Bot, dp: Dispatcher, router: ShardRouter = None):
+    """Serve updates over HTTP until SIGINT/SIGTERM; with a router they go to the workers"""
+    app = web.Application()
+    handler = None
+    if router is None:
+        handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET or None)
+        handler.register(app, path=WEBHOOK_PATH)
+    else:
+        app.router.add_post(WEBHOOK_PATH, router.webhook_handler(WEBHOOK_SECRET))
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+
+    # Without a public URL the server only takes local (synthetic) updates
+    if WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+
+    # Same startup/shutdown hooks start_polling would run
+    if handler is not None:
+        await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    logger.info(f"Bot started (webhook on {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH})")
+    try:
+        await wait_for_signal()
+    finally:
+        # Stop accepting updates; the webhook stays set so Telegram
+        # keeps queueing them until the next start
+        await runner.cleanup()
+        if handler is not None:
+            # Updates are acknowledged before they are handled - let the
+            # accepted ones finish while the database is still open
+            pending = getattr(handler, "_background_feed_update_tasks", set())
+            if pending:
+                logger.info(f"Waiting for {len(pending)} in-flight updates")
+                await asyncio.wait(set(pending), timeout=WEBHOOK_DRAIN_SECONDS)
+            await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()
+
+async def run_ingress():
+    """Receive updates and hand them to SHARD_WORKERS worker processes"""
+    # Migrate once, before the workers open the database
+    await db_pool.start()
+    try:
+        await init_db()
+    finally:
+        await db_pool.close()
+
+    bot = Bot(token=BOT_TOKEN)
+    # Only used to know which update types the handlers need
+    dp = create_dispatcher()
+    router = ShardRouter(SHARD_WORKERS, os.path.abspath(__file__))
+    await router.start()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp, router)
+        else:
+            logger.info(f"Bot started (polling, {SHARD_WORKERS} workers)")
+            polling = asyncio.create_task(router.poll(bot, dp.resolve_used_update_types()))
+            try:
+                await wait_for_signal()
+            finally:
+                polling.cancel()
+            await bot.session.close()
+    finally:
+        await router.stop()
+
+async def run_shard_worker(bot: Bot, dp: Dispatcher):
+    """Handle the updates the ingress sends on stdin"""
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    logger.info(f"Shard worker {SHARD_INDEX} started")
+    try:
+        await shard_worker.serve(bot, dp)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()
+
+async def main():
+    global bot
+
+    if SHARD_WORKERS > 1 and SHARD_INDEX < 0:
+        await run_ingress()
+        return
+
+    # Open shared database connections and initialize schema
+    await db_pool.start()
+    await init_db()
+    await activity_buffer.start()
+    await catalog_cache.load()
+    await rating_leaderboard.load()
+
+    # Initialize bot and dispatcher
+    bot = Bot(
+        token=BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    dp = create_dispatcher()
+
+    if SHARD_INDEX >= 0:
+        # One worker, whichever holds the lease, runs the background jobs
+        scheduler_lease.start(lambda: start_background_jobs(bot), stop_background_jobs)
+    else:
+        await start_background_jobs(bot)
+
+    try:
+        if SHARD_INDEX >= 0:
+            await run_shard_worker(bot, dp)
+        elif BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await run_polling(bot, dp)
+    finally:
+        await scheduler_lease.stop()
+        await stop_background_jobs()
+        await reply_pacer.close()
+        # Flush buffered rating/activity updates before the connections go away
+        await activity_buffer.close()
+        await db_pool.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
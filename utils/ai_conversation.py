@@ -5,17 +5,127 @@ Haqiqiy AI kabi ko'rinadigan suhbat tizimi
 
 import random
 import re
+import sys
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import AI_CONTEXT_MAX_USERS, AI_CONTEXT_TTL_SECONDS, AI_CONTEXT_MAX_MEMORY_MB
+from utils.keyword_matcher import GroupMatcher
+from utils.text_normalization import fold, normalize
+
+HISTORY_SIZE = 10  # Messages kept per user for context
+RECENT_RESPONSES = 3  # Responses per category not repeated
+
+# Approximate size of one record with a full history and a few response
+# categories, not counting the message text (CPython 3.11)
+_RECORD_OVERHEAD_BYTES = 3000
+
+class UserContext:
+    """Conversation state of one user; every container has a fixed size"""
+
+    __slots__ = ('history', 'preferences', 'recent_responses', 'last_seen', 'size')
+
+    def __init__(self):
+        self.history: Deque[Tuple[str, float, str]] = deque(maxlen=HISTORY_SIZE)
+        self.preferences: Dict = {}
+        self.recent_responses: Dict[str, Deque[str]] = {}
+        self.last_seen = time.monotonic()
+        self.size = _RECORD_OVERHEAD_BYTES  # Approximate bytes held
+
+    def add_message(self, message: str, language: str) -> int:
+        """Record a message; returns the change in size"""
+        added = sys.getsizeof(message)
+        if len(self.history) == self.history.maxlen:
+            added -= sys.getsizeof(self.history[0][0])
+        self.history.append((message, time.time(), language))
+        self.size += added
+        return added
+
+    def recent(self, category: str) -> Deque[str]:
+        # Responses are shared constants, so they don't add to the size
+        if category not in self.recent_responses:
+            self.recent_responses[category] = deque(maxlen=RECENT_RESPONSES)
+        return self.recent_responses[category]
+
+class UserContextStore:
+    """LRU map of user_id -> UserContext bounded by user count, idle time and memory"""
+
+    def __init__(self, max_users: int = AI_CONTEXT_MAX_USERS, ttl: float = AI_CONTEXT_TTL_SECONDS,
+                 max_bytes: int = int(AI_CONTEXT_MAX_MEMORY_MB * 1024 * 1024)):
+        self.max_users = max(1, max_users)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._users: "OrderedDict[int, UserContext]" = OrderedDict()
+        self.total_bytes = 0
+        self.evicted_lru = 0
+        self.evicted_expired = 0
+        self.evicted_memory = 0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def get(self, user_id: int) -> UserContext:
+        """Context of a user, created if missing, and marked as most recently used"""
+        self._expire()
+        context = self._users.get(user_id)
+        if context is None:
+            context = UserContext()
+            self._users[user_id] = context
+            self.total_bytes += context.size
+            while len(self._users) > self.max_users:
+                self._evict()
+                self.evicted_lru += 1
+        else:
+            self._users.move_to_end(user_id)
+            context.last_seen = time.monotonic()
+        return context
+
+    def add_message(self, user_id: int, message: str, language: str) -> UserContext:
+        context = self.get(user_id)
+        self.total_bytes += context.add_message(message, language)
+        # Never evict the user being served
+        while self.total_bytes > self.max_bytes and len(self._users) > 1:
+            self._evict()
+            self.evicted_memory += 1
+        return context
+
+    def _expire(self) -> None:
+        # Oldest activity is at the front, so stop at the first fresh record
+        deadline = time.monotonic() - self.ttl
+        while self._users:
+            context = next(iter(self._users.values()))
+            if context.last_seen >= deadline:
+                break
+            self._evict()
+            self.evicted_expired += 1
+
+    def _evict(self) -> None:
+        _, context = self._users.popitem(last=False)
+        self.total_bytes -= context.size
+
+    def clear(self) -> None:
+        self._users.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            'users': len(self._users),
+            'memory_mb': self.total_bytes / (1024 * 1024),
+            'evicted_lru': self.evicted_lru,
+            'evicted_expired': self.evicted_expired,
+            'evicted_memory': self.evicted_memory,
+        }
 
 class IntelligentAI:
     """Haqiqiy AI kabi ishlaydi - lekin aslida pattern matching"""
     
     def __init__(self):
-        # Context tracking
-        self.conversation_history = {}
-        self.user_preferences = {}
-        self.learning_topics = {}
+        # Context tracking - bounded per-user records
+        self.contexts = UserContextStore()
         
         # Korean conversation patterns - professional & natural
         self.korean_patterns = {
@@ -126,41 +236,27 @@ class IntelligentAI:
             }
         }
         
-        # Smart response generation
-        self.context_memory = {}
-        self.response_variety = {}
+        # Category keyword automata, built once (patterns are matched normalized)
+        self.category_matchers = {
+            language: GroupMatcher([
+                (category, [fold(pattern) for pattern in data["patterns"]])
+                for category, data in patterns.items()
+            ])
+            for language, patterns in (("korean", self.korean_patterns), ("japanese", self.japanese_patterns))
+        }
         
     def analyze_message(self, user_id: int, message: str, language: str = "korean") -> Dict:
         """메시지 분석 및 맥락 파악"""
         
-        # Initialize user context
-        if user_id not in self.conversation_history:
-            self.conversation_history[user_id] = []
-            self.user_preferences[user_id] = {}
+        # Add to conversation history (only the last HISTORY_SIZE messages are kept)
+        self.contexts.add_message(user_id, message, language)
             
-        # Add to conversation history
-        self.conversation_history[user_id].append({
-            "message": message,
-            "timestamp": time.time(),
-            "language": language
-        })
+        # Analyze patterns - when several categories match, the last one wins
+        matcher = self.category_matchers["korean" if language == "korean" else "japanese"]
+        matched = matcher.matched_groups(normalize(message).text)
         
-        # Keep only last 10 messages for context
-        if len(self.conversation_history[user_id]) > 10:
-            self.conversation_history[user_id] = self.conversation_history[user_id][-10:]
-            
-        # Analyze patterns
-        patterns = self.korean_patterns if language == "korean" else self.japanese_patterns
-        
-        detected_category = "general"
-        confidence = 0.0
-        
-        for category, data in patterns.items():
-            for pattern in data["patterns"]:
-                if pattern.lower() in message.lower():
-                    detected_category = category
-                    confidence = 0.8
-                    break
+        detected_category = matched[-1] if matched else "general"
+        confidence = 0.8 if matched else 0.0
                     
         return {
             "category": detected_category,
@@ -182,21 +278,16 @@ class IntelligentAI:
         if category in patterns:
             responses = patterns[category]["responses"]
             
-            # Avoid repetition - track used responses
-            if user_id not in self.response_variety:
-                self.response_variety[user_id] = {}
-            if category not in self.response_variety[user_id]:
-                self.response_variety[user_id][category] = []
-                
-            # Filter out recently used responses
-            available_responses = [r for r in responses if r not in self.response_variety[user_id][category][-3:]]
+            # Avoid repetition - filter out recently used responses
+            recent = self.contexts.get(user_id).recent(category)
+            available_responses = [r for r in responses if r not in recent]
             if not available_responses:
                 available_responses = responses
                 
             main_response = random.choice(available_responses)
             
             # Track usage
-            self.response_variety[user_id][category].append(main_response)
+            recent.append(main_response)
             
             # Add contextual elements
             additional_elements = []
@@ -0,0 +1,50 @@
+"""
+Audience - scheduled jobs' recipients read in user_id order, chunk by chunk
+Rejalashtirilgan xabarlar oluvchilari bazadan qismlab o'qiladi, hech kim chetda qolmaydi
+
+Each chunk is one indexed range scan (`user_id > last seen ... LIMIT n`) on
+a reader connection that is given back before the next chunk, so memory and
+connection time stay bounded whatever the size of the user base.
+"""
+
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence, Tuple
+
+from config import AUDIENCE_CHUNK_SIZE
+from utils.db_pool import db_pool
+
+# Users a scheduled job may message at all
+REACHABLE = "COALESCE(is_blocked, FALSE) = FALSE"
+
+async def iter_audience(columns: str, where: str, params: Sequence[Any] = (),
+                        chunk_size: int = AUDIENCE_CHUNK_SIZE) -> AsyncIterator[List[Tuple[Any, ...]]]:
+    """Yield lists of (user_id, *columns) rows from `users` matching `where`"""
+    last_user_id = None
+    while True:
+        async with db_pool.reader() as db:
+            if last_user_id is None:
+                cursor = await db.execute(f"""
+                    SELECT user_id, {columns} FROM users
+                    WHERE ({where})
+                    ORDER BY user_id LIMIT ?
+                """, (*params, chunk_size))
+            else:
+                cursor = await db.execute(f"""
+                    SELECT user_id, {columns} FROM users
+                    WHERE user_id > ? AND ({where})
+                    ORDER BY user_id LIMIT ?
+                """, (last_user_id, *params, chunk_size))
+            rows = await cursor.fetchall()
+
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_user_id = rows[-1][0]
+
+async def audience_messages(build: Callable[[List[Tuple[Any, ...]]], List[Tuple[int, Optional[str]]]],
+                            columns: str, where: str, params: Sequence[Any] = (),
+                            chunk_size: int = AUDIENCE_CHUNK_SIZE) -> AsyncIterator[List[Tuple[int, Optional[str]]]]:
+    """Chunks of (recipient, text) for outbox.enqueue_stream, built from each chunk of rows"""
+    async for rows in iter_audience(columns, where, params, chunk_size):
+        yield build(rows)
@@ -0,0 +1,99 @@
+"""
+Broadcast Engine - admin mass messaging on top of the outbox
+Barcha foydalanuvchilarga xabar yuborish va jarayonni admin xabarida ko'rsatish
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import BROADCAST_PROGRESS_INTERVAL_SECONDS
+from utils.db_pool import db_pool
+from utils.outbox import enqueue, job_progress
+
+def progress_text(progress: Dict) -> str:
+    total = progress['total']
+    sent = progress.get('sent', 0)
+    blocked = progress.get('blocked', 0)
+    failed = progress.get('failed', 0) + progress.get('unknown', 0)
+    processed = sent + blocked + failed
+    percent = (processed / total * 100) if total else 100
+    header = "✅ <b>Xabar yuborildi!</b>" if progress['done'] else "🚀 <b>Yuborilmoqda...</b>"
+    return (
+        f"{header}\n\n"
+        f"📊 {processed}/{total} ({percent:.0f}%)\n"
+        f"✅ Yuborildi: {sent}\n"
+        f"🚫 Bloklagan: {blocked}\n"
+        f"❌ Xatolik: {failed}"
+    )
+
+def _done_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Admin panel", callback_data="admin_panel")]
+    ])
+
+async def _report_progress(bot: Bot, job_id: int, chat_id: int, message_id: int) -> None:
+    last_text = None
+    while True:
+        try:
+            progress = await job_progress(job_id)
+        except Exception as e:
+            print(f"[BROADCAST] Progress query failed: {e}")
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL_SECONDS)
+            continue
+
+        text = progress_text(progress)
+        if text != last_text:
+            try:
+                await bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=message_id,
+                    reply_markup=_done_keyboard() if progress['done'] else None
+                )
+                last_text = text
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                print(f"[BROADCAST] Progress update failed: {e}")
+
+        if progress['done']:
+            print(f"[BROADCAST] Job {job_id} done: {progress.get('sent', 0)}/{progress['total']} sent")
+            return
+        await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL_SECONDS)
+
+# Reporter tasks are kept referenced so they aren't garbage collected
+_reporters: Dict[int, asyncio.Task] = {}
+
+def _track_progress(bot: Bot, job_id: int, chat_id: int, message_id: int) -> None:
+    task = asyncio.create_task(_report_progress(bot, job_id, chat_id, message_id))
+    _reporters[job_id] = task
+    task.add_done_callback(lambda _: _reporters.pop(job_id, None))
+
+async def start_broadcast(bot: Bot, text: str, chat_id: int, message_id: int) -> Optional[int]:
+    """Queue a broadcast to every reachable user; progress is edited into the given message"""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT user_id FROM users WHERE COALESCE(is_blocked, FALSE) = FALSE")
+        user_ids = [row[0] for row in await cursor.fetchall()]
+
+    job_id = await enqueue(
+        'broadcast', ((user_id, None) for user_id in user_ids), payload=text,
+        report_chat_id=chat_id, report_message_id=message_id
+    )
+    if job_id is not None:
+        _track_progress(bot, job_id, chat_id, message_id)
+    return job_id
+
+async def resume_broadcast_reports(bot: Bot) -> None:
+    """Re-attach progress reporting to broadcasts left unfinished by a restart"""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT id, report_chat_id, report_message_id FROM outbox_jobs
+            WHERE kind = 'broadcast' AND status = 'pending' AND report_chat_id IS NOT NULL
+        """)
+        jobs = await cursor.fetchall()
+
+    for job_id, chat_id, message_id in jobs:
+        _track_progress(bot, job_id, chat_id, message_id)
@@ -0,0 +1,174 @@
+"""
+Catalog Cache - in-memory sections / subsections / content listings
+Bo'limlar katalogini xotirada saqlash; admin o'zgartirganda qayta yuklanadi
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.db_pool import db_pool
+from utils.keyboard_cache import keyboard_cache
+
+CONTENT_LIST_COLUMNS = "id, subsection_id, title, file_id, file_type, caption, is_premium, created_at"
+
+class CatalogCache:
+    """Read-mostly catalog snapshot split into partitions keyed by (kind, *args)"""
+
+    def __init__(self):
+        self._data: Dict[Tuple, Any] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def _fetch(self, key: Tuple, query: str, params: Tuple = (), one: bool = False) -> Any:
+        if key in self._data:
+            self.hits += 1
+            return self._data[key]
+
+        self.misses += 1
+        generation = self._generation
+        async with db_pool.reader() as db:
+            cursor = await db.execute(query, params)
+            value = await cursor.fetchone() if one else await cursor.fetchall()
+
+        # Skip storing if an admin change landed while we were reading
+        if generation == self._generation:
+            self._data[key] = value
+        return value
+
+    async def load(self) -> None:
+        """Preload the learning catalog tree (called at startup)"""
+        generation = self._generation
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT * FROM sections ORDER BY created_at")
+            sections = await cursor.fetchall()
+            cursor = await db.execute("SELECT * FROM subsections ORDER BY id")
+            subsections = await cursor.fetchall()
+            cursor = await db.execute(f"SELECT {CONTENT_LIST_COLUMNS} FROM content ORDER BY created_at")
+            contents = await cursor.fetchall()
+
+        if generation != self._generation:
+            return
+
+        data: Dict[Tuple, Any] = {('sections', None): sections}
+        for section in sections:
+            data[('section', section[0])] = section
+            # ('sections', None) is the all-languages list; a NULL language must not extend it
+            if section[3] is not None:
+                data.setdefault(('sections', section[3]), []).append(section)
+            data[('subsections', section[0])] = []
+        for subsection in subsections:
+            data.setdefault(('subsections', subsection[1]), []).append(subsection)
+            data[('content', subsection[0])] = []
+        for item in contents:
+            data.setdefault(('content', item[1]), []).append(item)
+
+        self._data.update(data)
+        print(f"[CATALOG] Loaded {len(sections)} sections, {len(subsections)} subsections, {len(contents)} content items")
+
+    def invalidate(self, kind: str, *args) -> None:
+        """Drop one partition, or every partition of a kind when no args are given"""
+        self._generation += 1
+        keyboard_cache.invalidate()
+        if args:
+            self._data.pop((kind,) + args, None)
+        else:
+            for key in [key for key in self._data if key[0] == kind]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        self._generation += 1
+        keyboard_cache.invalidate()
+        self._data.clear()
+
+    def stats(self) -> Dict:
+        return {'partitions': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+    # ================================
+    # LEARNING CATALOG
+    # ================================
+
+    async def sections(self, language: Optional[str] = None) -> List[Tuple[Any, ...]]:
+        """Rows of `sections` (SELECT *), optionally for one language"""
+        if language:
+            return await self._fetch(('sections', language),
+                                     "SELECT * FROM sections WHERE language = ? ORDER BY created_at", (language,))
+        return await self._fetch(('sections', None), "SELECT * FROM sections ORDER BY created_at")
+
+    async def section(self, section_id: int) -> Optional[Tuple[Any, ...]]:
+        return await self._fetch(('section', section_id),
+                                 "SELECT * FROM sections WHERE id = ?", (section_id,), one=True)
+
+    async def subsections(self, section_id: int) -> List[Tuple[Any, ...]]:
+        return await self._fetch(('subsections', section_id),
+                                 "SELECT * FROM subsections WHERE section_id = ? ORDER BY id", (section_id,))
+
+    async def subsection(self, subsection_id: int) -> Optional[Tuple[Any, ...]]:
+        """(name, is_premium, section name, language, section id)"""
+        return await self._fetch(('subsection', subsection_id), """
+            SELECT s.name, s.is_premium, sec.name, sec.language, sec.id
+            FROM subsections s
+            JOIN sections sec ON s.section_id = sec.id
+            WHERE s.id = ?
+        """, (subsection_id,), one=True)
+
+    async def content(self, subsection_id: int) -> List[Tuple[Any, ...]]:
+        """Content metadata rows for a subsection, ordered by created_at"""
+        return await self._fetch(('content', subsection_id),
+                                 f"SELECT {CONTENT_LIST_COLUMNS} FROM content WHERE subsection_id = ? ORDER BY created_at",
+                                 (subsection_id,))
+
+    # ================================
+    # CUSTOM / PREMIUM CATALOG
+    # ================================
+
+    async def custom_sections(self) -> List[Tuple[Any, ...]]:
+        return await self._fetch(('custom_sections',), """
+            SELECT id, name, description, icon, is_premium, is_active, order_index, created_at
+            FROM custom_sections
+            WHERE is_active = 1
+            ORDER BY order_index ASC
+        """)
+
+    async def custom_section(self, section_id: int) -> Optional[Tuple[Any, ...]]:
+        return await self._fetch(('custom_section', section_id), """
+            SELECT id, name, description, icon, is_premium
+            FROM custom_sections WHERE id = ?
+        """, (section_id,), one=True)
+
+    async def custom_subsections(self, section_id: int) -> List[Tuple[Any, ...]]:
+        return await self._fetch(('custom_subsections', section_id), """
+            SELECT id, section_id, name, description, icon, is_premium, order_index, created_at
+            FROM custom_subsections
+            WHERE section_id = ?
+            ORDER BY order_index ASC
+        """, (section_id,))
+
+    async def custom_content(self, section_id: Optional[int] = None,
+                             subsection_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        columns = """id, section_id, subsection_id, title, description, content_type,
+                       file_id, file_unique_id, content_text, thumbnail_file_id,
+                       file_size, duration, is_premium, order_index, created_at"""
+        if subsection_id:
+            return await self._fetch(('custom_content', None, subsection_id), f"""
+                SELECT {columns}
+                FROM custom_content
+                WHERE subsection_id = ?
+                ORDER BY order_index ASC
+            """, (subsection_id,))
+        return await self._fetch(('custom_content', section_id, None), f"""
+            SELECT {columns}
+            FROM custom_content
+            WHERE section_id = ? AND subsection_id IS NULL
+            ORDER BY order_index ASC
+        """, (section_id,))
+
+    async def premium_content(self, section_type: str) -> List[Tuple[Any, ...]]:
+        return await self._fetch(('premium_content', section_type), """
+            SELECT id, title, description, file_id, file_type, content_text, order_index
+            FROM premium_content
+            WHERE section_type = ?
+            ORDER BY order_index
+        """, (section_type,))
+
+# Global catalog instance
+catalog_cache = CatalogCache()
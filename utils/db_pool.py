@@ -0,0 +1,208 @@
+"""
+Database Connection Pool - shared aiosqlite connections
+Har bir so'rov uchun yangi ulanish ochish o'rniga umumiy ulanishlardan foydalanish
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+
+from config import (
+    DATABASE_PATH, DB_POOL_SIZE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_BUSY_TIMEOUT_MS, DB_WAL_AUTOCHECKPOINT_PAGES, DB_CHECKPOINT_INTERVAL_SECONDS,
+    DB_WAL_TRUNCATE_BYTES
+)
+
+class ConnectionPool:
+    """Fixed set of reusable reader connections plus one writer connection"""
+
+    def __init__(self, database: str = DATABASE_PATH, size: int = DB_POOL_SIZE):
+        self.database = database
+        self.size = max(1, size)
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        self._started = False
+        self.journal_mode: Optional[str] = None
+        self.last_checkpoint: Optional[Dict] = None
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.database)
+        await conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        await conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+        await conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        await conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        await conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    async def start(self) -> None:
+        """Open all pooled connections"""
+        if self._started:
+            return
+
+        # Writer first: journal_mode=WAL is persistent and lets readers
+        # run alongside the single writer instead of blocking it
+        self._writer = await self._open_connection()
+        cursor = await self._writer.execute("PRAGMA journal_mode = WAL")
+        self.journal_mode = (await cursor.fetchone())[0]
+        await self._writer.execute(f"PRAGMA wal_autocheckpoint = {DB_WAL_AUTOCHECKPOINT_PAGES}")
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await self._open_connection()
+            self._reader_connections.append(conn)
+            self._readers.put_nowait(conn)
+
+        self._started = True
+        if DB_CHECKPOINT_INTERVAL_SECONDS > 0:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+        print(f"[DB POOL] Started with {self.size} readers + 1 writer (journal_mode={self.journal_mode})")
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        if not self._started:
+            return
+
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            try:
+                await self._checkpoint_task
+            except asyncio.CancelledError:
+                pass
+            self._checkpoint_task = None
+
+        # Fold the WAL back into the main file before shutdown
+        try:
+            await self.checkpoint("TRUNCATE")
+        except Exception as e:
+            print(f"[DB POOL] Final checkpoint failed: {e}")
+
+        self._started = False
+        async with self._writer_lock:
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+        for conn in self._reader_connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"[DB POOL] Error closing reader: {e}")
+        self._reader_connections = []
+        self._readers = None
+        print("[DB POOL] Closed")
+
+    @staticmethod
+    async def _reset(conn: aiosqlite.Connection) -> None:
+        # Uncommitted work is discarded, same as closing a one-off connection
+        if conn.in_transaction:
+            await conn.rollback()
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a reader connection for SELECT queries"""
+        if not self._started:
+            async with aiosqlite.connect(self.database) as db:
+                yield db
+            return
+
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            try:
+                await self._reset(conn)
+            finally:
+                if self._readers is not None:
+                    self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Get exclusive access to the writer connection"""
+        if not self._started:
+            async with aiosqlite.connect(self.database) as db:
+                yield db
+            return
+
+        async with self._writer_lock:
+            try:
+                yield self._writer
+            finally:
+                await self._reset(self._writer)
+
+    # ================================
+    # WAL CHECKPOINTS
+    # ================================
+
+    @property
+    def wal_path(self) -> str:
+        return f"{self.database}-wal"
+
+    def wal_size(self) -> int:
+        """Current WAL file size in bytes"""
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    async def checkpoint(self, mode: Optional[str] = None) -> Dict:
+        """Run a WAL checkpoint; TRUNCATE when the WAL grew past the threshold"""
+        wal_before = self.wal_size()
+        if mode is None:
+            mode = "TRUNCATE" if wal_before >= DB_WAL_TRUNCATE_BYTES else "PASSIVE"
+
+        started_at = time.monotonic()
+        async with self.writer() as db:
+            cursor = await db.execute(f"PRAGMA wal_checkpoint({mode})")
+            busy, log_frames, checkpointed_frames = await cursor.fetchone()
+
+        self.last_checkpoint = {
+            'mode': mode,
+            'busy': bool(busy),
+            'log_frames': log_frames,
+            'checkpointed_frames': checkpointed_frames,
+            'wal_bytes_before': wal_before,
+            'wal_bytes_after': self.wal_size(),
+            'duration_ms': (time.monotonic() - started_at) * 1000,
+            'at': time.time()
+        }
+        return self.last_checkpoint
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(DB_CHECKPOINT_INTERVAL_SECONDS)
+            try:
+                result = await self.checkpoint()
+                if result['busy'] or result['mode'] == "TRUNCATE":
+                    print(f"[DB POOL] Checkpoint {result['mode']}: "
+                          f"{result['checkpointed_frames']}/{result['log_frames']} frames, "
+                          f"WAL {result['wal_bytes_before']} -> {result['wal_bytes_after']} bytes")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DB POOL] Checkpoint error: {e}")
+
+    def wal_report(self) -> Dict:
+        """Storage profile and WAL status for monitoring"""
+        return {
+            'journal_mode': self.journal_mode,
+            'synchronous': DB_SYNCHRONOUS,
+            'cache_size_kb': DB_CACHE_SIZE_KB,
+            'mmap_size': DB_MMAP_SIZE,
+            'wal_bytes': self.wal_size(),
+            'wal_truncate_bytes': DB_WAL_TRUNCATE_BYTES,
+            'last_checkpoint': self.last_checkpoint
+        }
+
+# Global pool instance
+db_pool = ConnectionPool()
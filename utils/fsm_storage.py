@@ -0,0 +1,146 @@
+"""
+FSM Storage - aiogram FSM state kept in the bot's SQLite database
+Foydalanuvchi holatlari bazada saqlanadi va qayta ishga tushganda yo'qolmaydi
+
+Rows are written through on every change and read back through a small LRU
+cache, so the lookup aiogram makes for every update rarely touches SQLite.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import FSM_CACHE_SIZE, FSM_STATE_TTL_SECONDS
+from utils.db_pool import db_pool
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"FSM data value of type {type(value).__name__} is not storable")
+
+def _decode(obj: Dict) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+def dump_data(data: Mapping[str, Any]) -> str:
+    """Compact JSON; tuples come back as lists, datetimes as datetimes"""
+    return json.dumps(data, default=_encode, ensure_ascii=False, separators=(",", ":"))
+
+def load_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode) if raw else {}
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage on the `fsm_storage` table with a write-through LRU cache"""
+
+    def __init__(self, cache_size: int = FSM_CACHE_SIZE, ttl: int = FSM_STATE_TTL_SECONDS):
+        self.cache_size = max(1, cache_size)
+        self.ttl = ttl
+        # key -> (state, serialized data, updated_at); keys without state are cached too
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Optional[str], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) if part is not None else "" for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+        ))
+
+    def _remember(self, key: str, state: Optional[str], data: Optional[str], updated_at: float) -> None:
+        self._cache[key] = (state, data, updated_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        entry = self._cache.get(key)
+        now = time.time()
+        if entry is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            state, data, updated_at = entry
+        else:
+            self.misses += 1
+            async with db_pool.reader() as db:
+                cursor = await db.execute(
+                    "SELECT state, data, updated_at FROM fsm_storage WHERE key = ?", (key,)
+                )
+                row = await cursor.fetchone()
+            state, data, updated_at = row if row else (None, None, now)
+            self._remember(key, state, data, updated_at)
+
+        if (state or data) and updated_at < now - self.ttl:
+            # Stale conversation - start over (the row goes in the next purge)
+            self._remember(key, None, None, now)
+            return None, None
+        return state, data
+
+    async def _store(self, key: str, state: Optional[str], data: Optional[str]) -> None:
+        now = time.time()
+        self._remember(key, state, data, now)
+        async with db_pool.writer() as db:
+            if state is None and not data:
+                await db.execute("DELETE FROM fsm_storage WHERE key = ?", (key,))
+            else:
+                await db.execute("""
+                    INSERT INTO fsm_storage (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+                """, (key, state, data, now))
+            await db.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        storage_key = self._key(key)
+        _, data = await self._load(storage_key)
+        await self._store(storage_key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self._key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        storage_key = self._key(key)
+        state, _ = await self._load(storage_key)
+        await self._store(storage_key, state, dump_data(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self._key(key))
+        return load_data(data)
+
+    async def purge_expired(self) -> int:
+        """Delete states untouched for longer than the TTL"""
+        deadline = time.time() - self.ttl
+        async with db_pool.writer() as db:
+            cursor = await db.execute("DELETE FROM fsm_storage WHERE updated_at < ?", (deadline,))
+            await db.commit()
+        for key in [key for key, entry in self._cache.items() if entry[2] < deadline]:
+            del self._cache[key]
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'cached': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total else 0.0
+        }
+
+    async def close(self) -> None:
+        # Connections belong to db_pool; every change is already written
+        self._cache.clear()
+
+# Global storage instance
+fsm_storage = SQLiteStorage()
@@ -0,0 +1,86 @@
+"""
+Keyboard Cache - inline keyboards are built once and reused
+Tugmalar har safar qayta yaratilmaydi, bir marta quriladi va qayta ishlatiladi
+
+Building an InlineKeyboardMarkup validates every button through pydantic,
+which costs far more than the handler around it. Keyboards are plain data,
+so the same arguments always give the same keyboard:
+- @keyboard_cache.static - fixed keyboards and ones with a handful of
+  argument values (flags, language); kept for the life of the process
+- @keyboard_cache.memoize - keyboards built from ids or database rows; kept
+  in a bounded LRU keyed by the arguments (rows included), dropped whenever
+  the catalog or quiz cache is invalidated
+
+Cached keyboards are shared between callers and must not be modified.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from config import KEYBOARD_CACHE_SIZE
+
+def _freeze(value: Any) -> Hashable:
+    """Lists of rows become tuples so they can be part of a cache key"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class KeyboardCache:
+    """Static keyboards plus a bounded LRU for data-dependent ones"""
+
+    def __init__(self, maxsize: int = KEYBOARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._static: Dict[Tuple, Any] = {}
+        self._lru: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def static(self, func: Callable) -> Callable:
+        """For keyboards whose arguments take only a few values"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            keyboard = self._static.get(key)
+            if keyboard is None:
+                self.misses += 1
+                keyboard = self._static[key] = func(*args, **kwargs)
+            else:
+                self.hits += 1
+            return keyboard
+        return wrapper
+
+    def memoize(self, func: Callable) -> Callable:
+        """For keyboards built from ids or rows; least recently used go first"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, _freeze(args), _freeze(tuple(sorted(kwargs.items()))))
+            keyboard = self._lru.get(key)
+            if keyboard is not None:
+                self.hits += 1
+                self._lru.move_to_end(key)
+                return keyboard
+
+            self.misses += 1
+            keyboard = self._lru[key] = func(*args, **kwargs)
+            if len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+            return keyboard
+        return wrapper
+
+    def invalidate(self) -> None:
+        """Drop the data-dependent keyboards (after sections or quizzes change)"""
+        self._lru.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'static': len(self._static),
+            'cached': len(self._lru),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total else 0.0,
+        }
+
+# Global keyboard cache instance
+keyboard_cache = KeyboardCache()
@@ -0,0 +1,195 @@
+"""
+Keyword Matcher - Aho-Corasick multi-pattern search
+Ko'p kalit so'zlarni matndan bitta o'tishda topish
+"""
+
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+class KeywordMatcher:
+    """Finds every keyword contained in a text in one pass over the text.
+
+    Keywords keep their position in the input sequence, which is what the
+    priority rules use:
+    - first_match(): the keyword that comes first in the input (same result
+      as looping over the keywords with `key in text`)
+    - longest_match(): the longest keyword found, ties go to the earlier one
+    """
+
+    __slots__ = ('keywords', '_delta', '_output', '_first')
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(keywords)
+        goto: List[Dict[str, int]] = [{}]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for index, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue  # "" in text is always true, but it's never a useful key
+            node = 0
+            for char in keyword:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    self._output.append(())
+                node = next_node
+            self._output[node] += (index,)
+
+        # Failure links (breadth-first); outputs inherit those of their fallback node
+        fail: List[int] = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                fallback = fail[node]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[child] = target if target != child else 0
+                self._output[child] += self._output[fail[child]]
+
+        # Fold the failure links into the transitions so scanning is one dict
+        # lookup per character. Each node only keeps the moves that differ from
+        # the root's, anything else falls back to the root's transitions.
+        self._delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            queue.extend(goto[node].values())
+            if fail[node]:
+                self._delta[node].update(self._delta[fail[node]])
+            self._delta[node].update(goto[node])
+
+        no_match = len(self.keywords)
+        self._first: List[int] = [min(output) if output else no_match for output in self._output]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def matches(self, text: str) -> Set[int]:
+        """Indexes of all keywords contained in text"""
+        delta, output = self._delta, self._output
+        root = delta[0]
+        found: Set[int] = set()
+        node = 0
+        for char in text:
+            node = delta[node].get(char) or root.get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+    def first_index(self, text: str) -> Optional[int]:
+        """Input position of the earliest keyword contained in text, None if nothing matches"""
+        delta, first = self._delta, self._first
+        root = delta[0]
+        best = no_match = len(self.keywords)
+        node = 0
+        for char in text:
+            node = delta[node].get(char) or root.get(char, 0)
+            if first[node] < best:
+                best = first[node]
+        return best if best != no_match else None
+
+    def first_match(self, text: str) -> Optional[str]:
+        """The keyword that comes first in the input order, None if nothing matches"""
+        index = self.first_index(text)
+        return self.keywords[index] if index is not None else None
+
+    def longest_match(self, text: str) -> Optional[str]:
+        found = self.matches(text)
+        if not found:
+            return None
+        return self.keywords[min(found, key=lambda index: (-len(self.keywords[index]), index))]
+
+# Below this many keywords a plain `key in text` loop is faster than the automaton
+# (python -m benchmarks.keyword_matcher_bench: the loop wins up to ~450 keys)
+AUTOMATON_MIN_KEYWORDS = 500
+
+class LoopMatcher:
+    """first_index() / first_match() by looping over the keywords, for short lists"""
+
+    __slots__ = ('keywords', '_indexed')
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(keywords)
+        # Empty keywords are skipped, as in KeywordMatcher
+        self._indexed = [(index, keyword) for index, keyword in enumerate(self.keywords) if keyword]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def first_index(self, text: str) -> Optional[int]:
+        for index, keyword in self._indexed:
+            if keyword in text:
+                return index
+        return None
+
+    def first_match(self, text: str) -> Optional[str]:
+        index = self.first_index(text)
+        return self.keywords[index] if index is not None else None
+
+def first_match_matcher(keywords: Iterable[str]):
+    """LoopMatcher or KeywordMatcher for first-match lookups, whichever is faster at this size"""
+    keywords = list(keywords)
+    if len(keywords) >= AUTOMATON_MIN_KEYWORDS:
+        return KeywordMatcher(keywords)
+    return LoopMatcher(keywords)
+
+class GroupMatcher:
+    """Maps keywords to groups (e.g. conversation categories) in one pass"""
+
+    __slots__ = ('groups', '_matcher', '_group_of')
+
+    def __init__(self, groups: Sequence[Tuple[str, Iterable[str]]]):
+        self.groups: List[str] = []
+        keywords: List[str] = []
+        self._group_of: List[int] = []
+        for group_index, (group, group_keywords) in enumerate(groups):
+            self.groups.append(group)
+            for keyword in group_keywords:
+                keywords.append(keyword)
+                self._group_of.append(group_index)
+        self._matcher = KeywordMatcher(keywords)
+
+    def matched_groups(self, text: str) -> List[str]:
+        """Groups with at least one keyword in text, in group order"""
+        indexes = {self._group_of[index] for index in self._matcher.matches(text)}
+        return [self.groups[index] for index in sorted(indexes)]
+
+class RuleIndex:
+    """Rules (rule_id, keywords, priority, ...) compiled into one keyword automaton.
+
+    first() returns the rule with the lowest priority that has a keyword in the
+    text, ties going to the earlier rule - the same answer as an if/elif chain
+    in priority order doing `any(keyword in text for keyword in ...)` per branch,
+    without walking every branch on a miss.
+    """
+
+    __slots__ = ('rules', '_matcher', '_rule_of')
+
+    def __init__(self, rules: Iterable[Tuple[Any, ...]], normalize: Optional[Callable[[str], str]] = None):
+        # sorted() is stable, so equal priorities keep their table order
+        self.rules: List[Tuple[Any, ...]] = sorted(rules, key=lambda rule: rule[2])
+        keywords: List[str] = []
+        self._rule_of: List[int] = []
+        for rule_index, rule in enumerate(self.rules):
+            for keyword in rule[1]:
+                # Texts are expected in the same normalized form
+                keywords.append(normalize(keyword) if normalize else keyword)
+                self._rule_of.append(rule_index)
+        self._matcher = KeywordMatcher(keywords)
+
+    def first(self, text: str) -> Optional[Tuple[Any, ...]]:
+        """The rule that answers text, None if no rule matches"""
+        index = self._matcher.first_index(text)
+        return self.rules[self._rule_of[index]] if index is not None else None
+
+    def hits(self, text: str) -> List[Tuple[Any, int, List[str]]]:
+        """(rule_id, priority, matched keywords) of every rule text triggers, winner first"""
+        found: Dict[int, List[str]] = {}
+        for index in sorted(self._matcher.matches(text)):
+            found.setdefault(self._rule_of[index], []).append(self._matcher.keywords[index])
+        return [(self.rules[rule][0], self.rules[rule][2], keywords) for rule, keywords in sorted(found.items())]
@@ -0,0 +1,206 @@
+"""
+Rating Leaderboard - in-memory ranking of users by rating_score
+Reyting jadvali xotirada: top-N va "mening o'rnim" har safar jadvalni saralamasdan
+
+Only users with rating_score > 0 are ranked, same as the SQL it replaces.
+Order: rating_score, words_learned, quiz_score_total, total_sessions (all DESC).
+Rating deltas are applied as they are buffered (see utils/write_behind.py), so
+the ranking already includes updates the database hasn't received yet.
+
+The keys are kept as a bucketed sorted list: an update moves one key between
+buckets of at most 2 * BUCKET_SIZE keys instead of shifting the whole list
+(python -m benchmarks.leaderboard_bench).
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.db_pool import db_pool
+from utils.write_behind import activity_buffer
+
+# (-rating, -words, -quiz_score_total, -sessions, user_id): ascending order is the ranking
+_Key = Tuple[float, int, int, int, int]
+
+# Keys per bucket after a split
+BUCKET_SIZE = 1000
+
+class SortedKeys:
+    """Sorted list of unique keys split into buckets, with the largest key of each
+    bucket in `_maxes`: add / remove bisect to a bucket and shift only that bucket"""
+
+    __slots__ = ('_buckets', '_maxes', '_len')
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets: List[List[Any]] = [keys[i:i + BUCKET_SIZE] for i in range(0, len(keys), BUCKET_SIZE)]
+        self._maxes: List[Any] = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def add(self, key) -> None:
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            return
+
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            # Past the last key - goes at the end of the last bucket
+            pos -= 1
+            bucket = self._buckets[pos]
+            bucket.append(key)
+            self._maxes[pos] = key
+        else:
+            bucket = self._buckets[pos]
+            insort(bucket, key)
+
+        if len(bucket) > 2 * BUCKET_SIZE:
+            tail = bucket[BUCKET_SIZE:]
+            del bucket[BUCKET_SIZE:]
+            self._buckets.insert(pos + 1, tail)
+            self._maxes[pos] = bucket[-1]
+            self._maxes.insert(pos + 1, tail[-1])
+
+    def remove(self, key) -> None:
+        """Remove a key that is in the list"""
+        pos = bisect_left(self._maxes, key)
+        bucket = self._buckets[pos]
+        del bucket[bisect_left(bucket, key)]
+        self._len -= 1
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+
+    def count_below(self, key) -> int:
+        """Number of keys < key (key may be a prefix tuple)"""
+        pos = bisect_left(self._maxes, key)
+        count = sum(map(len, self._buckets[:pos]))
+        if pos < len(self._buckets):
+            count += bisect_left(self._buckets[pos], key)
+        return count
+
+    def head(self, limit: int) -> List[Any]:
+        """The `limit` smallest keys"""
+        keys: List[Any] = []
+        for bucket in self._buckets:
+            if len(keys) >= limit:
+                break
+            keys.extend(bucket[:limit - len(keys)])
+        return keys
+
+class RatingLeaderboard:
+    """Sorted keys for top-N / rank lookups plus a user_id -> key map for updates"""
+
+    def __init__(self):
+        self._keys = SortedKeys()
+        self._by_user: Dict[int, _Key] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def load(self) -> None:
+        """Rebuild from the database (startup and periodic reconciliation)"""
+        # Holding the flush lock keeps rows and pending deltas from overlapping:
+        # nothing moves from the buffer into the table while we read
+        async with activity_buffer.flush_lock:
+            async with db_pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT user_id, rating_score, words_learned, quiz_score_total, total_sessions
+                    FROM users
+                """)
+                rows = await cursor.fetchall()
+
+            totals = {row[0]: [row[1] or 0.0, row[2] or 0, row[3] or 0, row[4] or 0] for row in rows}
+            for user_id, (rating, words, sessions) in activity_buffer.pending_items():
+                if user_id in totals:
+                    values = totals[user_id]
+                    values[0] += rating
+                    values[1] += words
+                    values[3] += sessions
+
+            by_user = {
+                user_id: (-rating, -words, -quiz, -sessions, user_id)
+                for user_id, (rating, words, quiz, sessions) in totals.items()
+                if rating > 0
+            }
+
+        drift = 0
+        if self.loaded:
+            drift = sum(1 for user_id, key in by_user.items() if self._by_user.get(user_id) != key)
+            drift += sum(1 for user_id in self._by_user if user_id not in by_user)
+
+        self._by_user = by_user
+        self._keys = SortedKeys(by_user.values())
+        if self.loaded and drift:
+            print(f"[LEADERBOARD] Reconciled {drift} drifted users")
+        self.loaded = True
+
+    def apply(self, user_id: int, rating: float = 0, words: int = 0,
+              quiz_score: int = 0, sessions: int = 0) -> None:
+        """Apply counter deltas for a user (no-op until loaded)"""
+        if not self.loaded:
+            return
+
+        old = self._by_user.get(user_id)
+        if old is not None:
+            self._keys.remove(old)
+            new = (old[0] - rating, old[1] - words, old[2] - quiz_score, old[3] - sessions, user_id)
+        else:
+            # Not ranked yet (no points) - counters other than the rating are
+            # picked up at the next reconciliation
+            new = (-rating, -words, -quiz_score, -sessions, user_id)
+
+        if -new[0] > 0:
+            self._by_user[user_id] = new
+            self._keys.add(new)
+        else:
+            self._by_user.pop(user_id, None)
+
+    def rank(self, rating_score: float) -> int:
+        """1 + number of users with a higher rating"""
+        return self._keys.count_below((-rating_score,)) + 1
+
+    def score(self, user_id: int) -> float:
+        key = self._by_user.get(user_id)
+        return -key[0] if key else 0.0
+
+    def top(self, limit: int) -> List[Tuple[int, float, int]]:
+        """(user_id, rating_score, words_learned) of the best users"""
+        return [(key[4], -key[0], -key[1]) for key in self._keys.head(limit)]
+
+    async def top_rows(self, limit: int) -> List[Tuple[Any, ...]]:
+        """Top users as (user_id, first_name, username, rating_score, words_learned,
+        quiz_score_total, quiz_attempts)"""
+        top = self.top(limit)
+        if not top:
+            return []
+
+        placeholders = ",".join("?" * len(top))
+        async with db_pool.reader() as db:
+            cursor = await db.execute(f"""
+                SELECT user_id, first_name, username, quiz_score_total, quiz_attempts
+                FROM users WHERE user_id IN ({placeholders})
+            """, [user_id for user_id, _, _ in top])
+            profiles = {row[0]: row[1:] for row in await cursor.fetchall()}
+
+        rows = []
+        for user_id, rating, words in top:
+            profile = profiles.get(user_id)
+            if profile is None:
+                continue  # Deleted since the last reconciliation
+            first_name, username, quiz_score_total, quiz_attempts = profile
+            rows.append((user_id, first_name, username, rating, words, quiz_score_total, quiz_attempts))
+        return rows
+
+# Global leaderboard instance
+rating_leaderboard = RatingLeaderboard()
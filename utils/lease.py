@@ -0,0 +1,108 @@
+"""
+Lease - one process at a time runs the background jobs
+Bir nechta jarayon ishlaganda rejalashtirilgan vazifalarni faqat bittasi bajaradi
+
+Processes sharing the database compete for a named row in `leases`. The holder
+renews it every third of the TTL; if it dies, another process takes over once
+the row expires. A holder that cannot renew gives the lease up locally before
+the row expires, so two holders never overlap.
+"""
+
+import asyncio
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Optional
+
+from config import SCHEDULER_LEASE_SECONDS
+from utils.db_pool import db_pool
+
+class LeaderLease:
+    """Named lease in the `leases` table; `held` is true while this process owns it"""
+
+    def __init__(self, name: str, ttl: float = SCHEDULER_LEASE_SECONDS):
+        self.name = name
+        self.ttl = max(3.0, ttl)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._valid_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def held(self) -> bool:
+        return time.time() < self._valid_until
+
+    async def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, renew it if it is ours"""
+        now = time.time()
+        async with db_pool.writer() as db:
+            await db.execute("""
+                INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+            """, (self.name, self.owner, now + self.ttl, now))
+            await db.commit()
+            cursor = await db.execute("SELECT owner FROM leases WHERE name = ?", (self.name,))
+            row = await cursor.fetchone()
+
+        if row and row[0] == self.owner:
+            # Half the TTL, counted from before the write: after two missed
+            # renewals we let go while the row is still ours
+            self._valid_until = now + self.ttl / 2
+        else:
+            self._valid_until = 0.0
+        return self.held
+
+    async def release(self) -> None:
+        self._valid_until = 0.0
+        async with db_pool.writer() as db:
+            await db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+            await db.commit()
+
+    def start(self, on_acquired: Callable[[], Awaitable[None]],
+              on_lost: Callable[[], Awaitable[None]]) -> None:
+        """Keep competing for the lease in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(on_acquired, on_lost))
+
+    async def stop(self) -> None:
+        """Stop competing and hand the lease over right away"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.held:
+            await self.release()
+
+    async def _loop(self, on_acquired: Callable[[], Awaitable[None]],
+                    on_lost: Callable[[], Awaitable[None]]) -> None:
+        leading = False
+        while True:
+            try:
+                await self.try_acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[LEASE] Renewing '{self.name}' failed: {e}")
+
+            try:
+                if self.held and not leading:
+                    leading = True
+                    print(f"[LEASE] {self.owner} holds '{self.name}'")
+                    await on_acquired()
+                elif leading and not self.held:
+                    leading = False
+                    print(f"[LEASE] {self.owner} lost '{self.name}'")
+                    await on_lost()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[LEASE] Switching '{self.name}' failed: {e}")
+
+            await asyncio.sleep(self.ttl / 3)
+
+# Background jobs (scheduler, outbox, broadcast reports) run in the holder only
+scheduler_lease = LeaderLease("scheduler")
@@ -0,0 +1,275 @@
+"""
+Schema Migrations - versioned database changes
+Ma'lumotlar bazasi sxemasini versiyalar bo'yicha yangilash
+"""
+
+from typing import Awaitable, Callable, List, Tuple, Union
+
+import aiosqlite
+
+MigrationStep = Union[List[str], Callable[[aiosqlite.Connection], Awaitable[None]]]
+
+async def _table_columns(db: aiosqlite.Connection, table: str) -> List[str]:
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in await cursor.fetchall()]
+
+async def _add_content_columns(db: aiosqlite.Connection) -> None:
+    """Content handlers read caption and is_premium; older databases lack them"""
+    columns = await _table_columns(db, "content")
+    if "caption" not in columns:
+        await db.execute("ALTER TABLE content ADD COLUMN caption TEXT")
+    if "is_premium" not in columns:
+        await db.execute("ALTER TABLE content ADD COLUMN is_premium BOOLEAN DEFAULT FALSE")
+
+async def _add_users_blocked_column(db: aiosqlite.Connection) -> None:
+    """Users who blocked the bot are flagged and skipped by broadcasts"""
+    if "is_blocked" not in await _table_columns(db, "users"):
+        await db.execute("ALTER TABLE users ADD COLUMN is_blocked BOOLEAN DEFAULT FALSE")
+
+async def _add_quiz_analytics(db: aiosqlite.Connection) -> None:
+    """Completion time per attempt plus rollup tables fed from quiz_answers / quiz_attempts"""
+    if "duration_seconds" not in await _table_columns(db, "quiz_attempts"):
+        await db.execute("ALTER TABLE quiz_attempts ADD COLUMN duration_seconds INTEGER")
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_question_stats (
+            question_id INTEGER PRIMARY KEY,
+            quiz_id INTEGER NOT NULL,
+            answers INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            chose_a INTEGER NOT NULL DEFAULT 0,
+            chose_b INTEGER NOT NULL DEFAULT 0,
+            chose_c INTEGER NOT NULL DEFAULT 0,
+            chose_d INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_question_stats_quiz ON quiz_question_stats (quiz_id)")
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_stats (
+            quiz_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            timed_attempts INTEGER NOT NULL DEFAULT 0,
+            total_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_rollup_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_answer_id INTEGER NOT NULL,
+            last_attempt_id INTEGER NOT NULL,
+            updated_at TIMESTAMP
+        )
+    """)
+
+# (version, description, step) - append new migrations at the end, never edit applied ones
+MIGRATIONS: List[Tuple[int, str, MigrationStep]] = [
+    (1, "custom sections, subsections and content tables", [
+        """
+        CREATE TABLE IF NOT EXISTS custom_sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            icon TEXT DEFAULT '📂',
+            is_premium INTEGER DEFAULT 0,
+            is_active INTEGER DEFAULT 1,
+            order_index INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS custom_subsections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER,
+            name TEXT NOT NULL,
+            description TEXT,
+            icon TEXT DEFAULT '📄',
+            is_premium INTEGER DEFAULT 0,
+            order_index INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (section_id) REFERENCES custom_sections (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS custom_content (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER,
+            subsection_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            content_type TEXT NOT NULL,
+            file_id TEXT,
+            file_unique_id TEXT,
+            content_text TEXT,
+            thumbnail_file_id TEXT,
+            file_size INTEGER,
+            duration INTEGER,
+            is_premium INTEGER DEFAULT 0,
+            order_index INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by INTEGER,
+            FOREIGN KEY (section_id) REFERENCES custom_sections (id),
+            FOREIGN KEY (subsection_id) REFERENCES custom_subsections (id)
+        )
+        """
+    ]),
+    (2, "content caption and is_premium columns", _add_content_columns),
+    (3, "indexes for hot queries", [
+        # users.referral_code already has an index through its UNIQUE constraint
+        "CREATE INDEX IF NOT EXISTS idx_referrals_referrer ON referrals (referrer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_rating_score ON users (rating_score DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_questions_quiz ON quiz_questions (quiz_id)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user ON quiz_attempts (user_id, completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_user_progress_user_content ON user_progress (user_id, content_id)",
+        "CREATE INDEX IF NOT EXISTS idx_subsections_section ON subsections (section_id)",
+        "CREATE INDEX IF NOT EXISTS idx_content_subsection ON content (subsection_id)",
+        "CREATE INDEX IF NOT EXISTS idx_custom_subsections_section ON custom_subsections (section_id)",
+        "CREATE INDEX IF NOT EXISTS idx_custom_content_section ON custom_content (section_id, subsection_id)",
+        "CREATE INDEX IF NOT EXISTS idx_custom_content_subsection ON custom_content (subsection_id)"
+    ]),
+    (4, "write-behind flush state", [
+        """
+        CREATE TABLE IF NOT EXISTS activity_flush_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_batch INTEGER NOT NULL
+        )
+        """
+    ]),
+    (5, "users.is_blocked flag", _add_users_blocked_column),
+    (6, "outbox for bulk messages", [
+        """
+        CREATE TABLE IF NOT EXISTS outbox_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            job_key TEXT UNIQUE,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            report_chat_id INTEGER,
+            report_message_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            recipient INTEGER NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            sent_at TIMESTAMP,
+            UNIQUE (job_id, recipient),
+            FOREIGN KEY (job_id) REFERENCES outbox_jobs (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_jobs_status ON outbox_jobs (status)"
+    ]),
+    (7, "persistent FSM storage", [
+        """
+        CREATE TABLE IF NOT EXISTS fsm_storage (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated ON fsm_storage (updated_at)"
+    ]),
+    (8, "per-question quiz answers", [
+        """
+        CREATE TABLE IF NOT EXISTS quiz_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            attempt_id INTEGER NOT NULL,
+            quiz_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            user_answer TEXT,
+            is_correct BOOLEAN NOT NULL,
+            points INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (attempt_id) REFERENCES quiz_attempts (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_quiz_answers_attempt ON quiz_answers (attempt_id)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_answers_question ON quiz_answers (question_id)"
+    ]),
+    (9, "quiz analytics rollups", _add_quiz_analytics),
+    (10, "leader leases", [
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    ]),
+    (11, "weekly bonus ledger", [
+        """
+        CREATE TABLE IF NOT EXISTS weekly_bonus_ledger (
+            week TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            points REAL NOT NULL,
+            awarded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (week, user_id)
+        )
+        """
+    ]),
+    (12, "write-behind flush state per shard worker", [
+        # Drops the CHECK (id = 1): row 1 is the single-process buffer, shard N uses row N + 2
+        """
+        CREATE TABLE activity_flush_state_new (
+            id INTEGER PRIMARY KEY,
+            last_batch INTEGER NOT NULL
+        )
+        """,
+        "INSERT INTO activity_flush_state_new (id, last_batch) SELECT id, last_batch FROM activity_flush_state",
+        "DROP TABLE activity_flush_state",
+        "ALTER TABLE activity_flush_state_new RENAME TO activity_flush_state"
+    ]),
+]
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    """Highest applied migration version (0 for a fresh database)"""
+    cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return (await cursor.fetchone())[0]
+
+async def run_migrations(db: aiosqlite.Connection) -> int:
+    """Apply pending migrations in order, each in its own transaction"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.commit()
+
+    current_version = await get_schema_version(db)
+
+    for version, description, step in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        try:
+            await db.execute("BEGIN")
+            if callable(step):
+                await step(db)
+            else:
+                for statement in step:
+                    await db.execute(statement)
+            await db.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            await db.commit()
+            current_version = version
+            print(f"[MIGRATIONS] Applied v{version}: {description}")
+        except Exception as e:
+            await db.rollback()
+            print(f"[MIGRATIONS] ❌ v{version} failed: {e}")
+            raise
+
+    return current_version
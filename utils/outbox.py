@@ -0,0 +1,324 @@
+"""
+Outbox - durable queue for bulk messages
+Ommaviy xabarlar bazadagi navbatga yoziladi va qayta ishga tushgandan keyin ham davom etadi
+"""
+
+import asyncio
+import time
+from typing import AsyncIterable, Dict, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from config import (
+    BROADCAST_RATE_PER_SECOND, BROADCAST_WORKERS, BROADCAST_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL_SECONDS, OUTBOX_RETENTION_DAYS
+)
+from database import set_users_blocked
+from utils.db_pool import db_pool
+
+class TokenBucket:
+    """Global send budget shared by every sender"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens after a flood-wait from Telegram"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+# Shared by every bulk sender so they can't exceed the bot-wide limit together
+send_bucket = TokenBucket(BROADCAST_RATE_PER_SECOND)
+
+# Row statuses: pending -> sending -> sent | blocked | failed | pending (retry)
+# A row still 'sending' after a crash may or may not have been delivered; it
+# becomes 'unknown' instead of being sent twice.
+# Job statuses: filling (enqueue_stream still adding rows) -> pending -> done
+
+async def enqueue(kind: str, messages: Iterable[Tuple[int, Optional[str]]], payload: Optional[str] = None,
+                  job_key: Optional[str] = None, report_chat_id: Optional[int] = None,
+                  report_message_id: Optional[int] = None) -> Optional[int]:
+    """Queue (recipient, text) pairs as one job; text None means the job payload.
+
+    Returns the job id, or None when nothing was queued (no recipients, or a
+    job with the same job_key already exists).
+    """
+    rows = list(messages)
+    if not rows:
+        return None
+
+    async with db_pool.writer() as db:
+        cursor = await db.execute("""
+            INSERT OR IGNORE INTO outbox_jobs (kind, job_key, payload, report_chat_id, report_message_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, (kind, job_key, payload, report_chat_id, report_message_id))
+        if cursor.rowcount == 0:
+            print(f"[OUTBOX] Job {job_key} already queued, skipping")
+            return None
+
+        job_id = cursor.lastrowid
+        await db.executemany(
+            "INSERT OR IGNORE INTO outbox (job_id, recipient, payload) VALUES (?, ?, ?)",
+            [(job_id, recipient, text) for recipient, text in rows]
+        )
+        await db.commit()
+
+    print(f"[OUTBOX] Queued {kind} job {job_id} for {len(rows)} recipients")
+    outbox_worker.wake()
+    return job_id
+
+async def enqueue_stream(kind: str, chunks: AsyncIterable[Iterable[Tuple[int, Optional[str]]]],
+                         payload: Optional[str] = None, job_key: Optional[str] = None) -> Optional[int]:
+    """Queue a job chunk by chunk; the worker starts delivering while later chunks are read.
+
+    The job stays 'filling' (not finished by the worker) until the last chunk
+    is queued. Returns the job id, or None like enqueue().
+    """
+    job_id = None
+    total = 0
+    async for chunk in chunks:
+        rows = list(chunk)
+        if not rows:
+            continue
+
+        async with db_pool.writer() as db:
+            if job_id is None:
+                cursor = await db.execute("""
+                    INSERT OR IGNORE INTO outbox_jobs (kind, job_key, payload, status)
+                    VALUES (?, ?, ?, 'filling')
+                """, (kind, job_key, payload))
+                if cursor.rowcount == 0:
+                    print(f"[OUTBOX] Job {job_key} already queued, skipping")
+                    return None
+                job_id = cursor.lastrowid
+
+            await db.executemany(
+                "INSERT OR IGNORE INTO outbox (job_id, recipient, payload) VALUES (?, ?, ?)",
+                [(job_id, recipient, text) for recipient, text in rows]
+            )
+            await db.commit()
+
+        total += len(rows)
+        outbox_worker.wake()
+
+    if job_id is None:
+        return None
+
+    async with db_pool.writer() as db:
+        await db.execute("UPDATE outbox_jobs SET status = 'pending' WHERE id = ? AND status = 'filling'", (job_id,))
+        # Every row may already be delivered, and the worker only finishes jobs after a batch
+        await OutboxWorker._finish_jobs(db)
+        await db.commit()
+
+    print(f"[OUTBOX] Queued {kind} job {job_id} for {total} recipients")
+    return job_id
+
+async def job_progress(job_id: int) -> Dict:
+    """Row counts per status for a job"""
+    async with db_pool.reader() as db:
+        cursor = await db.execute(
+            "SELECT status, COUNT(*) FROM outbox WHERE job_id = ? GROUP BY status", (job_id,)
+        )
+        counts = dict(await cursor.fetchall())
+        cursor = await db.execute("SELECT status FROM outbox_jobs WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+
+    counts['total'] = sum(counts.values())
+    counts['done'] = bool(row and row[0] == 'done')
+    return counts
+
+class OutboxWorker:
+    """Drains the outbox through the shared token bucket"""
+
+    def __init__(self, batch_size: int = BROADCAST_WORKERS * 2,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL_SECONDS):
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.bot: Optional[Bot] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        if self._task is not None:
+            return
+        self.bot = bot
+        await self._recover()
+        self._task = asyncio.create_task(self._loop())
+        print("[OUTBOX] Worker started")
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Let the batch in flight finish so its rows don't end up 'unknown'"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+        self._stopping = False
+        print("[OUTBOX] Worker stopped")
+
+    async def _recover(self) -> None:
+        async with db_pool.writer() as db:
+            cursor = await db.execute("""
+                UPDATE outbox SET status = 'unknown', last_error = 'interrupted while sending'
+                WHERE status = 'sending'
+            """)
+            interrupted = cursor.rowcount
+            # A job whose filling was cut short sends what got queued
+            cursor = await db.execute("UPDATE outbox_jobs SET status = 'pending' WHERE status = 'filling'")
+            unfinished = cursor.rowcount
+            await self._finish_jobs(db)
+
+            # Drop finished jobs past retention
+            await db.execute(f"""
+                DELETE FROM outbox WHERE job_id IN (
+                    SELECT id FROM outbox_jobs
+                    WHERE status = 'done' AND finished_at < datetime('now', '-{OUTBOX_RETENTION_DAYS} days')
+                )
+            """)
+            await db.execute(f"""
+                DELETE FROM outbox_jobs
+                WHERE status = 'done' AND finished_at < datetime('now', '-{OUTBOX_RETENTION_DAYS} days')
+            """)
+            await db.commit()
+
+            cursor = await db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'")
+            pending = (await cursor.fetchone())[0]
+
+        if interrupted or pending or unfinished:
+            print(f"[OUTBOX] Resuming: {pending} pending, {interrupted} interrupted (not resent), "
+                  f"{unfinished} jobs cut short while queueing")
+
+    @staticmethod
+    async def _finish_jobs(db) -> None:
+        await db.execute("""
+            UPDATE outbox_jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'pending' AND NOT EXISTS (
+                SELECT 1 FROM outbox
+                WHERE outbox.job_id = outbox_jobs.id AND outbox.status IN ('pending', 'sending')
+            )
+        """)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[OUTBOX] Worker error: {e}")
+                processed = 0
+
+            if not processed and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Claim one batch of due rows, deliver them and record the outcome"""
+        async with db_pool.writer() as db:
+            cursor = await db.execute("""
+                SELECT o.id, o.recipient, COALESCE(o.payload, j.payload), o.attempts
+                FROM outbox o
+                JOIN outbox_jobs j ON o.job_id = j.id
+                WHERE o.status = 'pending' AND o.next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY o.id
+                LIMIT ?
+            """, (self.batch_size,))
+            rows = await cursor.fetchall()
+            if not rows:
+                return 0
+
+            # Committed before sending: a crash from here on never resends these rows
+            await db.executemany(
+                "UPDATE outbox SET status = 'sending', attempts = attempts + 1 WHERE id = ?",
+                [(row[0],) for row in rows]
+            )
+            await db.commit()
+
+        results = await asyncio.gather(*(self._deliver(*row) for row in rows))
+
+        blocked_ids = [recipient for (_, recipient, _, _), (status, _, _) in zip(rows, results) if status == 'blocked']
+        async with db_pool.writer() as db:
+            for (outbox_id, _, _, _), (status, error, retry_in) in zip(rows, results):
+                if status == 'sent':
+                    await db.execute(
+                        "UPDATE outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        (outbox_id,)
+                    )
+                elif status == 'pending':
+                    await db.execute(
+                        "UPDATE outbox SET status = 'pending', last_error = ?, "
+                        "next_attempt_at = datetime('now', ?) WHERE id = ?",
+                        (error, f"+{int(retry_in)} seconds", outbox_id)
+                    )
+                else:
+                    await db.execute(
+                        "UPDATE outbox SET status = ?, last_error = ? WHERE id = ?",
+                        (status, error, outbox_id)
+                    )
+            await self._finish_jobs(db)
+            await db.commit()
+
+        if blocked_ids:
+            await set_users_blocked(blocked_ids)
+        return len(rows)
+
+    async def _deliver(self, outbox_id: int, recipient: int, text: Optional[str],
+                       attempts: int) -> Tuple[str, Optional[str], float]:
+        """Returns (status, error, retry delay in seconds)"""
+        attempt = attempts + 1
+        if not text:
+            return 'failed', 'empty payload', 0
+
+        try:
+            await send_bucket.acquire()
+            await self.bot.send_message(recipient, text)
+            return 'sent', None, 0
+        except TelegramRetryAfter as e:
+            send_bucket.pause(e.retry_after)
+            if attempt < BROADCAST_MAX_ATTEMPTS:
+                return 'pending', str(e), e.retry_after
+            return 'failed', str(e), 0
+        except TelegramForbiddenError as e:
+            # Bot was blocked or the account was deactivated
+            return 'blocked', str(e), 0
+        except TelegramBadRequest as e:
+            return 'failed', str(e), 0  # Chat not found etc. - retrying won't help
+        except Exception as e:
+            if attempt < BROADCAST_MAX_ATTEMPTS:
+                return 'pending', str(e), 5 * 2 ** attempt
+            return 'failed', str(e), 0
+
+# Global worker instance
+outbox_worker = OutboxWorker()
@@ -0,0 +1,91 @@
+"""
+Reply Pacing - "thinking" delay for AI replies without holding the handler
+AI javoblarini tabiiy ko'rinishda kechiktirish (handler kutib turmaydi)
+
+Modes (CONVERSATION_PACING):
+- instant:   reply right away
+- simulated: show "typing" and send after a random delay
+- adaptive:  like simulated, but the delay shrinks as delayed replies pile up
+             and drops to instant once PACING_BUSY_THRESHOLD is reached
+"""
+
+import asyncio
+import random
+from typing import Dict, Optional, Set
+
+from aiogram.enums import ChatAction
+from aiogram.types import Message
+
+from config import CONVERSATION_PACING, PACING_MIN_DELAY, PACING_MAX_DELAY, PACING_BUSY_THRESHOLD
+
+PACING_MODES = ("instant", "simulated", "adaptive")
+
+class ReplyPacer:
+    """Sends replies after a delay from background tasks, in order per chat"""
+
+    def __init__(self, mode: str = CONVERSATION_PACING, min_delay: float = PACING_MIN_DELAY,
+                 max_delay: float = PACING_MAX_DELAY, busy_threshold: int = PACING_BUSY_THRESHOLD):
+        if mode not in PACING_MODES:
+            print(f"[PACING] Unknown mode '{mode}', using adaptive")
+            mode = "adaptive"
+        self.mode = mode
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.busy_threshold = max(1, busy_threshold)
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_by_chat: Dict[int, asyncio.Task] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def delay(self) -> float:
+        if self.mode == "instant":
+            return 0.0
+        delay = random.uniform(self.min_delay, self.max_delay)
+        if self.mode == "adaptive":
+            delay *= max(0.0, 1 - self.pending / self.busy_threshold)
+        return delay
+
+    async def reply(self, message: Message, text: str, **kwargs) -> None:
+        """Answer a message; with a delay the handler returns before the reply is sent"""
+        chat_id = message.chat.id
+        previous = self._last_by_chat.get(chat_id)
+        delay = self.delay()
+        if delay <= 0 and previous is None:
+            await message.answer(text, **kwargs)
+            return
+
+        try:
+            await message.bot.send_chat_action(chat_id, ChatAction.TYPING)
+        except Exception as e:
+            print(f"[PACING] Typing indicator failed: {e}")
+
+        task = asyncio.create_task(self._send_later(message, text, delay, previous, kwargs))
+        self._tasks.add(task)
+        self._last_by_chat[chat_id] = task
+        task.add_done_callback(lambda done: self._forget(chat_id, done))
+
+    async def _send_later(self, message: Message, text: str, delay: float,
+                          previous: Optional[asyncio.Task], kwargs: Dict) -> None:
+        # Replies to earlier messages of the same chat go first
+        if previous is not None:
+            await asyncio.wait({previous})
+        await asyncio.sleep(delay)
+        try:
+            await message.answer(text, **kwargs)
+        except Exception as e:
+            print(f"[PACING] Delayed reply to {message.chat.id} failed: {e}")
+
+    def _forget(self, chat_id: int, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._last_by_chat.get(chat_id) is task:
+            del self._last_by_chat[chat_id]
+
+    async def close(self, timeout: float = 5) -> None:
+        """Send out replies still waiting (called on shutdown)"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+# Global pacer instance
+reply_pacer = ReplyPacer()
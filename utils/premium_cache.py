@@ -0,0 +1,53 @@
+"""
+Premium Status Cache - in-process premium lookups
+Premium holatini har safar bazadan o'qimaslik uchun xotiradagi kesh
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config import PREMIUM_CACHE_TTL_SECONDS
+
+class PremiumCache:
+    """user_id -> parsed premium expiry (None = not premium)"""
+
+    def __init__(self, ttl_seconds: int = PREMIUM_CACHE_TTL_SECONDS):
+        # TTL only bounds staleness from writes made outside this process;
+        # in-process changes invalidate entries directly
+        self.ttl = ttl_seconds
+        self._entries: Dict[int, Tuple[Optional[datetime], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[bool]:
+        """Cached premium status, or None when the DB must be asked"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        expires_at = entry[0]
+        return expires_at is not None and datetime.now() < expires_at
+
+    def set(self, user_id: int, expires_at: Optional[datetime]) -> None:
+        self._entries[user_id] = (expires_at, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total else 0.0
+        }
+
+# Global cache instance
+premium_cache = PremiumCache()
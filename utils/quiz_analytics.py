@@ -0,0 +1,101 @@
+"""
+Quiz Analytics - incremental rollups over the quiz answer log
+Savollar va testlar bo'yicha statistika: faqat yangi javoblar qayta hisoblanadi
+
+quiz_answers / quiz_attempts are append-only. Each rollup aggregates the rows
+added since the last watermark and adds them to the stats tables, in the same
+transaction that moves the watermark, so rows are never counted twice.
+"""
+
+from typing import Any, List, Tuple
+
+from utils.db_pool import db_pool
+
+async def roll_up() -> Tuple[int, int]:
+    """Fold new answers and attempts into the stats tables; returns (answers, attempts) added"""
+    async with db_pool.writer() as db:
+        cursor = await db.execute("SELECT last_answer_id, last_attempt_id FROM quiz_rollup_state WHERE id = 1")
+        row = await cursor.fetchone()
+        last_answer_id, last_attempt_id = row if row else (0, 0)
+
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM quiz_answers")
+        max_answer_id = (await cursor.fetchone())[0]
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM quiz_attempts")
+        max_attempt_id = (await cursor.fetchone())[0]
+
+        if max_answer_id == last_answer_id and max_attempt_id == last_attempt_id:
+            return 0, 0
+
+        await db.execute("""
+            INSERT INTO quiz_question_stats
+                (question_id, quiz_id, answers, correct, chose_a, chose_b, chose_c, chose_d)
+            SELECT question_id, quiz_id, COUNT(*), SUM(is_correct),
+                   SUM(user_answer = 'A'), SUM(user_answer = 'B'),
+                   SUM(user_answer = 'C'), SUM(user_answer = 'D')
+            FROM quiz_answers
+            WHERE id > ? AND id <= ?
+            GROUP BY question_id
+            ON CONFLICT(question_id) DO UPDATE SET
+                answers = answers + excluded.answers,
+                correct = correct + excluded.correct,
+                chose_a = chose_a + excluded.chose_a,
+                chose_b = chose_b + excluded.chose_b,
+                chose_c = chose_c + excluded.chose_c,
+                chose_d = chose_d + excluded.chose_d
+        """, (last_answer_id, max_answer_id))
+
+        await db.execute("""
+            INSERT INTO quiz_stats (quiz_id, attempts, total_score, timed_attempts, total_seconds)
+            SELECT quiz_id, COUNT(*), SUM(score),
+                   COUNT(duration_seconds), COALESCE(SUM(duration_seconds), 0)
+            FROM quiz_attempts
+            WHERE id > ? AND id <= ?
+            GROUP BY quiz_id
+            ON CONFLICT(quiz_id) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                total_score = total_score + excluded.total_score,
+                timed_attempts = timed_attempts + excluded.timed_attempts,
+                total_seconds = total_seconds + excluded.total_seconds
+        """, (last_attempt_id, max_attempt_id))
+
+        await db.execute("""
+            INSERT OR REPLACE INTO quiz_rollup_state (id, last_answer_id, last_attempt_id, updated_at)
+            VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+        """, (max_answer_id, max_attempt_id))
+        await db.commit()
+
+    return max_answer_id - last_answer_id, max_attempt_id - last_attempt_id
+
+async def hardest_questions(limit: int = 10, min_answers: int = 5) -> List[Tuple[Any, ...]]:
+    """(question_id, quiz title, question, answers, correct %, A, B, C, D, correct answer),
+    lowest correctness first"""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT s.question_id, q.title, qq.question, s.answers,
+                   100.0 * s.correct / s.answers,
+                   s.chose_a, s.chose_b, s.chose_c, s.chose_d, qq.correct_answer
+            FROM quiz_question_stats s
+            JOIN quiz_questions qq ON qq.id = s.question_id
+            JOIN quizzes q ON q.id = s.quiz_id
+            WHERE s.answers >= ?
+            ORDER BY 1.0 * s.correct / s.answers, s.answers DESC
+            LIMIT ?
+        """, (min_answers, limit))
+        return await cursor.fetchall()
+
+async def quiz_summaries(limit: int = 10) -> List[Tuple[Any, ...]]:
+    """(quiz_id, title, attempts, average score, correct answer %, average seconds), most taken first"""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT s.quiz_id, q.title, s.attempts,
+                   1.0 * s.total_score / s.attempts,
+                   (SELECT 100.0 * SUM(qs.correct) / SUM(qs.answers)
+                    FROM quiz_question_stats qs WHERE qs.quiz_id = s.quiz_id),
+                   CASE WHEN s.timed_attempts > 0 THEN 1.0 * s.total_seconds / s.timed_attempts END
+            FROM quiz_stats s
+            JOIN quizzes q ON q.id = s.quiz_id
+            WHERE s.attempts > 0
+            ORDER BY s.attempts DESC
+            LIMIT ?
+        """, (limit,))
+        return await cursor.fetchall()
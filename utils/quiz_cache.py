@@ -0,0 +1,74 @@
+"""
+Quiz Cache - shared, read-only quiz questions
+Test savollari har bir foydalanuvchi sessiyasiga nusxalanmaydi, xotirada bir marta saqlanadi
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+from config import QUIZ_CACHE_TTL_SECONDS
+from utils.db_pool import db_pool
+from utils.keyboard_cache import keyboard_cache
+
+# (id, question, option_a, option_b, option_c, option_d, correct_answer, points)
+Question = Tuple
+# ((title, description, is_premium, language), questions)
+QuizEntry = Tuple[Tuple, Tuple[Question, ...]]
+
+class QuizCache:
+    """quiz_id -> (quiz info, questions) as immutable tuples shared by every session"""
+
+    def __init__(self, ttl_seconds: int = QUIZ_CACHE_TTL_SECONDS):
+        # The bot's own quiz changes invalidate directly; the TTL bounds how long
+        # edits made outside the bot (e.g. straight in the database) stay unseen
+        self.ttl = ttl_seconds
+        self._quizzes: Dict[int, Tuple[QuizEntry, float]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, quiz_id: int) -> Optional[QuizEntry]:
+        """Quiz info and its questions, None if the quiz doesn't exist"""
+        cached = self._quizzes.get(quiz_id)
+        if cached is not None and cached[1] > time.monotonic():
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        generation = self._generation
+        async with db_pool.reader() as db:
+            cursor = await db.execute("""
+                SELECT title, description, is_premium, language
+                FROM quizzes WHERE id = ?
+            """, (quiz_id,))
+            info = await cursor.fetchone()
+            if not info:
+                return None
+            cursor = await db.execute("""
+                SELECT id, question, option_a, option_b, option_c, option_d, correct_answer, points
+                FROM quiz_questions
+                WHERE quiz_id = ?
+                ORDER BY id
+            """, (quiz_id,))
+            questions = tuple(tuple(row) for row in await cursor.fetchall())
+
+        entry = (tuple(info), questions)
+        # A quiz without questions is probably still being filled in - don't pin it
+        if questions and generation == self._generation:
+            self._quizzes[quiz_id] = (entry, time.monotonic() + self.ttl)
+        return entry
+
+    def invalidate(self, quiz_id: Optional[int] = None) -> None:
+        """Drop one quiz (after its questions changed) or all of them"""
+        self._generation += 1
+        keyboard_cache.invalidate()
+        if quiz_id is None:
+            self._quizzes.clear()
+        else:
+            self._quizzes.pop(quiz_id, None)
+
+    def stats(self) -> Dict:
+        return {'quizzes': len(self._quizzes), 'hits': self.hits, 'misses': self.misses}
+
+# Global cache instance
+quiz_cache = QuizCache()
@@ -1,6 +1,9 @@
-import aiosqlite
-from datetime import datetime, timedelta
-from config import DATABASE_PATH
+import json
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from utils.db_pool import db_pool
+from utils.write_behind import activity_buffer
+from utils.leaderboard import rating_leaderboard
 
 # Rating points for different activities
 RATING_POINTS = {
@@ -20,45 +23,47 @@ RATING_POINTS = {
     'grammar_ai': 2.0        # Grammar AI
 }
 
+def rating_delta(activity_type: str, bonus_points: float = 0):
+    """(rating points, words_learned bonus) earned by an activity"""
+    total_points = RATING_POINTS.get(activity_type, 0) + bonus_points
+    
+    # Update words learned for content activities
+    words_bonus = 0
+    if activity_type in ['content_complete', 'quiz_excellent']:
+        words_bonus = 1 if activity_type == 'content_complete' else 2
+    
+    return total_points, words_bonus
+
 async def update_user_rating(user_id: int, activity_type: str, bonus_points: float = 0):
     """Update user's rating based on activity"""
-    base_points = RATING_POINTS.get(activity_type, 0)
-    total_points = base_points + bonus_points
+    total_points, words_bonus = rating_delta(activity_type, bonus_points)
     
     if total_points <= 0:
         return
     
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            # Update rating score
-            await db.execute("""
-                UPDATE users 
-                SET rating_score = rating_score + ?,
-                    last_activity = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (total_points, user_id))
-            
-            # Update words learned for content activities
-            if activity_type in ['content_complete', 'quiz_excellent']:
-                words_bonus = 1 if activity_type == 'content_complete' else 2
-                await db.execute("""
-                    UPDATE users 
-                    SET words_learned = words_learned + ?
-                    WHERE user_id = ?
-                """, (words_bonus, user_id))
-            
-            await db.commit()
+        # Buffered: flushed with other users' updates in one transaction
+        await activity_buffer.add(user_id, rating=total_points, words=words_bonus)
+        rating_leaderboard.apply(user_id, rating=total_points, words=words_bonus)
     except Exception as e:
         print(f"Rating update error: {e}")
 
-async def calculate_weekly_bonus():
-    """Calculate and award weekly activity bonuses"""
-    one_week_ago = datetime.now() - timedelta(days=7)
+def iso_week(day: Optional[date] = None) -> str:
+    """Ledger key for the ISO week of a day, e.g. 2024-W07"""
+    year, week, _ = (day or date.today()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+async def calculate_weekly_bonus(week: Optional[str] = None) -> Tuple[int, List[int]]:
+    """Award the weekly activity bonus once per ISO week; returns (count, awarded user ids)"""
+    week = week or iso_week()
+    points = RATING_POINTS['weekly_active']
+    one_week_ago = (datetime.now() - timedelta(days=7)).isoformat()
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Get users who were active this week
+    async with db_pool.writer() as db:
+        # The ledger's (week, user_id) key makes a re-run award nobody twice
         cursor = await db.execute("""
-            SELECT user_id, COUNT(*) as activity_count
+            INSERT OR IGNORE INTO weekly_bonus_ledger (week, user_id, points)
+            SELECT ?, user_id, ?
             FROM (
                 SELECT user_id FROM user_progress 
                 WHERE completed_at > ?
@@ -66,19 +71,27 @@ async def calculate_weekly_bonus():
                 SELECT user_id FROM quiz_attempts 
                 WHERE completed_at > ?
             ) as activities
+            WHERE user_id IN (SELECT user_id FROM users)
             GROUP BY user_id
-            HAVING activity_count >= 5  -- At least 5 activities this week
-        """, (one_week_ago.isoformat(), one_week_ago.isoformat()))
-        
-        active_users = await cursor.fetchall()
+            HAVING COUNT(*) >= 5  -- At least 5 activities this week
+            RETURNING user_id
+        """, (week, points, one_week_ago, one_week_ago))
+        awarded = [row[0] for row in await cursor.fetchall()]
         
-        # Award weekly bonus
-        for user_id, activity_count in active_users:
-            await update_user_rating(user_id, 'weekly_active', 0)
+        if awarded:
+            await db.execute("""
+                UPDATE users SET rating_score = rating_score + ?
+                WHERE user_id IN (SELECT value FROM json_each(?))
+            """, (points, json.dumps(awarded)))
+        await db.commit()
+    
+    for user_id in awarded:
+        rating_leaderboard.apply(user_id, rating=points)
+    return len(awarded), awarded
 
 async def get_user_rating_details(user_id: int):
     """Get detailed rating information for user"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT rating_score, words_learned, quiz_score_total, 
                    quiz_attempts, total_sessions, last_activity
@@ -90,24 +103,34 @@ async def get_user_rating_details(user_id: int):
         if not user_data:
             return None
         
+        # Include updates still waiting in the write-behind buffer
+        rating_score, words_learned, total_sessions = user_data[0], user_data[1], user_data[4]
+        pending = activity_buffer.pending(user_id)
+        if pending:
+            rating_score += pending[0]
+            words_learned += pending[1]
+            total_sessions += pending[2]
+        
         # Get user's ranking
-        cursor = await db.execute("""
-            SELECT COUNT(*) + 1 as ranking
-            FROM users 
-            WHERE rating_score > ? AND rating_score > 0
-        """, (user_data[0],))
-        ranking = (await cursor.fetchone())[0]
+        if rating_leaderboard.loaded:
+            ranking = rating_leaderboard.rank(rating_score)
+        else:
+            cursor = await db.execute("""
+                SELECT COUNT(*) + 1 as ranking
+                FROM users 
+                WHERE rating_score > ? AND rating_score > 0
+            """, (rating_score,))
+            ranking = (await cursor.fetchone())[0]
         
         # Calculate level based on rating
-        rating_score = user_data[0]
         level = min(100, max(1, int(rating_score // 50) + 1))
         
         return {
             'rating_score': rating_score,
-            'words_learned': user_data[1],
+            'words_learned': words_learned,
             'quiz_score_total': user_data[2],
             'quiz_attempts': user_data[3],
-            'total_sessions': user_data[4],
+            'total_sessions': total_sessions,
             'last_activity': user_data[5],
             'ranking': ranking,
             'level': level
@@ -115,22 +138,25 @@ async def get_user_rating_details(user_id: int):
 
 async def get_rating_leaderboard(limit: int = 10, language: str = None):
     """Get top users by rating, optionally filtered by language preference"""
+    if language:
+        # This would require tracking user's preferred language
+        # For now, we'll just get all users
+        pass
+    
+    if rating_leaderboard.loaded:
+        return await rating_leaderboard.top_rows(limit)
+    
     query = """
         SELECT u.user_id, u.first_name, u.username, u.rating_score, 
-               u.words_learned, u.quiz_score_total, u.last_activity
+               u.words_learned, u.quiz_score_total, u.quiz_attempts
         FROM users u
         WHERE u.rating_score > 0
     """
     params = []
     
-    if language:
-        # This would require tracking user's preferred language
-        # For now, we'll just get all users
-        pass
-    
     query += " ORDER BY u.rating_score DESC LIMIT ?"
     params.append(limit)
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with db_pool.reader() as db:
         cursor = await db.execute(query, params)
         return await cursor.fetchall()
@@ -1,48 +1,36 @@
-import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
-import aiosqlite
+from apscheduler.triggers.interval import IntervalTrigger
+from datetime import date, datetime, timedelta
 from aiogram import Bot
 
-from config import DATABASE_PATH, MOTIVATIONAL_MESSAGE_HOUR, PREMIUM_PROMOTION_DAYS
+from config import (
+    MOTIVATIONAL_MESSAGE_HOUR, PREMIUM_PROMOTION_DAYS, LEADERBOARD_RECONCILE_MINUTES, QUIZ_ROLLUP_MINUTES
+)
 from messages import MOTIVATIONAL_MESSAGES, PREMIUM_PROMOTION_MESSAGES
-from utils.rating_system import calculate_weekly_bonus
+from utils.rating_system import calculate_weekly_bonus, iso_week
+from utils.db_pool import db_pool
+from utils.premium_cache import premium_cache
+from utils.leaderboard import rating_leaderboard
+from utils.fsm_storage import fsm_storage
+from utils.quiz_analytics import roll_up
+from utils.outbox import enqueue, enqueue_stream
+from utils.audience import REACHABLE, audience_messages
+import json
 import random
 
 scheduler = AsyncIOScheduler()
 
-async def send_weekly_motivational_messages(bot: Bot):
-    """Send personalized weekly motivational messages based on user activity and progress"""
-    try:
-        # Get users with different activity levels for personalized messages
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            cursor = await db.execute("""
-                SELECT user_id, first_name, rating_score, words_learned, quiz_score_total, 
-                       total_sessions, last_activity
-                FROM users 
-                WHERE last_activity > date('now', '-7 days') AND total_sessions >= 1
-                ORDER BY rating_score DESC, last_activity DESC
-                LIMIT 500
-            """)
-            active_users = await cursor.fetchall()
-        
-        print(f"Database query returned {len(active_users)} users")
-        if not active_users:
-            print("No active users found, exiting function")
-            return
-        
-        sent_count = 0
-        print(f"Found {len(active_users)} active users to send messages to")
-        
-        for user_id, first_name, rating, words, quiz_score, sessions, last_activity in active_users:
-            try:
-                name = first_name or "Do'stim"
-                print(f"Attempting to send message to user {user_id} ({name})")
-                
-                # Personalized message based on user progress
-                if rating >= 100:  # High achievers - motivate to continue
-                    message = f"""
+def _motivational_messages(rows):
+    """(user_id, text) for a chunk of active users"""
+    messages = []
+    for user_id, first_name, rating, words, quiz_score, sessions, last_activity in rows:
+        try:
+            name = first_name or "Do'stim"
+            
+            # Personalized message based on user progress
+            if rating >= 100:  # High achievers - motivate to continue
+                message = f"""
 🏆 <b>Mukammal natijalar, {name}!</b>
 
 Siz haqiqatan ham ajoyib o'rganyapsiz! 
@@ -64,9 +52,9 @@ Siz haqiqatan ham ajoyib o'rganyapsiz!
 /premium - batafsil ma'lumot olish
 
 Davom eting - muvaffaqiyat sizni kutmoqda! 🚀
-                    """
-                elif rating >= 50:  # Medium achievers - encourage and promote premium
-                    message = f"""
+                """
+            elif rating >= 50:  # Medium achievers - encourage and promote premium
+                message = f"""
 ⭐ <b>Ajoyib natijalar, {name}!</b>
 
 Siz yaxshi yo'lda ketyapsiz!
@@ -91,9 +79,9 @@ Siz yaxshi yo'lda ketyapsiz!
 /premium buyrug'ini yuboring!
 
 Bu hafta yangi cho'qqilarga chiqaylik! 📚
-                    """
-                else:  # Beginners - basic motivation with gentle premium hint
-                    message = f"""
+                """
+            else:  # Beginners - basic motivation with gentle premium hint
+                message = f"""
 🚀 <b>Ajoyib boshlanish, {name}!</b>
 
 Til o'rganish sayohatingiz boshlanmoqda!
@@ -117,54 +105,45 @@ Til o'rganish sayohatingiz boshlanmoqda!
 /premium - batafsil ma'lumot
 
 Kichik qadamlar katta natijalarga olib keladi! 📖
-                    """
-                
-                await bot.send_message(user_id, message.strip())
-                print(f"✅ Message sent successfully to user {user_id}")
-                sent_count += 1
-                
-                # Small delay to avoid hitting rate limits
-                await asyncio.sleep(0.15)
-                
-            except Exception as e:
-                # User might have blocked the bot
-                print(f"❌ Failed to send message to user {user_id}: {e}")
-                continue
-        
-        print(f"Sent personalized weekly motivational messages to {sent_count} users")
-        
+                """
+            
+            messages.append((user_id, message.strip()))
+            
+        except Exception as e:
+            print(f"❌ Failed to prepare message for user {user_id}: {e}")
+            continue
+    return messages
+
+async def send_weekly_motivational_messages(bot: Bot):
+    """Send personalized weekly motivational messages based on user activity and progress"""
+    try:
+        # Every active user, read and queued chunk by chunk
+        chunks = audience_messages(
+            _motivational_messages,
+            "first_name, rating_score, words_learned, quiz_score_total, total_sessions, last_activity",
+            f"last_activity > date('now', '-7 days') AND total_sessions >= 1 AND {REACHABLE}"
+        )
+
+        # Delivered by the outbox worker; the key stops a restart from queueing this week twice
+        job_id = await enqueue_stream('weekly_motivational', chunks,
+                                      job_key=f"weekly_motivational:{date.today().isoformat()}")
+        if job_id is None:
+            print("No active users to send motivational messages to")
+
     except Exception as e:
         print(f"Error sending motivational messages: {e}")
 
-async def send_premium_promotion_messages(bot: Bot):
-    """Send personalized premium promotion based on user engagement and progress"""
-    try:
-        # Get active non-premium users with their progress data
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            cursor = await db.execute("""
-                SELECT user_id, first_name, rating_score, words_learned, quiz_score_total, 
-                       total_sessions, COALESCE(referral_count, 0) as referral_count
-                FROM users 
-                WHERE (is_premium = FALSE OR premium_expires_at < CURRENT_TIMESTAMP)
-                AND last_activity > date('now', '-14 days')
-                AND total_sessions >= 3
-                ORDER BY rating_score DESC, total_sessions DESC
-                LIMIT 300
-            """)
-            non_premium_users = await cursor.fetchall()
-        
-        if not non_premium_users:
-            return
+def _promotion_messages(rows):
+    """(user_id, text) for a chunk of active non-premium users"""
+    messages = []
+    for user_id, first_name, rating, words, quiz_score, sessions, referrals in rows:
+        try:
+            name = first_name or "Do'stim"
+            remaining_referrals = max(0, 10 - (referrals or 0))
             
-        sent_count = 0
-        for user_id, first_name, rating, words, quiz_score, sessions, referrals in non_premium_users:
-            try:
-                name = first_name or "Do'stim"
-                remaining_referrals = max(0, 10 - (referrals or 0))
-                
-                # Personalized premium promotion based on user engagement  
-                if rating >= 80 and sessions >= 15:  # High engagement users - special offers
-                    message = f"""
+            # Personalized premium promotion based on user engagement  
+            if rating >= 80 and sessions >= 15:  # High engagement users - special offers
+                message = f"""
 💎 <b>TOP foydalanuvchi uchun maxsus taklif!</b>
 
 {name}, siz bizning eng faol o'quvchimiz!
@@ -188,9 +167,9 @@ async def send_premium_promotion_messages(bot: Bot):
 🎁 Yoki {remaining_referrals} ta do'st = 1 oy BEPUL!
 
 Sizning darajangizda Premium zarur! /premium
-                    """
-                elif sessions >= 8:  # Medium engagement - convince with benefits
-                    message = f"""
+                """
+            elif sessions >= 8:  # Medium engagement - convince with benefits
+                message = f"""
 🌟 <b>Natijalaringizni 2x oshiring!</b>
 
 {name}, siz yaxshi yo'ldasiz!
@@ -213,9 +192,9 @@ Sizning darajangizda Premium zarur! /premium
 👥 {remaining_referrals} ta referral = BEPUL oy!
 
 Bugun boshlang: /premium
-                    """
-                else:  # New/less active users - basic introduction
-                    message = f"""
+                """
+            else:  # New/less active users - basic introduction
+                message = f"""
 🚀 <b>Imkoniyatlaringizni oshiring!</b>
 
 {name}, ajoyib boshlanish!
@@ -234,43 +213,55 @@ Premium bilan nima olasiz:
 Sizning referral hisobingiz: {referrals or 0}/10
 
 Bugun boshlang! /premium
-                    """
-                
-                await bot.send_message(user_id, message.strip())
-                sent_count += 1
-                
-                # Delay to avoid rate limits
-                await asyncio.sleep(0.2)
-                
-            except Exception as e:
-                continue
-        
-        print(f"Sent premium promotion messages to {sent_count} users")
-        
+                """
+            
+            messages.append((user_id, message.strip()))
+            
+        except Exception as e:
+            continue
+    return messages
+
+async def send_premium_promotion_messages(bot: Bot):
+    """Send personalized premium promotion based on user engagement and progress"""
+    try:
+        # Active non-premium users with their progress data
+        chunks = audience_messages(
+            _promotion_messages,
+            "first_name, rating_score, words_learned, quiz_score_total, total_sessions, "
+            "COALESCE(referral_count, 0)",
+            "(is_premium = FALSE OR premium_expires_at < CURRENT_TIMESTAMP) "
+            "AND last_activity > date('now', '-14 days') AND total_sessions >= 3 "
+            f"AND {REACHABLE}"
+        )
+
+        await enqueue_stream('premium_promotion', chunks, job_key=f"premium_promotion:{date.today().isoformat()}")
+
     except Exception as e:
         print(f"Error sending premium promotion messages: {e}")
 
 async def award_weekly_bonuses(bot: Bot):
     """Award weekly activity bonuses to users"""
     try:
-        awarded_users = await calculate_weekly_bonus()
-        print(f"Awarded weekly bonuses to {awarded_users} users")
+        week = iso_week()
+        awarded_users, awarded_ids = await calculate_weekly_bonus(week)
+        print(f"Awarded weekly bonuses to {awarded_users} users ({week})")
         
-        # Optionally notify top performers
+        # Optionally notify the top performers among this week's winners
         if awarded_users > 0:
-            async with aiosqlite.connect(DATABASE_PATH) as db:
+            async with db_pool.reader() as db:
                 cursor = await db.execute("""
                     SELECT user_id, first_name, rating_score
                     FROM users 
-                    WHERE rating_score > 0
+                    WHERE user_id IN (SELECT value FROM json_each(?))
                     ORDER BY rating_score DESC
                     LIMIT 3
-                """)
+                """, (json.dumps(awarded_ids),))
                 top_users = await cursor.fetchall()
                 
-                for user_id, first_name, rating_score in top_users:
-                    try:
-                        bonus_message = f"""
+            messages = []
+            for user_id, first_name, rating_score in top_users:
+                try:
+                    bonus_message = f"""
 🏆 <b>Haftalik bonus!</b>
 
 Salom {first_name}! 🎉
@@ -281,19 +272,20 @@ Siz bu hafta juda faol bo'ldingiz va haftalik faollik bonusi oldingiz!
 🎯 Davom eting va eng yaxshilar orasida bo'ling!
 
 Ko'proq o'rganing, ko'proq ball to'plang! 💪
-                        """
-                        await bot.send_message(user_id, bonus_message)
-                        await asyncio.sleep(0.2)
-                    except:
-                        continue
-        
+                    """
+                    messages.append((user_id, bonus_message))
+                except:
+                    continue
+            
+            await enqueue('weekly_bonus', messages, job_key=f"weekly_bonus:{week}")
+    
     except Exception as e:
         print(f"Error awarding weekly bonuses: {e}")
 
 async def cleanup_expired_premiums(bot: Bot):
     """Clean up expired premium subscriptions"""
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
+        async with db_pool.writer() as db:
             # Get users whose premium just expired
             cursor = await db.execute("""
                 SELECT user_id, first_name 
@@ -311,11 +303,15 @@ async def cleanup_expired_premiums(bot: Bot):
                 AND premium_expires_at < CURRENT_TIMESTAMP
             """)
             await db.commit()
+        
+        for user_id, _ in expired_users:
+            premium_cache.invalidate(user_id)
             
-            # Notify users about expiration
-            for user_id, first_name in expired_users:
-                try:
-                    expiry_message = f"""
+        # Notify users about expiration (no job key: each run finds a new set of users)
+        messages = []
+        for user_id, first_name in expired_users:
+            try:
+                expiry_message = f"""
 ⏰ <b>Premium obuna tugadi!</b>
 
 Salom {first_name}!
@@ -328,55 +324,52 @@ Sizning premium obunangiz tugadi. Premium imkoniyatlardan foydalanishni davom et
 Premium obuna uchun: /premium
 
 Rahmat! 🙏
-                    """
-                    await bot.send_message(user_id, expiry_message)
-                    await asyncio.sleep(0.1)
-                except:
-                    continue
-            
-            print(f"Cleaned up {len(expired_users)} expired premium subscriptions")
+                """
+                messages.append((user_id, expiry_message))
+            except:
+                continue
         
+        await enqueue('premium_expired', messages)
+        print(f"Cleaned up {len(expired_users)} expired premium subscriptions")
+    
     except Exception as e:
         print(f"Error cleaning up expired premiums: {e}")
 
+REMINDER_MESSAGES = [
+    "👋 {name}, sizni sog'indik! Til o'rganishni davom ettiramizmi? 📚",
+    "🌟 {name}, yangi darslar kutayapti! Keling, o'rganishni davom ettiraylik! 🚀",
+    "📖 {name}, bilimlaringizni yangilash vaqti keldi! Testlarni ham unutmang! 🧠",
+    "🎯 {name}, maqsadlaringizga erishish uchun har kun bir qadam tashlang! 💪"
+]
+
+def _reminder_messages(rows):
+    """(user_id, text) for a chunk of inactive users"""
+    messages = []
+    for user_id, first_name, last_activity in rows:
+        try:
+            message = random.choice(REMINDER_MESSAGES)
+            personalized_message = message.format(name=first_name or "Do'stim")
+            messages.append((user_id, personalized_message))
+        except:
+            continue
+    return messages
+
 async def send_engagement_reminders(bot: Bot):
     """Send reminders to inactive users"""
     try:
         # Get users inactive for 3-7 days
         three_days_ago = datetime.now() - timedelta(days=3)
         seven_days_ago = datetime.now() - timedelta(days=7)
-        
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            cursor = await db.execute("""
-                SELECT user_id, first_name, last_activity
-                FROM users 
-                WHERE last_activity BETWEEN ? AND ?
-                AND total_sessions >= 2
-                ORDER BY rating_score DESC
-                LIMIT 200
-            """, (seven_days_ago.isoformat(), three_days_ago.isoformat()))
-            inactive_users = await cursor.fetchall()
-        
-        reminder_messages = [
-            "👋 {name}, sizni sog'indik! Til o'rganishni davom ettiramizmi? 📚",
-            "🌟 {name}, yangi darslar kutayapti! Keling, o'rganishni davom ettiraylik! 🚀",
-            "📖 {name}, bilimlaringizni yangilash vaqti keldi! Testlarni ham unutmang! 🧠",
-            "🎯 {name}, maqsadlaringizga erishish uchun har kun bir qadam tashlang! 💪"
-        ]
-        
-        sent_count = 0
-        for user_id, first_name, last_activity in inactive_users:
-            try:
-                message = random.choice(reminder_messages)
-                personalized_message = message.format(name=first_name or "Do'stim")
-                await bot.send_message(user_id, personalized_message)
-                sent_count += 1
-                await asyncio.sleep(0.2)
-            except:
-                continue
-        
-        print(f"Sent engagement reminders to {sent_count} users")
-        
+
+        chunks = audience_messages(
+            _reminder_messages,
+            "first_name, last_activity",
+            f"last_activity BETWEEN ? AND ? AND total_sessions >= 2 AND {REACHABLE}",
+            (seven_days_ago.isoformat(), three_days_ago.isoformat())
+        )
+
+        await enqueue_stream('engagement_reminder', chunks, job_key=f"engagement_reminder:{date.today().isoformat()}")
+
     except Exception as e:
         print(f"Error sending engagement reminders: {e}")
 
@@ -432,6 +425,27 @@ async def start_scheduler(bot: Bot):
         id='engagement_reminders'
     )
     
+    # Leaderboard reconciliation against the database
+    scheduler.add_job(
+        reconcile_leaderboard,
+        IntervalTrigger(minutes=LEADERBOARD_RECONCILE_MINUTES),
+        id='leaderboard_reconcile'
+    )
+    
+    # Quiz analytics rollups
+    scheduler.add_job(
+        roll_up_quiz_stats,
+        IntervalTrigger(minutes=QUIZ_ROLLUP_MINUTES),
+        id='quiz_rollup'
+    )
+    
+    # Stale FSM states - daily at 4 AM
+    scheduler.add_job(
+        purge_fsm_states,
+        CronTrigger(hour=4, minute=0),
+        id='fsm_purge'
+    )
+    
     # Start scheduler
     try:
         scheduler.start()
@@ -439,7 +453,33 @@ async def start_scheduler(bot: Bot):
     except Exception as e:
         print(f"[SCHEDULER] ❌ Error starting scheduler: {e}")
 
+async def reconcile_leaderboard():
+    """Rebuild the in-memory leaderboard from the database"""
+    try:
+        await rating_leaderboard.load()
+    except Exception as e:
+        print(f"[LEADERBOARD] Reconciliation failed: {e}")
+
+async def purge_fsm_states():
+    """Drop conversation states nobody has touched within the TTL"""
+    try:
+        removed = await fsm_storage.purge_expired()
+        if removed:
+            print(f"[FSM] Purged {removed} stale states")
+    except Exception as e:
+        print(f"[FSM] Purge failed: {e}")
+
+async def roll_up_quiz_stats():
+    """Fold new quiz answers into the analytics tables"""
+    try:
+        await roll_up()
+    except Exception as e:
+        print(f"[QUIZ STATS] Rollup failed: {e}")
+
 async def stop_scheduler():
     """Stop the scheduler"""
-    scheduler.shutdown()
-    print("Scheduler stopped")
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        # Jobs are added again by the next start_scheduler()
+        scheduler.remove_all_jobs()
+        print("Scheduler stopped")
@@ -0,0 +1,253 @@
+"""
+Sharding - updates spread over worker processes by user
+Yangilanishlar foydalanuvchi bo'yicha bir nechta jarayonga taqsimlanadi
+
+The ingress process receives updates (webhook or polling) and writes each one
+as a JSON line to the stdin of worker `user_id % SHARD_WORKERS`. A user always
+lands on the same worker, which handles that user's updates one after another,
+so reply order and the FSM cache stay consistent without cross-process locks.
+The shared caches (catalog, quizzes, premium status, leaderboard) are not
+kept coherent across workers: an admin change made on one worker reaches the
+others at their next refresh, within SHARD_CACHE_REFRESH_SECONDS.
+Which worker runs the scheduler is decided by `utils.lease.scheduler_lease`.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import SHARD_MAX_IN_FLIGHT, SHARD_CACHE_REFRESH_SECONDS
+from utils.catalog_cache import catalog_cache
+from utils.leaderboard import rating_leaderboard
+from utils.premium_cache import premium_cache
+from utils.quiz_cache import quiz_cache
+
+# Updates can carry long texts and entity lists
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """Id of the user behind an update (chat id when there is no user)"""
+    for field, event in update.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return None
+
+def shard_of(update: Dict[str, Any], shards: int) -> int:
+    """Worker index for an update; updates without a user are spread by id"""
+    key = update_user_id(update)
+    if key is None:
+        key = update.get("update_id", 0)
+    return key % shards
+
+# ==================== INGRESS ====================
+
+class ShardRouter:
+    """Starts the worker processes and feeds each its share of the updates"""
+
+    def __init__(self, shards: int, script: str):
+        self.shards = shards
+        self.script = script
+        self._workers: List[Optional[asyncio.subprocess.Process]] = [None] * shards
+        self._ready = [asyncio.Event() for _ in range(shards)]
+        self._supervisors: List[asyncio.Task] = []
+        self._stopping = False
+        self.routed = [0] * shards
+        self.restarts = 0
+
+    async def _spawn(self, index: int) -> asyncio.subprocess.Process:
+        env = dict(os.environ, SHARD_INDEX=str(index))
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, self.script, stdin=asyncio.subprocess.PIPE, env=env
+        )
+        self._workers[index] = process
+        self._ready[index].set()
+        print(f"[SHARDING] Worker {index} started (pid {process.pid})")
+        return process
+
+    async def _supervise(self, index: int) -> None:
+        """Restart a worker that exits while the bot is running"""
+        while True:
+            process = self._workers[index]
+            code = await process.wait()
+            if self._stopping:
+                return
+            self._ready[index].clear()
+            self.restarts += 1
+            print(f"[SHARDING] Worker {index} exited with {code}, restarting")
+            await asyncio.sleep(1)
+            await self._spawn(index)
+
+    async def start(self) -> None:
+        for index in range(self.shards):
+            await self._spawn(index)
+        self._supervisors = [asyncio.create_task(self._supervise(i)) for i in range(self.shards)]
+
+    async def route(self, update: Dict[str, Any]) -> None:
+        """Queue an update on its worker; waits while the worker's pipe is full"""
+        index = shard_of(update, self.shards)
+        line = json.dumps(update, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+        while True:
+            await self._ready[index].wait()
+            process = self._workers[index]
+            try:
+                process.stdin.write(line)
+                await process.stdin.drain()
+                self.routed[index] += 1
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                # Worker died; the supervisor brings up a new one
+                self._ready[index].clear()
+
+    def webhook_handler(self, secret: str):
+        """aiohttp handler that checks the secret header and routes the raw update"""
+        async def handle(request: web.Request) -> web.Response:
+            if secret and not secrets.compare_digest(
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret
+            ):
+                return web.Response(status=401, text="Unauthorized")
+            await self.route(await request.json())
+            return web.Response()
+        return handle
+
+    async def poll(self, bot: Bot, allowed_updates: List[str], timeout: int = 30) -> None:
+        """getUpdates loop for polling mode; runs until cancelled"""
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=timeout, allowed_updates=allowed_updates,
+                    request_timeout=int(bot.session.timeout + timeout)
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SHARDING] getUpdates failed: {e}")
+                await asyncio.sleep(5)
+                continue
+            for update in updates:
+                await self.route(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+                offset = update.update_id + 1
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Close the pipes; workers finish what they have queued and exit"""
+        self._stopping = True
+        for task in self._supervisors:
+            task.cancel()
+        processes = [p for p in self._workers if p is not None]
+        for process in processes:
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in processes)), timeout=timeout)
+        except asyncio.TimeoutError:
+            for process in processes:
+                if process.returncode is None:
+                    process.terminate()
+        print(f"[SHARDING] Workers stopped ({sum(self.routed)} updates routed)")
+
+    def stats(self) -> Dict:
+        return {'workers': self.shards, 'routed': list(self.routed), 'restarts': self.restarts}
+
+# ==================== WORKER ====================
+
+class ShardWorker:
+    """Reads updates from stdin and handles each user's updates in order"""
+
+    def __init__(self, max_in_flight: int = SHARD_MAX_IN_FLIGHT,
+                 refresh_interval: float = SHARD_CACHE_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._tasks = set()
+        self._last_by_user: Dict[int, asyncio.Task] = {}
+        self.handled = 0
+
+    async def serve(self, bot: Bot, dp: Dispatcher) -> None:
+        """Run until the ingress closes the pipe or SIGTERM arrives"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        reading = asyncio.current_task()
+        try:
+            # Ctrl+C reaches the whole process group; the ingress decides when we stop
+            loop.add_signal_handler(signal.SIGINT, lambda: None)
+            loop.add_signal_handler(signal.SIGTERM, reading.cancel)
+        except NotImplementedError:  # Windows
+            pass
+
+        refresher = asyncio.create_task(self._refresh_loop())
+        started = time.monotonic()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                update = json.loads(line)
+                key = update_user_id(update)
+                if key is None:
+                    key = -update.get("update_id", 0)
+
+                # Backpressure: stop reading (and fill the pipe) when busy
+                await self._slots.acquire()
+                previous = self._last_by_user.get(key)
+                task = asyncio.create_task(self._handle(bot, dp, update, previous))
+                self._tasks.add(task)
+                self._last_by_user[key] = task
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            refresher.cancel()
+            if self._tasks:
+                await asyncio.wait(set(self._tasks), timeout=10)
+            print(f"[SHARDING] Worker handled {self.handled} updates in {time.monotonic() - started:.0f}s")
+
+    async def _handle(self, bot: Bot, dp: Dispatcher, update: Dict[str, Any],
+                      previous: Optional[asyncio.Task]) -> None:
+        try:
+            # The same user's earlier updates go first
+            if previous is not None:
+                await asyncio.wait({previous})
+            await dp.feed_raw_update(bot, update)
+            self.handled += 1
+        except Exception as e:
+            print(f"[SHARDING] Update {update.get('update_id')} failed: {e}")
+        finally:
+            self._slots.release()
+
+    def _forget(self, key: int, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._last_by_user.get(key) is task:
+            del self._last_by_user[key]
+
+    async def _refresh_loop(self) -> None:
+        """Pick up catalog, quiz, premium and rating changes made by the other workers"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                catalog_cache.clear()
+                quiz_cache.invalidate()
+                # /activate_premium and /deactivate_premium run on the admin's worker
+                premium_cache.clear()
+                await rating_leaderboard.load()
+            except Exception as e:
+                print(f"[SHARDING] Cache refresh failed: {e}")
+
+# Global worker instance (used when SHARD_INDEX is set)
+shard_worker = ShardWorker()
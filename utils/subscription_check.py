@@ -1,55 +1,137 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
-from config import CHANNELS, INSTAGRAM_URL
+from config import CHANNELS, INSTAGRAM_URL, SUBSCRIPTION_CACHE_TTL_SECONDS, SUBSCRIPTION_NEGATIVE_TTL_SECONDS
 
-async def check_subscriptions(user_id: int, bot: Bot) -> dict:
-    """
-    Check if user is subscribed to all required channels and Instagram
-    Returns dict with subscription status
+class MembershipCache:
+    """(user_id, channel) -> is member, with separate lifetimes for yes and no.
+
+    Members are kept longer; a "not subscribed" answer expires quickly so a
+    user who just joined isn't kept waiting. Errors are never cached.
     """
+
+    def __init__(self, positive_ttl: int = SUBSCRIPTION_CACHE_TTL_SECONDS,
+                 negative_ttl: int = SUBSCRIPTION_NEGATIVE_TTL_SECONDS):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[Tuple[int, str], Tuple[bool, float]] = {}
+        self._next_purge = time.monotonic() + positive_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, channel: str) -> Optional[bool]:
+        entry = self._entries.get((user_id, channel.lower()))
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id: int, channel: str, is_member: bool) -> None:
+        now = time.monotonic()
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        self._entries[(user_id, channel.lower())] = (is_member, now + ttl)
+        if now >= self._next_purge:
+            self._purge_expired(now)
+            self._next_purge = now + self.positive_ttl
+
+    def invalidate(self, user_id: int, channel: Optional[str] = None) -> None:
+        channels = [channel] if channel else CHANNELS
+        for name in channels:
+            self._entries.pop((user_id, name.lower()), None)
+
+    def _purge_expired(self, now: float) -> None:
+        for key in [key for key, (_, expires) in self._entries.items() if expires < now]:
+            del self._entries[key]
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total else 0.0
+        }
+
+# Global cache instance
+subscription_cache = MembershipCache()
+
+# Concurrent checks of the same user share one round of API calls
+_inflight: Dict[int, asyncio.Task] = {}
+
+async def _fetch_membership(user_id: int, bot: Bot, channel_username: str) -> bool:
+    try:
+        member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
+    except TelegramBadRequest:
+        # Channel might not exist or bot is not admin
+        return False
+    except Exception:
+        # Other errors - assume not subscribed
+        return False
+
+    # Check if user is member, admin, or creator
+    is_member = member.status not in ['left', 'kicked']
+    subscription_cache.set(user_id, channel_username, is_member)
+    return is_member
+
+async def _check_subscriptions(user_id: int, bot: Bot) -> dict:
     subscription_status = {
         'all_subscribed': True,
         'missing_channels': [],
         'instagram_followed': True  # We can't check Instagram automatically
     }
-    
-    # Check Telegram channel subscriptions
+
+    # Cached answers first, the rest are asked from Telegram in parallel
+    membership = {channel: subscription_cache.get(user_id, channel) for channel in CHANNELS}
+    unknown = [channel for channel, is_member in membership.items() if is_member is None]
+    if unknown:
+        results = await asyncio.gather(*(_fetch_membership(user_id, bot, channel) for channel in unknown))
+        membership.update(zip(unknown, results))
+
     for channel_username, channel_name in CHANNELS.items():
-        try:
-            member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-            
-            # Check if user is member, admin, or creator
-            if member.status in ['left', 'kicked']:
-                subscription_status['all_subscribed'] = False
-                subscription_status['missing_channels'].append({
-                    'username': channel_username,
-                    'name': channel_name
-                })
-                
-        except TelegramBadRequest:
-            # Channel might not exist or bot is not admin
+        if not membership[channel_username]:
             subscription_status['all_subscribed'] = False
             subscription_status['missing_channels'].append({
                 'username': channel_username,
                 'name': channel_name
             })
-        except Exception:
-            # Other errors - assume not subscribed
-            subscription_status['all_subscribed'] = False
-            subscription_status['missing_channels'].append({
-                'username': channel_username,
-                'name': channel_name
-            })
-    
+
     return subscription_status
 
+async def check_subscriptions(user_id: int, bot: Bot) -> dict:
+    """
+    Check if user is subscribed to all required channels and Instagram
+    Returns dict with subscription status
+    """
+    task = _inflight.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_check_subscriptions(user_id, bot))
+        _inflight[user_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(user_id, None))
+
+    # Each caller gets its own copy of the result dict
+    status = await asyncio.shield(task)
+    return {**status, 'missing_channels': list(status['missing_channels'])}
+
 async def check_single_channel(user_id: int, bot: Bot, channel_username: str) -> bool:
     """Check if user is subscribed to a single channel"""
-    try:
-        member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-        return member.status not in ['left', 'kicked']
-    except:
-        return False
+    cached = subscription_cache.get(user_id, channel_username)
+    if cached is not None:
+        return cached
+    return await _fetch_membership(user_id, bot, channel_username)
+
+def channel_for_chat(chat_username: Optional[str]) -> Optional[str]:
+    """CHANNELS key of a chat, None if it isn't a required channel"""
+    if not chat_username:
+        return None
+    wanted = f"@{chat_username}".lower()
+    for channel_username in CHANNELS:
+        if channel_username.lower() == wanted:
+            return channel_username
+    return None
 
 def get_subscription_links():
     """Get list of subscription links for display"""
@@ -0,0 +1,75 @@
+"""
+Text Normalization - one normalized form and script set per incoming message
+Kiruvchi xabar bir marta normallashtiriladi va yozuv turlari aniqlanadi
+
+Every matcher (conversation replies, categories, Grammar AI rules) works on
+the folded form, and builds its keyword tables with the same fold(), so a
+keyword matches however the user typed it:
+- NFKC: full-width Latin/digits -> ASCII, half-width katakana -> full-width
+- casefold(): case-insensitive Latin and Cyrillic
+- katakana -> hiragana: コーヒー and こーひー are the same word
+"""
+
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+HANGUL = "hangul"
+KANA = "kana"
+KANJI = "kanji"
+LATIN = "latin"
+CYRILLIC = "cyrillic"
+
+# (first, last, script) - sorted, non-overlapping codepoint ranges
+SCRIPT_RANGES: List[Tuple[int, int, str]] = sorted([
+    (0x0041, 0x005A, LATIN), (0x0061, 0x007A, LATIN), (0x00C0, 0x024F, LATIN), (0x1E00, 0x1EFF, LATIN),
+    (0x0400, 0x052F, CYRILLIC),
+    (0x1100, 0x11FF, HANGUL), (0x3130, 0x318F, HANGUL), (0xA960, 0xA97F, HANGUL), (0xAC00, 0xD7FF, HANGUL),
+    (0x3040, 0x30FF, KANA), (0x31F0, 0x31FF, KANA), (0xFF66, 0xFF9F, KANA),
+    (0x3400, 0x4DBF, KANJI), (0x4E00, 0x9FFF, KANJI), (0xF900, 0xFAFF, KANJI), (0x20000, 0x2FFFF, KANJI),
+])
+_RANGE_STARTS = [first for first, _, _ in SCRIPT_RANGES]
+
+# Katakana ァ..ヶ sit 0x60 above their hiragana ぁ..ゖ
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+NORMALIZE_CACHE_SIZE = 4096
+
+def script_of(char: str) -> str:
+    """Script of one character, "" for digits, punctuation, emoji and the rest"""
+    code = ord(char)
+    index = bisect_right(_RANGE_STARTS, code) - 1
+    if index >= 0 and code <= SCRIPT_RANGES[index][1]:
+        return SCRIPT_RANGES[index][2]
+    return ""
+
+def scripts_of(text: str) -> FrozenSet[str]:
+    # Each distinct character is looked up once
+    return frozenset(filter(None, map(script_of, set(text))))
+
+def fold(text: str) -> str:
+    """The form all matchers compare: NFKC, case-folded, katakana as hiragana, trimmed"""
+    return unicodedata.normalize("NFKC", text).casefold().translate(_KATAKANA_TO_HIRAGANA).strip()
+
+class NormalizedText:
+    """A message as the matchers see it; shared through normalize()'s cache"""
+
+    __slots__ = ('raw', 'text', 'scripts')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.text = fold(raw)
+        # Folding never moves a character to another script
+        self.scripts = scripts_of(self.text)
+
+    def has(self, *scripts: str) -> bool:
+        return not self.scripts.isdisjoint(scripts)
+
+    def __repr__(self) -> str:
+        return f"NormalizedText({self.text!r}, {sorted(self.scripts)})"
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(raw: str) -> NormalizedText:
+    """Normalize once per message; later stages get the cached result"""
+    return NormalizedText(raw)
@@ -0,0 +1,263 @@
+"""
+Write-Behind Buffer - batched rating and activity counter updates
+Reyting va faollik o'zgarishlarini xotirada yig'ib, bitta tranzaksiyada yozish
+"""
+
+import asyncio
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from config import ACTIVITY_FLUSH_INTERVAL_MS, ACTIVITY_FLUSH_MAX_ENTRIES, ACTIVITY_JOURNAL_PATH, SHARD_INDEX
+from utils.db_pool import db_pool
+
+class _Delta:
+    """Accumulated counter changes for one user"""
+    __slots__ = ('rating', 'words', 'sessions', 'last_activity')
+
+    def __init__(self):
+        self.rating = 0.0
+        self.words = 0
+        self.sessions = 0
+        self.last_activity: Optional[str] = None
+
+    def add(self, rating: float, words: int, sessions: int, last_activity: Optional[str]) -> None:
+        self.rating += rating
+        self.words += words
+        self.sessions += sessions
+        if last_activity and (self.last_activity is None or last_activity > self.last_activity):
+            self.last_activity = last_activity
+
+def _utc_timestamp() -> str:
+    # Same format as SQLite CURRENT_TIMESTAMP
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+class ActivityBuffer:
+    """Per-user rating / words_learned / total_sessions deltas flushed in batches"""
+
+    def __init__(self, interval_ms: int = ACTIVITY_FLUSH_INTERVAL_MS,
+                 max_entries: int = ACTIVITY_FLUSH_MAX_ENTRIES,
+                 journal_path: str = ACTIVITY_JOURNAL_PATH, shard_index: int = SHARD_INDEX):
+        self.interval = max(1, interval_ms) / 1000
+        self.max_entries = max(1, max_entries)
+        # Shard workers each keep their own journal files and flush-state row
+        if journal_path and shard_index >= 0:
+            journal_path = f"{journal_path}.shard{shard_index}"
+        self.journal_path = journal_path
+        self._state_id = 1 if shard_index < 0 else shard_index + 2
+        self._pending: Dict[int, _Delta] = {}
+        self._journal: Optional[TextIO] = None
+        self._rotated: List[str] = []  # Journal files covered by deltas not yet committed
+        self._batch_id = 0  # Last committed batch
+        # Rotated file suffix; advances on every rotation, even when the flush fails,
+        # so a retry never reuses (and overwrites) a file still waiting to be committed
+        self._journal_seq = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._started = False
+        self.stats = {'flushes': 0, 'rows': 0, 'events': 0, 'errors': 0}
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        """Replay the journal (if enabled) and start the flush loop"""
+        if self._started:
+            return
+
+        if self.journal_path:
+            await self._replay_journal()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+        self._started = True
+        self._task = asyncio.create_task(self._flush_loop())
+
+        if self._pending:
+            print(f"[WRITE-BEHIND] Replaying {len(self._pending)} journaled users")
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the loop and flush everything still pending"""
+        if not self._started:
+            return
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+        self._started = False
+
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        print(f"[WRITE-BEHIND] Closed ({self.stats['flushes']} flushes, {self.stats['rows']} rows)")
+
+    async def add(self, user_id: int, rating: float = 0, words: int = 0,
+                  sessions: int = 0, touch: bool = True) -> None:
+        """Queue counter deltas for a user"""
+        last_activity = _utc_timestamp() if touch else None
+
+        if not self._started:
+            # No background loop (scripts, one-off jobs) - write straight through
+            delta = _Delta()
+            delta.add(rating, words, sessions, last_activity)
+            await self._write({user_id: delta})
+            return
+
+        if self._journal is not None:
+            self._journal.write(json.dumps([user_id, rating, words, sessions, last_activity]) + "\n")
+            self._journal.flush()
+
+        delta = self._pending.get(user_id)
+        if delta is None:
+            delta = self._pending[user_id] = _Delta()
+        delta.add(rating, words, sessions, last_activity)
+        self.stats['events'] += 1
+
+        if len(self._pending) >= self.max_entries:
+            self._wakeup.set()
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Held while a batch is written; hold it to read the table and pending deltas consistently"""
+        return self._flush_lock
+
+    def pending_items(self) -> List[Tuple[int, Tuple[float, int, int]]]:
+        """(user_id, (rating, words, sessions)) for every user with unwritten deltas"""
+        return [(user_id, (delta.rating, delta.words, delta.sessions)) for user_id, delta in self._pending.items()]
+
+    def pending(self, user_id: int) -> Optional[Tuple[float, int, int]]:
+        """Deltas not yet written for a user: (rating, words, sessions)"""
+        delta = self._pending.get(user_id)
+        if delta is None:
+            return None
+        return delta.rating, delta.words, delta.sessions
+
+    async def flush(self) -> int:
+        """Write all pending deltas in one transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            # The batch also carries every earlier rotated file, so it covers up to this one
+            self._journal_seq += 1
+            batch_id = self._journal_seq
+            self._rotate_journal(batch_id)
+
+            try:
+                await self._write(batch, batch_id)
+            except Exception as e:
+                # Put the batch back so the next flush retries it
+                for user_id, delta in batch.items():
+                    current = self._pending.setdefault(user_id, _Delta())
+                    current.add(delta.rating, delta.words, delta.sessions, delta.last_activity)
+                self.stats['errors'] += 1
+                print(f"[WRITE-BEHIND] Flush error: {e}")
+                return 0
+
+            self._batch_id = batch_id
+            for path in self._rotated:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._rotated = []
+
+            self.stats['flushes'] += 1
+            self.stats['rows'] += len(batch)
+            return len(batch)
+
+    async def _write(self, batch: Dict[int, _Delta], batch_id: Optional[int] = None) -> None:
+        rows = [
+            (delta.rating, delta.words, delta.sessions, delta.last_activity, user_id)
+            for user_id, delta in batch.items()
+        ]
+        async with db_pool.writer() as db:
+            await db.executemany("""
+                UPDATE users
+                SET rating_score = rating_score + ?,
+                    words_learned = words_learned + ?,
+                    total_sessions = total_sessions + ?,
+                    last_activity = COALESCE(?, last_activity)
+                WHERE user_id = ?
+            """, rows)
+            if batch_id is not None and self.journal_path:
+                # Same transaction: a replayed journal file at or below this id is already applied
+                await db.execute(
+                    "INSERT OR REPLACE INTO activity_flush_state (id, last_batch) VALUES (?, ?)",
+                    (self._state_id, batch_id)
+                )
+            await db.commit()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    # ================================
+    # CRASH JOURNAL
+    # ================================
+
+    def _rotate_journal(self, batch_id: int) -> None:
+        # Deltas added while this batch is being written go to a fresh file
+        if self._journal is None:
+            return
+        self._journal.close()
+        rotated = f"{self.journal_path}.{batch_id}"
+        os.replace(self.journal_path, rotated)
+        self._rotated.append(rotated)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    async def _replay_journal(self) -> None:
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT last_batch FROM activity_flush_state WHERE id = ?", (self._state_id,))
+            row = await cursor.fetchone()
+        last_batch = row[0] if row else 0
+
+        rotated = []
+        for path in glob.glob(f"{glob.escape(self.journal_path)}.*"):
+            # "<path>.shard0.3" belongs to a shard worker, not to "<path>"
+            prefix, suffix = path.rsplit(".", 1)
+            if prefix == self.journal_path and suffix.isdigit():
+                rotated.append((int(suffix), path))
+        rotated.sort()
+
+        files = []
+        for batch_id, path in rotated:
+            if batch_id <= last_batch:
+                os.remove(path)  # Committed before the crash
+            else:
+                files.append(path)
+        if os.path.exists(self.journal_path):
+            files.append(self.journal_path)
+
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        user_id, rating, words, sessions, last_activity = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line
+                    self._pending.setdefault(user_id, _Delta()).add(rating, words, sessions, last_activity)
+
+        # Replayed files are deleted once their deltas are committed
+        self._batch_id = last_batch
+        self._journal_seq = max([last_batch] + [batch_id for batch_id, _ in rotated])
+        self._rotated = [path for path in files if path != self.journal_path]
+
+# Global buffer instance
+activity_buffer = ActivityBuffer()